@@ -0,0 +1,99 @@
+"""
+Benchmark: one /tiles/batch request vs N sequential single-tile requests.
+
+Writes a stub COG to a temporary directory and points the tiler's dataset
+cache at it, then renders the same viewport (a square block of tiles) both
+ways through the Mangum handler, as on Lambda.
+
+Usage (from cloud_functions/titiler_cogs):
+    python -m benchmarks.bench_batch_tiles --side 6 --rounds 5
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("TITILER_ALLOWED_BUCKETS", "s3://bench-bucket")
+# Measure rendering, not the rendered-tile cache
+os.environ["TITILER_TILE_CACHE"] = "off"
+
+import rasterio
+
+from benchmarks.bench_whitelist_middleware import STUB_URL, write_stub_cog
+from titiler_cogs import app as tiler_app
+
+
+def event(method: str, path: str, query: dict, body: str | None = None) -> dict:
+    """Minimal API Gateway REST event."""
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": method,
+        "headers": {"Host": "bench.local", "Content-Type": "application/json"},
+        "multiValueHeaders": {},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": {k: [v] for k, v in query.items()},
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": method, "stage": "bench"},
+        "isBase64Encoded": False,
+        "body": body,
+    }
+
+
+def run_sequential(tiles: list[tuple[int, int, int]], query: dict) -> float:
+    start = time.perf_counter()
+    for z, x, y in tiles:
+        response = tiler_app.handler(event("GET", f"/tiles/WebMercatorQuad/{z}/{x}/{y}.png", query), None)
+        assert response["statusCode"] == 200, response
+    return time.perf_counter() - start
+
+
+def run_batch(tiles: list[tuple[int, int, int]], query: dict) -> float:
+    body = json.dumps({"tiles": [list(t) for t in tiles]})
+    start = time.perf_counter()
+    response = tiler_app.handler(event("POST", "/tiles/batch", query, body), None)
+    elapsed = time.perf_counter() - start
+    assert response["statusCode"] == 200, response
+    payload = base64.b64decode(response["body"]) if response.get("isBase64Encoded") else response["body"].encode()
+    assert payload.count(b"X-Tile-Status: 200") == len(tiles)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--side", type=int, default=6, help="Viewport is side x side tiles")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        stub_path = os.path.join(tmpdir, "stub.tif")
+        write_stub_cog(stub_path, size=4096)
+
+        # Route the stub URL to the local file
+        tiler_app.dataset_cache.use(lambda url: rasterio.open(stub_path if url == STUB_URL else url), lambda url: "")
+
+        z = 10
+        origin = 512 - args.side // 2
+        tiles = [(z, x, y) for x in range(origin, origin + args.side) for y in range(origin, origin + args.side)]
+        query = {"url": STUB_URL, "rescale": "0,1"}
+
+        # Warm the dataset cache for both modes
+        run_batch(tiles, query)
+        run_sequential(tiles[:1], query)
+
+        sequential = [run_sequential(tiles, query) for _ in range(args.rounds)]
+        batch = [run_batch(tiles, query) for _ in range(args.rounds)]
+
+        print(f"{len(tiles)} tiles per viewport, {args.rounds} rounds")
+        print(f"{'mode':<12} {'median s':>10} {'ms/tile':>10}")
+        for name, timings in (("sequential", sequential), ("batch", batch)):
+            median = statistics.median(timings)
+            print(f"{name:<12} {median:>10.3f} {median / len(tiles) * 1000:>10.2f}")
+        print(f"dataset cache: {tiler_app.dataset_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: one POST /points request vs N single /point requests.
+
+Writes a stub COG to a temporary directory and points the tiler's dataset
+cache at it, then samples the same random locations both ways through the
+Mangum handler, as on Lambda, checking that both return the same values.
+
+Usage (from cloud_functions/titiler_cogs):
+    python -m benchmarks.bench_bulk_points --points 1000 --rounds 3
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("TITILER_ALLOWED_BUCKETS", "s3://bench-bucket")
+
+import rasterio
+
+from benchmarks.bench_batch_tiles import event
+from benchmarks.bench_whitelist_middleware import STUB_URL, write_stub_cog
+from titiler_cogs import app as tiler_app
+
+# The stub COG covers +-1/64 of the Web Mercator extent around 0,0
+EXTENT_DEGREES = 2.8
+
+
+def run_single(coordinates: list[list[float]]) -> tuple[float, list]:
+    values = []
+    start = time.perf_counter()
+    for lon, lat in coordinates:
+        response = tiler_app.handler(event("GET", f"/point/{lon},{lat}", {"url": STUB_URL}), None)
+        assert response["statusCode"] == 200, response
+        values.append(json.loads(response["body"])["values"])
+    return time.perf_counter() - start, values
+
+
+def run_bulk(coordinates: list[list[float]]) -> tuple[float, list]:
+    body = json.dumps({"coordinates": coordinates})
+    start = time.perf_counter()
+    response = tiler_app.handler(event("POST", "/points", {"url": STUB_URL}, body), None)
+    elapsed = time.perf_counter() - start
+    assert response["statusCode"] == 200, response
+    return elapsed, json.loads(response["body"])["values"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1000, help="Locations sampled per round")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        stub_path = os.path.join(tmpdir, "stub.tif")
+        write_stub_cog(stub_path, size=4096)
+
+        # Route the stub URL to the local file
+        tiler_app.dataset_cache.use(lambda url: rasterio.open(stub_path if url == STUB_URL else url), lambda url: "")
+
+        rng = random.Random(0)
+        coordinates = [
+            [round(rng.uniform(-EXTENT_DEGREES, EXTENT_DEGREES), 5), round(rng.uniform(-EXTENT_DEGREES, EXTENT_DEGREES), 5)]
+            for _ in range(args.points)
+        ]
+
+        # Warm the dataset cache for both modes
+        run_bulk(coordinates[:1])
+        run_single(coordinates[:1])
+
+        single_times, bulk_times = [], []
+        for _ in range(args.rounds):
+            elapsed, single_values = run_single(coordinates)
+            single_times.append(elapsed)
+            elapsed, bulk_values = run_bulk(coordinates)
+            bulk_times.append(elapsed)
+        assert single_values == bulk_values, "bulk and single point values differ"
+
+        print(f"{len(coordinates)} points, {args.rounds} rounds")
+        print(f"{'mode':<8} {'median s':>10} {'us/point':>10}")
+        for name, timings in (("single", single_times), ("bulk", bulk_times)):
+            median = statistics.median(timings)
+            print(f"{name:<8} {median:>10.3f} {median / len(coordinates) * 1e6:>10.1f}")
+        print(f"speedup: {statistics.median(single_times) / statistics.median(bulk_times):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: seeding a PMTiles archive and serving tiles from it vs rendering.
+
+Writes a stub COG to a temporary directory and points the tiler's dataset
+cache at it, seeds its tiles over a zoom range with one and with --workers
+processes, then requests every seeded tile through the Mangum handler, as on
+Lambda, once rendered and once from the archive, checking the bytes match.
+
+Usage (from cloud_functions/titiler_cogs):
+    python -m benchmarks.bench_tile_archive --minzoom 4 --maxzoom 10 --workers 4
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from functools import partial
+
+os.environ.setdefault("TITILER_ALLOWED_BUCKETS", "s3://bench-bucket")
+
+import rasterio
+
+import seed_tiles
+from benchmarks.bench_whitelist_middleware import STUB_URL, write_stub_cog
+from titiler_cogs import app as tiler_app
+
+# The stub COG covers +-1/64 of the Web Mercator extent around 0,0
+EXTENT_DEGREES = 2.8
+QUERY = f"url={STUB_URL}&rescale=0,1&colormap_name=viridis"
+
+
+def route_stub(stub_path: str):
+    """Route the stub URL to the local file (also run in each seeding worker)."""
+    tiler_app.dataset_cache.use(lambda url: rasterio.open(stub_path if url == STUB_URL else url), lambda url: "")
+    tiler_app.tile_cache = None
+
+
+def fetch_all(tiles: list[tuple[int, int, int]]) -> tuple[list[float], list[bytes], int]:
+    """Per-tile latency in ms, bodies and archive hits through the handler."""
+    params = seed_tiles.parse_qsl(QUERY)
+    latencies, bodies, hits = [], [], 0
+    for z, x, y in tiles:
+        start = time.perf_counter()
+        response = tiler_app.handler(seed_tiles.event(f"/tiles/WebMercatorQuad/{z}/{x}/{y}.png", params), None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response["statusCode"] == 200, response
+        bodies.append(response["body"])
+        headers = {k.lower(): v for k, v in response["headers"].items()}
+        hits += headers.get("x-tile-archive") == "HIT"
+    return latencies, bodies, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minzoom", type=int, default=4)
+    parser.add_argument("--maxzoom", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Seeding processes")
+    args = parser.parse_args()
+
+    bbox = (-EXTENT_DEGREES, -EXTENT_DEGREES, EXTENT_DEGREES, EXTENT_DEGREES)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        stub_path = os.path.join(tmpdir, "stub.tif")
+        write_stub_cog(stub_path, size=4096)
+
+        route_stub(stub_path)
+
+        archive = os.path.join(tmpdir, "stub.pmtiles")
+        print(f"{'seeding':<18} {'tiles':>6} {'s':>8} {'tiles/s':>8}")
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            counts = seed_tiles.seed(
+                QUERY, bbox, args.minzoom, args.maxzoom, archive, fmt="png",
+                workers=workers, initializer=partial(route_stub, stub_path),
+            )
+            elapsed = time.perf_counter() - start
+            print(f"{f'{workers} process(es)':<18} {counts['tiles']:>6} {elapsed:>8.2f} {counts['tiles'] / elapsed:>8.1f}")
+        print(f"archive: {os.path.getsize(archive) / 1024:.0f} KB, {counts['written']} tiles")
+
+        tiles = [
+            (t.z, t.x, t.y)
+            for t in seed_tiles.morecantile.tms.get("WebMercatorQuad").tiles(
+                *bbox, zooms=list(range(args.minzoom, args.maxzoom + 1))
+            )
+        ]
+        rendered, rendered_bodies, _ = fetch_all(tiles)
+
+        tiler_app.tile_archives.urls = [archive]
+        tiler_app.tile_archives.clear()
+        served, served_bodies, hits = fetch_all(tiles)
+        assert hits == len(tiles), f"only {hits} of {len(tiles)} tiles came from the archive"
+        assert served_bodies == rendered_bodies, "archive tiles differ from rendered ones"
+
+        print(f"\n{'serving':<18} {'median ms':>10} {'p95 ms':>8}")
+        for name, latencies in (("rendered", rendered), ("archive", served)):
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{name:<18} {statistics.median(latencies):>10.2f} {p95:>8.2f}")
+        print(f"speedup: {statistics.median(rendered) / statistics.median(served):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark for the bucket whitelist check run on every tile request.
+
+Compares the previous implementation (regexes compiled and URL parsed on
+every call) against `app.is_url_allowed` (precompiled patterns plus a
+verdict cache keyed by the raw `url` parameter).
+
+Usage (from cloud_functions/titiler_cogs):
+    python -m benchmarks.bench_url_whitelist --distinct 5000 --repeats 20
+"""
+
+import argparse
+import os
+import random
+import re
+import time
+from urllib.parse import urlparse
+
+os.environ.setdefault(
+    "TITILER_ALLOWED_BUCKETS", "s3://resilienceatlas,gs://trendsearth-public"
+)
+
+from titiler_cogs import app  # noqa: E402
+
+
+def legacy_is_url_allowed(url: str) -> bool:
+    """The pre-cache implementation, kept verbatim for comparison."""
+    if not url:
+        return False
+
+    allowed = app._get_allowed_buckets()
+    parsed = urlparse(url)
+
+    if parsed.scheme == "s3":
+        return parsed.netloc in allowed["s3"]
+
+    if parsed.scheme == "gs":
+        return parsed.netloc in allowed["gs"]
+
+    if parsed.scheme in ("http", "https"):
+        host = parsed.netloc.lower()
+        if ":" in host:
+            host = host.split(":")[0]
+
+        s3_virtual_hosted_pattern = re.compile(
+            r'^(?P<bucket>[a-z0-9][a-z0-9.-]+[a-z0-9])\.s3(\.(?P<region>[a-z0-9-]+))?\.amazonaws\.com$'
+        )
+        match = s3_virtual_hosted_pattern.match(host)
+        if match:
+            return match.group('bucket') in allowed["s3"]
+
+        s3_path_style_pattern = re.compile(
+            r'^s3(\.(?P<region>[a-z0-9-]+))?\.amazonaws\.com$'
+        )
+        match = s3_path_style_pattern.match(host)
+        if match:
+            path_parts = parsed.path.strip("/").split("/")
+            if path_parts and path_parts[0]:
+                return path_parts[0] in allowed["s3"]
+
+        if host == "storage.googleapis.com":
+            path_parts = parsed.path.strip("/").split("/")
+            if path_parts and path_parts[0]:
+                return path_parts[0] in allowed["gs"]
+
+        if host == "storage.cloud.google.com":
+            path_parts = parsed.path.strip("/").split("/")
+            if path_parts and path_parts[0]:
+                return path_parts[0] in allowed["gs"]
+
+    return False
+
+
+URL_TEMPLATES = [
+    "s3://resilienceatlas/cartodb_exports/cogs/layer_{i}.tif",
+    "https://resilienceatlas.s3.us-east-1.amazonaws.com/cartodb_exports/cogs/layer_{i}.tif",
+    "https://s3.amazonaws.com/resilienceatlas/cartodb_exports/cogs/layer_{i}.tif",
+    "https://storage.googleapis.com/trendsearth-public/data/layer_{i}.tif",
+    "https://evil.example.com/resilienceatlas/layer_{i}.tif",
+]
+
+
+def build_workload(distinct: int, repeats: int, seed: int = 0) -> list[str]:
+    """Build a shuffled list of `distinct` URLs, each requested `repeats` times."""
+    urls = [URL_TEMPLATES[i % len(URL_TEMPLATES)].format(i=i) for i in range(distinct)]
+    workload = urls * repeats
+    random.Random(seed).shuffle(workload)
+    return workload
+
+
+def time_per_call(check, workload: list[str]) -> float:
+    """Return mean microseconds per call."""
+    start = time.perf_counter()
+    for url in workload:
+        check(url)
+    return (time.perf_counter() - start) / len(workload) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distinct", type=int, default=5000, help="Number of distinct COG URLs")
+    parser.add_argument("--repeats", type=int, default=20, help="Requests per distinct URL")
+    args = parser.parse_args()
+
+    distinct_only = build_workload(args.distinct, 1)
+    repeated = build_workload(args.distinct, args.repeats)
+
+    # Sanity check: both implementations must agree on every URL
+    for url in distinct_only:
+        assert legacy_is_url_allowed(url) == app.is_url_allowed(url), url
+
+    print(f"{'workload':<28} {'legacy us/call':>15} {'cached us/call':>15}")
+    for name, workload in (
+        (f"{args.distinct} distinct", distinct_only),
+        (f"{args.distinct} x {args.repeats} repeated", repeated),
+    ):
+        app._cached_url_verdict.cache_clear()
+        legacy = time_per_call(legacy_is_url_allowed, workload)
+        cached = time_per_call(app.is_url_allowed, workload)
+        print(f"{name:<28} {legacy:>15.2f} {cached:>15.2f}")
+
+    print(f"verdict cache: {app._cached_url_verdict.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Per-tile render time: native-grid COG vs GoogleMapsCompatible COG.
+
+Writes the same synthetic raster twice to a temporary directory, as the
+conversion pipeline does with WEB_MERCATOR=true: once as a COG in its
+native CRS (EPSG:4326) and once warped onto the GoogleMapsCompatible
+tiling scheme (EPSG:3857). The same XYZ tiles are then rendered from both
+through the Mangum handler, as on Lambda, and the median time per tile is
+reported for each zoom level.
+
+Usage (from cloud_functions/titiler_cogs):
+    python -m benchmarks.bench_webmercator_tiles --size 4096 --rounds 3
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("TITILER_ALLOWED_BUCKETS", "s3://bench-bucket")
+# Measure rendering, not the rendered-tile cache
+os.environ["TITILER_TILE_CACHE"] = "off"
+
+import morecantile
+import numpy
+import rasterio
+import rasterio.shutil
+from rasterio.transform import from_bounds
+from rio_tiler.io import Reader
+
+from benchmarks.bench_batch_tiles import event
+from titiler_cogs import app as tiler_app
+
+NATIVE_URL = "s3://bench-bucket/native.tif"
+MERCATOR_URL = "s3://bench-bucket/webmercator/native.tif"
+BOUNDS = (10.0, -10.0, 30.0, 10.0)
+
+
+def write_native_cog(path: str, size: int):
+    """Write a smooth single-band float COG in EPSG:4326."""
+    rng = numpy.random.default_rng(0)
+    coarse = rng.random((17, 17))
+    positions = numpy.linspace(0, 16, size, endpoint=False)
+    i = positions.astype(int)
+    f = positions - i
+    rows = coarse[i] * (1 - f)[:, None] + coarse[i + 1] * f[:, None]
+    data = (rows[:, i] * (1 - f) + rows[:, i + 1] * f).astype("float32")[None]
+    profile = {
+        "driver": "COG",
+        "width": size,
+        "height": size,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:4326",
+        "transform": from_bounds(*BOUNDS, size, size),
+        "compress": "ZSTD",
+        "predictor": 3,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+
+
+def write_mercator_cog(source: str, path: str):
+    """Warp a COG onto the GoogleMapsCompatible tiling scheme."""
+    rasterio.shutil.copy(
+        source, path, driver="COG", TILING_SCHEME="GoogleMapsCompatible",
+        COMPRESS="ZSTD", PREDICTOR="FLOATING_POINT", RESAMPLING="BILINEAR",
+    )
+
+
+def render(url: str, tiles: list, rounds: int) -> float:
+    """Median milliseconds per tile over `rounds` passes."""
+    query = {"url": url, "rescale": "0,1"}
+    timings = []
+    for _ in range(rounds):
+        for tile in tiles:
+            start = time.perf_counter()
+            response = tiler_app.handler(
+                event("GET", f"/tiles/WebMercatorQuad/{tile.z}/{tile.x}/{tile.y}.png", query), None
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response["statusCode"] == 200, response
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=4096, help="Width and height of the native raster")
+    parser.add_argument("--tiles", type=int, default=20, help="Tiles rendered per zoom level")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed passes over the tiles")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        native_path = os.path.join(tmpdir, "native.tif")
+        mercator_path = os.path.join(tmpdir, "mercator.tif")
+        write_native_cog(native_path, args.size)
+        write_mercator_cog(native_path, mercator_path)
+
+        # Route the stub URLs to the local files
+        paths = {NATIVE_URL: native_path, MERCATOR_URL: mercator_path}
+        tiler_app.dataset_cache.use(lambda url: rasterio.open(paths.get(url, url)), lambda url: "")
+
+        with Reader(mercator_path) as cog:
+            zooms = sorted({cog.minzoom, (cog.minzoom + cog.maxzoom) // 2, cog.maxzoom})
+        rng = random.Random(0)
+        tms = morecantile.tms.get("WebMercatorQuad")
+
+        print(f"{'zoom':>4} {'tiles':>6} {'native ms':>10} {'3857 ms':>10} {'speedup':>8}")
+        for zoom in zooms:
+            candidates = list(tms.tiles(*BOUNDS, zooms=[zoom]))
+            tiles = rng.sample(candidates, min(args.tiles, len(candidates)))
+            # Warm the dataset cache and GDAL block cache equally for both
+            render(NATIVE_URL, tiles[:1], 1)
+            render(MERCATOR_URL, tiles[:1], 1)
+            native = render(NATIVE_URL, tiles, args.rounds)
+            mercator = render(MERCATOR_URL, tiles, args.rounds)
+            print(f"{zoom:>4} {len(tiles):>6} {native:>10.2f} {mercator:>10.2f} {native / mercator:>7.2f}x")
+        print(f"dataset cache: {tiler_app.dataset_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Per-tile latency benchmark: BaseHTTPMiddleware vs pure ASGI whitelist.
+
+Builds two otherwise identical tiler apps around a small stub COG written
+to a temporary directory, wraps each in Mangum, and replays the same API
+Gateway tile events through both to report p50/p99 latency per tile.
+
+Usage (from cloud_functions/titiler_cogs):
+    python -m benchmarks.bench_whitelist_middleware --requests 500
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("TITILER_ALLOWED_BUCKETS", "s3://bench-bucket")
+
+import numpy
+import rasterio
+from fastapi import FastAPI, HTTPException, Request
+from mangum import Mangum
+from rasterio.transform import from_bounds
+from rio_tiler.io import Reader
+from starlette.middleware.base import BaseHTTPMiddleware
+from titiler.core.errors import DEFAULT_STATUS_CODES, add_exception_handlers
+from titiler.core.factory import TilerFactory
+
+from titiler_cogs import app as tiler_app
+
+STUB_URL = "s3://bench-bucket/stub.tif"
+
+
+class LegacyBucketWhitelistMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware implementation, kept for comparison."""
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path == "/healthz":
+            return await call_next(request)
+
+        url_param = request.query_params.get("url")
+        if url_param and not tiler_app.is_url_allowed(url_param):
+            raise HTTPException(status_code=403, detail="Access denied.")
+
+        return await call_next(request)
+
+
+def write_stub_cog(path: str, size: int = 1024):
+    """Write a small single-band Web Mercator COG with overviews."""
+    half = 20037508.342789244 / 64
+    profile = {
+        "driver": "COG",
+        "width": size,
+        "height": size,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:3857",
+        "transform": from_bounds(-half, -half, half, half, size, size),
+        "blocksize": 512,
+        "compress": "DEFLATE",
+    }
+    data = numpy.random.default_rng(0).random((1, size, size), dtype="float32")
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+
+
+def build_app(middleware, stub_path: str) -> Mangum:
+    """Build a tiler app reading the stub COG whatever the `url` says."""
+
+    class StubReader(Reader):
+        def __attrs_post_init__(self):
+            self.input = stub_path
+            super().__attrs_post_init__()
+
+    application = FastAPI()
+    application.include_router(TilerFactory(reader=StubReader).router)
+    application.add_middleware(middleware)
+    add_exception_handlers(application, DEFAULT_STATUS_CODES)
+    return Mangum(application, lifespan="off")
+
+
+def tile_event(z: int, x: int, y: int) -> dict:
+    """Minimal API Gateway REST event for a tile request."""
+    return {
+        "resource": "/{proxy+}",
+        "path": f"/tiles/WebMercatorQuad/{z}/{x}/{y}.png",
+        "httpMethod": "GET",
+        "headers": {"Host": "bench.local"},
+        "multiValueHeaders": {},
+        "queryStringParameters": {"url": STUB_URL, "rescale": "0,1"},
+        "multiValueQueryStringParameters": {"url": [STUB_URL], "rescale": ["0,1"]},
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "stage": "bench"},
+        "isBase64Encoded": False,
+        "body": None,
+    }
+
+
+def measure(handler: Mangum, events: list[dict]) -> list[float]:
+    """Return per-request latency in milliseconds."""
+    latencies = []
+    for event in events:
+        start = time.perf_counter()
+        response = handler(event, None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response["statusCode"] == 200, response
+    return latencies
+
+
+def percentile(values: list[float], pct: float) -> float:
+    return statistics.quantiles(values, n=100)[int(pct) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Tile requests per stack")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed warmup requests per stack")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        stub_path = os.path.join(tmpdir, "stub.tif")
+        write_stub_cog(stub_path)
+
+        # Tiles covering the stub at zoom 8
+        tiles = [(8, x, y) for x in range(126, 130) for y in range(126, 130)]
+        events = [tile_event(*tiles[i % len(tiles)]) for i in range(args.requests)]
+
+        stacks = {
+            "BaseHTTPMiddleware": build_app(LegacyBucketWhitelistMiddleware, stub_path),
+            "pure ASGI": build_app(tiler_app.BucketWhitelistMiddleware, stub_path),
+        }
+
+        print(f"{'stack':<20} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for name, handler in stacks.items():
+            measure(handler, events[: args.warmup])
+            latencies = measure(handler, events)
+            print(
+                f"{name:<20} {percentile(latencies, 50):>8.2f} "
+                f"{percentile(latencies, 99):>8.2f} {statistics.mean(latencies):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,14 @@ import os
 from pathlib import Path
 import pickle
 from typing import Literal
-import requests
 import subprocess
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-import boto3
+
+# Shared S3 client and multipart settings of the COG conversion tools; needs
+# scripts/cartodb_cog_conversion/batch_container on PYTHONPATH (see README.md)
+import s3_transfer
 
 # Google Sheets API setup
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
@@ -16,7 +18,8 @@ SPREADSHEET_ID = "your_spreadsheet_id"
 RANGE_NAME = "Sheet1!A1:B"
 
 # AWS S3 setup
-s3 = boto3.client("s3")
+s3 = s3_transfer.get_s3_client()
+TRANSFER_CONFIG = s3_transfer.get_transfer_config()
 
 
 # Read inputs from Google Sheet
@@ -52,53 +55,40 @@ def read_inputs():
     return values
 
 
-# Download TIFF file
-def download_tiff(url, local_path):
-    response = requests.get(url, stream=True)
-    with open(local_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=1024):
-            if chunk:
-                f.write(chunk)
+# Download TIFF file (multipart, in parallel ranges)
+def download_tiff(bucket, key, local_path):
+    s3.download_file(bucket, str(key), local_path, Config=TRANSFER_CONFIG)
 
 
-def create_overviews(
-    input_file: Path,
-    operation: Literal[
-        "nearest",
-        "average",
-        "rms",
-        "gauss",
-        "cubic",
-        "cubicspline",
-        "lanczos",
-        "average_magphase",
-        "mode",
-    ] = "nearest",
-):
-    cmd = ["gdaladdo", "-clean" "-r", operation, input_file.as_posix()]
-    subprocess.run(cmd, check=True)
+# gdalwarp has no gauss or average_magphase; the overviews still use them
+WARP_RESAMPLING = {"gauss": "average", "average_magphase": "average"}
 
 
-def transform_cog(input_file: Path, output_file: Path):
+def transform_cog(input_file: Path, output_file: Path, operation: str = "nearest"):
+    # TILED and COPY_SRC_OVERVIEWS are GTiff options: the COG driver always
+    # tiles, and rebuilds overviews on the GoogleMapsCompatible grid, so the
+    # row's resampling is passed for the warp and the overviews here
     cmd = [
         "gdal_translate",
-        input_file.as_posix(),
-        output_file.as_posix(),
-        "of=COG",
+        "-of",
+        "COG",
+        "-co",
         "TILING_SCHEME=GoogleMapsCompatible",
         "-co",
         "COMPRESS=LZW",
         "-co",
-        "TILED=YES",
+        f"RESAMPLING={WARP_RESAMPLING.get(operation, operation)}",
         "-co",
-        "COPY_SRC_OVERVIEWS=YES",
+        f"OVERVIEW_RESAMPLING={operation}",
+        Path(input_file).as_posix(),
+        Path(output_file).as_posix(),
     ]
     subprocess.run(cmd, check=True)
 
 
 # Upload COG file to S3
 def upload_cog(local_path: Path, bucket, key):
-    s3.upload_file(local_path, bucket, key)
+    s3.upload_file(local_path, bucket, key, Config=TRANSFER_CONFIG)
 
 
 def process_file(
@@ -117,13 +107,11 @@ def process_file(
         "mode",
     ],
 ):
-    input_url = f"https://{bucket}.s3.amazonaws.com/{input_file}"
     local_input_file = "/tmp/input.tif"
     local_output_file = "/tmp/output.tif"
 
-    download_tiff(input_url, local_input_file)
-    create_overviews(local_input_file, operation)
-    transform_cog(local_input_file, local_output_file)
+    download_tiff(bucket, input_file, local_input_file)
+    transform_cog(local_input_file, local_output_file, operation)
     upload_cog(local_output_file, bucket, output_file)
 
     os.remove(local_input_file)
@@ -0,0 +1,239 @@
+"""
+Seed a PMTiles archive with pre-rendered tiles of one layer.
+
+Renders every tile of a zoom range and bounding box through the tiler's
+Lambda handler, exactly as CloudFront would request them, on a pool of
+worker processes, and writes them to a single PMTiles archive. Listing the
+archive in TITILER_TILE_ARCHIVES makes the tiler answer those tile requests
+with ranged reads of the archive instead of rendering them.
+
+The tile path and query string are stored in the archive; the tiler only
+serves a tile from it when a request has the same path (apart from z/x/y)
+and the same query parameters, in any order. The layer's COGs must be in a
+bucket allowed by TITILER_ALLOWED_BUCKETS.
+
+Usage (from cloud_functions/titiler_cogs):
+    TITILER_ALLOWED_BUCKETS=s3://resilienceatlas python seed_tiles.py \\
+        --query 'url=s3://resilienceatlas/cogs/layer.tif&bidx=1&colormap_name=viridis' \\
+        --bbox=-20,-35,55,38 --minzoom 0 --maxzoom 6 --output layer.pmtiles \\
+        --upload s3://resilienceatlas/tiles/layer.pmtiles
+
+--upload uses the shared S3 settings of the COG conversion tools, so it needs
+../../scripts/cartodb_cog_conversion/batch_container on PYTHONPATH.
+"""
+
+import argparse
+import base64
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Render every tile; never answer from the caches or an older archive
+os.environ["TITILER_TILE_CACHE"] = "off"
+os.environ["TITILER_TILE_ARCHIVES"] = ""
+
+import morecantile
+from pmtiles.tile import Compression, TileType, zxy_to_tileid
+from pmtiles.writer import Writer
+
+from titiler_cogs import app as tiler_app
+
+TILE_TYPES = {
+    "image/png": TileType.PNG,
+    "image/jpeg": TileType.JPEG,
+    "image/jpg": TileType.JPEG,
+    "image/webp": TileType.WEBP,
+}
+
+
+def tile_path(tms: str, fmt: str, scale: int, mosaic: bool) -> str:
+    """Tile path template of the tiler's tile route."""
+    suffix = (f"@{scale}x" if scale > 1 else "") + (f".{fmt}" if fmt else "")
+    return f"{'/mosaic' if mosaic else ''}/tiles/{tms}/{{z}}/{{x}}/{{y}}{suffix}"
+
+
+def event(path: str, params: list[tuple[str, str]]) -> dict:
+    """Minimal API Gateway REST event for a GET request."""
+    multi = {}
+    for name, value in params:
+        multi.setdefault(name, []).append(value)
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"Host": "seed.local"},
+        "multiValueHeaders": {},
+        "queryStringParameters": {name: values[-1] for name, values in multi.items()},
+        "multiValueQueryStringParameters": multi,
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "stage": "seed"},
+        "isBase64Encoded": False,
+        "body": None,
+    }
+
+
+def render_tiles(job: tuple[str, str, list[tuple[int, int, int]]]) -> list[tuple[int, int, bytes, str]]:
+    """
+    Render tiles through the Lambda handler.
+
+    Returns:
+        (tile id, status code, body, content type) per tile, in job order
+    """
+    template, query, tiles = job
+    params = parse_qsl(query, keep_blank_values=True)
+    results = []
+    for z, x, y in tiles:
+        response = tiler_app.handler(event(template.format(z=z, x=x, y=y), params), None)
+        body = response.get("body") or ""
+        body = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode()
+        headers = {k.lower(): v for k, v in (response.get("headers") or {}).items()}
+        results.append((zxy_to_tileid(z, x, y), response["statusCode"], body, headers.get("content-type", "")))
+    return results
+
+
+def seed(
+    query: str,
+    bbox: tuple[float, float, float, float],
+    minzoom: int,
+    maxzoom: int,
+    output: str,
+    tms: str = "WebMercatorQuad",
+    fmt: str = "",
+    scale: int = 1,
+    mosaic: bool = False,
+    workers: int = 1,
+    chunk_size: int = 32,
+    name: str = "",
+    initializer=None,
+) -> dict:
+    """
+    Render the tiles of `bbox` over minzoom-maxzoom and write them to `output`.
+
+    Tiles are rendered in chunks on `workers` processes (in this process
+    when 1) and written in tile id order. Tiles outside the layer (404) are
+    left out of the archive, so the tiler renders, and rejects, them as usual.
+    Workers are spawned rather than forked, since GDAL and boto3 state does
+    not survive a fork; `initializer` runs in each of them first.
+
+    Returns:
+        Counts of tiles requested, written, outside and failed
+    """
+    template = tile_path(tms, fmt, scale, mosaic)
+    grid = morecantile.tms.get(tms)
+    tiles = sorted(
+        ((t.z, t.x, t.y) for t in grid.tiles(*bbox, zooms=list(range(minzoom, maxzoom + 1)))),
+        key=lambda t: zxy_to_tileid(*t),
+    )
+    jobs = [(template, query, tiles[i:i + chunk_size]) for i in range(0, len(tiles), chunk_size)]
+
+    counts = {"tiles": len(tiles), "written": 0, "outside": 0, "failed": 0}
+    tile_types = set()
+    west, south, east, north = bbox
+
+    with open(output, "wb") as f:
+        writer = Writer(f)
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=initializer
+            )
+        try:
+            chunks = executor.map(render_tiles, jobs) if executor else map(render_tiles, jobs)
+            for chunk in chunks:
+                for tile_id, status, body, content_type in chunk:
+                    if status == 200:
+                        writer.write_tile(tile_id, body)
+                        tile_types.add(TILE_TYPES.get(content_type.split(";")[0], TileType.UNKNOWN))
+                        counts["written"] += 1
+                    elif status in (204, 404):
+                        counts["outside"] += 1
+                    else:
+                        counts["failed"] += 1
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if not counts["written"]:
+            raise ValueError("No tiles were rendered; check the query, bbox and zoom range")
+
+        writer.finalize(
+            {
+                "tile_type": tile_types.pop() if len(tile_types) == 1 else TileType.UNKNOWN,
+                "tile_compression": Compression.NONE,
+                "min_lon_e7": int(west * 1e7),
+                "min_lat_e7": int(south * 1e7),
+                "max_lon_e7": int(east * 1e7),
+                "max_lat_e7": int(north * 1e7),
+                "center_zoom": minzoom,
+                "center_lon_e7": int((west + east) / 2 * 1e7),
+                "center_lat_e7": int((south + north) / 2 * 1e7),
+            },
+            {
+                "name": name or Path(output).stem,
+                "bounds": list(bbox),
+                "minzoom": minzoom,
+                "maxzoom": maxzoom,
+                # Request the tiler matches against this archive
+                "titiler": {"path": template, "query": urlencode(sorted(parse_qsl(query, keep_blank_values=True)))},
+            },
+        )
+    return counts
+
+
+def upload(path: str, target: str):
+    """Upload the archive to an s3:// URI with the shared transfer settings."""
+    import s3_transfer  # scripts/cartodb_cog_conversion/batch_container
+
+    parsed = urlparse(target)
+    if parsed.scheme != "s3":
+        raise ValueError(f"--upload must be an s3:// URI, got {target}")
+    s3_transfer.get_s3_client().upload_file(
+        path, parsed.netloc, parsed.path.lstrip("/"),
+        ExtraArgs={"ContentType": "application/vnd.pmtiles"},
+        Config=s3_transfer.get_transfer_config(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", required=True, help="Query string of the layer's tile URL (url=...&bidx=...)")
+    parser.add_argument("--bbox", default="-180,-85.051129,180,85.051129", help="west,south,east,north in degrees (--bbox=-20,-35,55,38)")
+    parser.add_argument("--minzoom", type=int, default=0)
+    parser.add_argument("--maxzoom", type=int, default=5)
+    parser.add_argument("--tms", default="WebMercatorQuad", help="Tile matrix set of the tile URL")
+    parser.add_argument("--format", default="", help="Tile URL extension (png, jpeg, webp); none as in layer configs")
+    parser.add_argument("--scale", type=int, default=1, help="Tile URL @Nx scale")
+    parser.add_argument("--mosaic", action="store_true", help="Seed /mosaic/tiles (the query's url is a MosaicJSON index)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Rendering processes")
+    parser.add_argument("--chunk-size", type=int, default=32, help="Tiles per worker task")
+    parser.add_argument("--name", default="", help="Archive name stored in its metadata")
+    parser.add_argument("--output", required=True, help="PMTiles file to write")
+    parser.add_argument("--upload", default="", help="s3:// URI to upload the archive to")
+    args = parser.parse_args()
+
+    bbox = tuple(float(v) for v in args.bbox.split(","))
+    start = time.perf_counter()
+    counts = seed(
+        args.query, bbox, args.minzoom, args.maxzoom, args.output,
+        tms=args.tms, fmt=args.format, scale=args.scale, mosaic=args.mosaic,
+        workers=args.workers, chunk_size=args.chunk_size, name=args.name,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{counts['tiles']} tiles in {elapsed:.1f}s ({counts['tiles'] / elapsed:.1f} tiles/s, {args.workers} workers)")
+    print(f"written: {counts['written']}, outside the layer: {counts['outside']}, failed: {counts['failed']}")
+    print(f"archive: {args.output} ({os.path.getsize(args.output) / 1024**2:.1f} MB)")
+
+    if args.upload:
+        upload(args.output, args.upload)
+        print(f"uploaded: {args.upload} (add it to TITILER_TILE_ARCHIVES)")
+
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from urllib.parse import urlparse
+
+import pytest
+
+
+def write_cog(path, data, bounds, nodata=0, **options):
+    """Write a (bands, rows, cols) array as an EPSG:4326 COG over (west, south, east, north)."""
+    import rasterio
+    from rasterio.transform import from_bounds
+
+    count, height, width = data.shape
+    with rasterio.open(
+        path, "w", driver="COG", width=width, height=height, count=count, dtype=data.dtype.name, nodata=nodata,
+        crs="EPSG:4326", transform=from_bounds(*bounds, width, height), **options,
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+@pytest.fixture()
+def serve_cogs():
+    """
+    Serve local files for COG URLs: serve_cogs({url: path}).
+
+    The URLs' buckets are whitelisted and every dataset has version "v1";
+    other URLs fail to open as a missing object would. Returns the list of
+    URLs opened, in order.
+    """
+    import rasterio
+    from rasterio.errors import RasterioIOError
+
+    from titiler_cogs import app
+
+    def serve(paths: dict, version: str = "v1") -> list:
+        opened = []
+
+        def opener(url):
+            opened.append(url)
+            if url not in paths:
+                raise RasterioIOError(f"{url}: No such file or directory")
+            return rasterio.open(paths[url])
+
+        buckets = sorted({f"{urlparse(url).scheme}://{urlparse(url).netloc}" for url in paths})
+        app.set_allowed_buckets(buckets or ["s3://resilienceatlas"])
+        app.dataset_cache.use(opener, lambda url: version)
+        return opened
+
+    yield serve
+    app.dataset_cache.use()
+    app.set_allowed_buckets(None)
@@ -0,0 +1,66 @@
+import email
+
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+numpy = pytest.importorskip("numpy")
+
+from titiler_cogs import app  # noqa: E402
+
+from .conftest import write_cog  # noqa: E402
+
+URL = "s3://resilienceatlas/cogs/batch.tif"
+
+
+@pytest.fixture()
+def client(tmp_path, serve_cogs):
+    """Test client serving a 256px COG over 0-8 degrees for URL."""
+    from starlette.testclient import TestClient
+
+    serve_cogs({URL: write_cog(tmp_path / "batch.tif", numpy.full((1, 256, 256), 7, dtype="uint8"), (0, 0, 8, 8))})
+    return TestClient(app.app)
+
+
+def parse_parts(response):
+    message = email.message_from_bytes(
+        f"Content-Type: {response.headers['content-type']}\r\n\r\n".encode() + response.content
+    )
+    return [(dict(part.items()), part.get_payload(decode=True)) for part in message.get_payload()]
+
+
+def test_parts_in_request_order(client):
+    response = client.post(
+        "/tiles/batch", params={"url": URL, "format": "png"}, json={"tiles": [[6, 32, 31], [6, 0, 0], [6, 33, 31]]}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("multipart/mixed; boundary=")
+
+    parts = parse_parts(response)
+    assert [headers["X-Tile"] for headers, _ in parts] == ["6/32/31", "6/0/0", "6/33/31"]
+    assert [headers["X-Tile-Status"] for headers, _ in parts] == ["200", "404", "200"]
+    assert parts[0][0]["Content-Type"] == "image/png"
+    assert parts[0][1].startswith(b"\x89PNG")
+    # Tiles outside the dataset come back empty, without failing the batch
+    assert "Content-Type" not in parts[1][0]
+    assert not parts[1][1]
+
+
+def test_too_many_tiles(monkeypatch, client):
+    monkeypatch.setattr(app, "_BATCH_MAX_TILES", 2)
+    response = client.post("/tiles/batch", params={"url": URL}, json={"tiles": [[6, 32, 31]] * 3})
+    assert response.status_code == 400
+    assert "maximum 2" in response.json()["detail"]
+
+
+def test_unknown_tile_matrix_set(client):
+    response = client.post(
+        "/tiles/batch", params={"url": URL, "tileMatrixSetId": "Bogus"}, json={"tiles": [[6, 32, 31]]}
+    )
+    assert response.status_code == 422
+
+
+def test_url_outside_whitelist(client):
+    response = client.post(
+        "/tiles/batch", params={"url": "s3://other-bucket/cogs/batch.tif"}, json={"tiles": [[6, 32, 31]]}
+    )
+    assert response.status_code == 403
@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from titiler_cogs import app
+
+
+class FakeDataset:
+    def __init__(self, url):
+        self.url = url
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture()
+def clock():
+    now = [0.0]
+    return now
+
+
+@pytest.fixture()
+def etags():
+    return {}
+
+
+@pytest.fixture()
+def cache(clock, etags):
+    return app.DatasetCache(
+        max_entries=2,
+        ttl=10,
+        etag_ttl=5,
+        opener=FakeDataset,
+        etag_resolver=lambda url: etags.get(url, "v1"),
+        clock=lambda: clock[0],
+    )
+
+
+def test_reuses_checked_in_handle(cache):
+    key, entry = cache.checkout("s3://bucket/a.tif")
+    cache.checkin(key, entry)
+
+    _, again = cache.checkout("s3://bucket/a.tif")
+    assert again[1] is entry[1]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_concurrent_readers_get_separate_handles(cache):
+    _, first = cache.checkout("s3://bucket/a.tif")
+    _, second = cache.checkout("s3://bucket/a.tif")
+    assert first[1] is not second[1]
+    assert cache.misses == 2
+
+
+def test_lru_eviction_closes_oldest(cache):
+    for url in ("s3://bucket/a.tif", "s3://bucket/b.tif", "s3://bucket/c.tif"):
+        key, entry = cache.checkout(url)
+        cache.checkin(key, entry)
+        if url.endswith("a.tif"):
+            oldest = entry[1]
+
+    assert oldest.closed
+    assert cache.stats()["idle"] == 2
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry(cache, clock):
+    key, entry = cache.checkout("s3://bucket/a.tif")
+    cache.checkin(key, entry)
+
+    clock[0] = 11
+    _, fresh = cache.checkout("s3://bucket/a.tif")
+    assert fresh[1] is not entry[1]
+    assert entry[1].closed
+    assert cache.expirations == 1
+
+
+def test_etag_change_invalidates(cache, clock, etags):
+    key, entry = cache.checkout("s3://bucket/a.tif")
+    cache.checkin(key, entry)
+
+    # Within the ETag TTL the old version is trusted
+    etags["s3://bucket/a.tif"] = "v2"
+    clock[0] = 1
+    key, same = cache.checkout("s3://bucket/a.tif")
+    assert same[1] is entry[1]
+    cache.checkin(key, same)
+
+    clock[0] = 6
+    key, fresh = cache.checkout("s3://bucket/a.tif")
+    assert key == ("s3://bucket/a.tif", "v2")
+    assert fresh[1] is not entry[1]
+    assert entry[1].closed
+
+
+def test_local_file_roundtrip(tmp_path):
+    rasterio = pytest.importorskip("rasterio")
+    numpy = pytest.importorskip("numpy")
+    from rasterio.transform import from_origin
+
+    path = str(tmp_path / "local.tif")
+    with rasterio.open(
+        path, "w", driver="GTiff", width=16, height=16, count=1, dtype="uint8",
+        crs="EPSG:4326", transform=from_origin(0, 16, 1, 1),
+    ) as dst:
+        dst.write(numpy.ones((1, 16, 16), dtype="uint8"))
+
+    cache = app.DatasetCache(max_entries=4, ttl=60, etag_ttl=0)
+    key, entry = cache.checkout(path)
+    assert entry[1].width == 16
+    cache.checkin(key, entry)
+
+    # Rewriting the file changes mtime/size and therefore the cache key
+    with rasterio.open(
+        path, "w", driver="GTiff", width=32, height=32, count=1, dtype="uint8",
+        crs="EPSG:4326", transform=from_origin(0, 32, 1, 1),
+    ) as dst:
+        dst.write(numpy.ones((1, 32, 32), dtype="uint8"))
+    os.utime(path, ns=(1, 1))
+
+    key2, entry2 = cache.checkout(path)
+    assert key2 != key
+    assert entry2[1].width == 32
+    cache.clear()
+
+
+def test_resolve_etag_against_moto(monkeypatch):
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    with moto.mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="resilienceatlas")
+        s3.put_object(Bucket="resilienceatlas", Key="cogs/a.tif", Body=b"v1")
+        monkeypatch.setattr(app, "_s3_client", s3)
+
+        first = app._resolve_etag("s3://resilienceatlas/cogs/a.tif")
+        s3.put_object(Bucket="resilienceatlas", Key="cogs/a.tif", Body=b"v2")
+        second = app._resolve_etag("s3://resilienceatlas/cogs/a.tif")
+        missing = app._resolve_etag("s3://resilienceatlas/missing.tif")
+
+    assert first and second and first != second
+    assert missing == ""
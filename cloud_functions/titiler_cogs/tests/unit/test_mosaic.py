@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+numpy = pytest.importorskip("numpy")
+morecantile = pytest.importorskip("morecantile")
+
+from titiler_cogs import app  # noqa: E402
+
+from .conftest import write_cog  # noqa: E402
+
+INDEX_URL = "s3://resilienceatlas/cogs/mosaics/layer.json"
+WEST = "s3://resilienceatlas/cogs/west.tif"
+EAST = "s3://resilienceatlas/cogs/east.tif"
+DENIED = "s3://other-bucket/cogs/north.tif"
+TMS = morecantile.tms.get("WebMercatorQuad")
+
+
+@pytest.fixture()
+def cog_paths(tmp_path):
+    """Two adjacent 256px COGs: 0-8 degrees (value 1) and 8-16 degrees (value 2)."""
+    return {
+        url: write_cog(tmp_path / url.rsplit("/", 1)[1], numpy.full((1, 256, 256), value, dtype="uint8"),
+                       (west, 0, west + 8, 8))
+        for url, west, value in ((WEST, 0, 1), (EAST, 8, 2))
+    }
+
+
+@pytest.fixture()
+def index_reads(monkeypatch, serve_cogs):
+    """Serve a two-COG index (plus one asset outside the whitelist) and count fetches."""
+    quadkey = TMS.quadkey(TMS.tile(4, 4, 3))
+    document = {
+        "mosaicjson": "0.0.3",
+        "minzoom": 3,
+        "maxzoom": 8,
+        "quadkey_zoom": 3,
+        "bounds": [0, 0, 16, 8],
+        "center": [8, 4, 3],
+        "tiles": {quadkey: [WEST, EAST, DENIED]},
+        "footprints": {WEST: [0, 0, 8, 8], EAST: [8, 0, 16, 8], DENIED: [0, 0, 16, 8]},
+    }
+    reads = []
+
+    def read(url):
+        reads.append(url)
+        return json.dumps(document).encode()
+
+    serve_cogs({})
+    monkeypatch.setattr(app, "_read_mosaic_bytes", read)
+    app._mosaic_indexes.clear()
+    yield reads
+    app._mosaic_indexes.clear()
+
+
+def test_index_cached_and_whitelisted(index_reads):
+    mosaic_def, footprints, mosaic_id = app.load_mosaic_index(INDEX_URL)
+    assert list(mosaic_def.tiles.values()) == [[WEST, EAST]]
+    assert footprints[EAST] == (8, 0, 16, 8)
+
+    assert app.load_mosaic_index(INDEX_URL)[2] == mosaic_id
+    assert index_reads == [INDEX_URL]
+
+
+def test_get_assets_filters_by_footprint(index_reads):
+    with app.FootprintMosaicBackend(INDEX_URL) as backend:
+        # The quadkey tile covers both COGs, a z6 tile near 4E 4N only the west one
+        assert backend.get_assets(4, 3, 3) == [WEST, EAST]
+        west_tile = TMS.tile(4, 4, 6)
+        assert backend.get_assets(west_tile.x, west_tile.y, 6) == [WEST]
+        east_tile = TMS.tile(12, 4, 6)
+        assert backend.get_assets(east_tile.x, east_tile.y, 6) == [EAST]
+
+
+def test_backend_is_read_only(index_reads):
+    from cogeo_mosaic.errors import MosaicError
+
+    with app.FootprintMosaicBackend(INDEX_URL) as backend:
+        with pytest.raises(MosaicError):
+            backend.write()
+
+
+def test_tile_opens_only_intersecting_assets(index_reads, cog_paths, serve_cogs):
+    from starlette.testclient import TestClient
+
+    opened = serve_cogs(cog_paths)
+    client = TestClient(app.app)
+
+    tile = TMS.tile(4, 4, 6)
+    response = client.get(
+        f"/mosaic/tiles/WebMercatorQuad/{tile.z}/{tile.x}/{tile.y}.npy", params={"url": INDEX_URL}
+    )
+    assert response.status_code == 200, response.text
+    assert opened == [WEST]
+
+    data = numpy.load(io.BytesIO(response.content))
+    assert set(numpy.unique(data[0][data[-1] > 0])) == {1}
@@ -0,0 +1,54 @@
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+numpy = pytest.importorskip("numpy")
+
+from titiler_cogs import app  # noqa: E402
+
+from .conftest import write_cog  # noqa: E402
+
+URL = "s3://resilienceatlas/cogs/points.tif"
+
+
+@pytest.fixture()
+def cog_path(tmp_path):
+    """512px two-band COG over 0-8 degrees: b1 = row * 512 + col, b2 = -b1, b1 == 0 is nodata."""
+    data = numpy.arange(512 * 512, dtype="int32").reshape(512, 512)
+    return write_cog(tmp_path / "points.tif", numpy.stack([data, -data]), (0, 0, 8, 8), BLOCKSIZE=256)
+
+
+def pixel_center(row, col):
+    return [(col + 0.5) / 64, 8 - (row + 0.5) / 64]
+
+
+def test_sample_points_groups_by_block(cog_path):
+    locations = [pixel_center(300, 10), pixel_center(1, 2), pixel_center(301, 11), [20, 20], pixel_center(0, 0)]
+    lons, lats = zip(*locations)
+    with rasterio.open(cog_path) as dataset:
+        values, valid, blocks = app.sample_points(dataset, lons, lats, [1, 2])
+
+    # Points fall in two blocks; the one outside the dataset reads nothing
+    assert blocks == 2
+    assert values[:3].tolist() == [[300 * 512 + 10, -(300 * 512 + 10)], [514, -514], [301 * 512 + 11, -(301 * 512 + 11)]]
+    assert valid.tolist() == [[True, True]] * 3 + [[False, False]] * 2
+
+
+def test_endpoint(monkeypatch, cog_path, serve_cogs):
+    from starlette.testclient import TestClient
+
+    serve_cogs({URL: cog_path})
+    client = TestClient(app.app)
+
+    coordinates = [pixel_center(1, 2), [20, 20]]
+    response = client.post("/points", params={"url": URL, "bidx": 2}, json={"coordinates": coordinates})
+    assert response.status_code == 200
+    assert response.json() == {
+        "band_names": ["b2"],
+        "coordinates": coordinates,
+        "values": [[-514], None],
+        "blocks_read": 1,
+    }
+
+    monkeypatch.setattr(app, "_POINTS_MAX", 1)
+    response = client.post("/points", params={"url": URL}, json={"coordinates": coordinates})
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+numpy = pytest.importorskip("numpy")
+pytest.importorskip("pmtiles")
+
+import seed_tiles  # noqa: E402
+from titiler_cogs import app  # noqa: E402
+
+from .conftest import write_cog  # noqa: E402
+
+URL = "s3://resilienceatlas/cogs/seeded.tif"
+QUERY = f"url={URL}&bidx=1&rescale=0,255"
+
+
+@pytest.fixture()
+def cog_path(tmp_path):
+    """512px gradient COG over 0-20 degrees."""
+    data = numpy.tile(numpy.arange(512, dtype="uint16") // 2, (512, 1)).astype("uint8")
+    return write_cog(tmp_path / "seeded.tif", data[None], (0, 0, 20, 20))
+
+
+@pytest.fixture()
+def tiler(monkeypatch, cog_path, serve_cogs):
+    serve_cogs({URL: cog_path})
+    monkeypatch.setattr(app, "tile_cache", None)
+    yield
+    monkeypatch.setattr(app.tile_archives, "urls", [])
+    app.tile_archives.clear()
+
+
+def test_archive_template():
+    assert app.archive_template("/tiles/WebMercatorQuad/3/4/5@2x.png") == "/tiles/WebMercatorQuad/{z}/{x}/{y}@2x.png"
+    assert app.archive_template("/mosaic/tiles/WebMercatorQuad/3/4/5") == "/mosaic/tiles/WebMercatorQuad/{z}/{x}/{y}"
+    assert app.archive_template("/tiles/batch") is None
+
+
+def test_seeded_tiles_served_from_archive(monkeypatch, tmp_path, tiler):
+    from starlette.testclient import TestClient
+
+    archive_path = str(tmp_path / "layer.pmtiles")
+    counts = seed_tiles.seed(QUERY, (0, 0, 20, 20), 2, 4, archive_path, fmt="png")
+    assert counts["failed"] == 0 and counts["written"] == counts["tiles"] - counts["outside"] > 0
+
+    client = TestClient(app.app)
+    rendered = client.get("/tiles/WebMercatorQuad/4/8/7.png", params={"url": URL, "bidx": 1, "rescale": "0,255"})
+    assert rendered.status_code == 200
+    assert "X-Tile-Archive" not in rendered.headers
+
+    monkeypatch.setattr(app.tile_archives, "urls", [archive_path])
+    app.tile_archives.clear()
+
+    # Same tile with the query parameters in another order
+    seeded = client.get("/tiles/WebMercatorQuad/4/8/7.png", params={"rescale": "0,255", "bidx": 1, "url": URL})
+    assert seeded.headers["X-Tile-Archive"] == "HIT"
+    assert seeded.headers["content-type"] == "image/png"
+    assert seeded.content == rendered.content
+
+    # Beyond the seeded zooms, or for another styling, tiles are rendered
+    deeper = client.get("/tiles/WebMercatorQuad/5/16/15.png", params={"url": URL, "bidx": 1, "rescale": "0,255"})
+    assert deeper.status_code == 200 and "X-Tile-Archive" not in deeper.headers
+    other = client.get("/tiles/WebMercatorQuad/4/8/7.png", params={"url": URL, "bidx": 1})
+    assert other.status_code == 200 and "X-Tile-Archive" not in other.headers
+
+    assert app.tile_archives.stats()["hits"] == 1
+
+
+def test_reload_keeps_archives_that_fail_to_reopen(tmp_path, tiler):
+    import threading
+
+    archive_path = str(tmp_path / "layer.pmtiles")
+    seed_tiles.seed(QUERY, (0, 0, 20, 20), 2, 3, archive_path, fmt="png")
+    path, query = "/tiles/WebMercatorQuad/3/4/3.png", QUERY.encode()
+    now = [0.0]
+    archives = app.TileArchives([archive_path], ttl=60, clock=lambda: now[0])
+    archive = archives.lookup(path, query)
+    assert archive is not None
+
+    # A reload while the archive is being rewritten keeps the loaded one
+    with open(archive_path, "wb") as f:
+        f.write(b"partial")
+    now[0] = 61
+    assert archives.lookup(path, query) is archive
+
+    # Lookups during a slow reload use the loaded archives instead of waiting
+    loading, release = threading.Event(), threading.Event()
+    load = archives._load
+
+    def slow_load(previous):
+        loading.set()
+        release.wait(5)
+        return load(previous)
+
+    archives._load = slow_load
+    now[0] = 122
+    reloader = threading.Thread(target=archives.lookup, args=(path, query))
+    reloader.start()
+    assert loading.wait(5)
+    assert archives.lookup(path, query) is archive
+    release.set()
+    reloader.join()
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import pytest
+
+from titiler_cogs import app
+
+
+def test_cache_key_ignores_query_order():
+    assert app.tile_cache_key("/tiles/WebMercatorQuad/1/2/3", b"url=s3://b/a.tif&bidx=1") == \
+        app.tile_cache_key("/tiles/WebMercatorQuad/1/2/3", b"bidx=1&url=s3://b/a.tif")
+    assert app.tile_cache_key("/tiles/WebMercatorQuad/1/2/3", b"bidx=1") != \
+        app.tile_cache_key("/tiles/WebMercatorQuad/1/2/4", b"bidx=1")
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return app.MemoryTileCache(max_bytes=1024, ttl=60)
+    return app.DiskTileCache(str(tmp_path), max_bytes=4096, ttl=60)
+
+
+def test_backend_roundtrip(cache):
+    entry = (200, [(b"content-type", b"image/png")], b"png-bytes")
+    assert cache.get("k") is None
+    cache.set("k", entry)
+    assert cache.get("k") == entry
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_memory_backend_evicts_lru():
+    cache = app.MemoryTileCache(max_bytes=8, ttl=60)
+    cache.set("a", (200, [], b"1234"))
+    cache.set("b", (200, [], b"1234"))
+    cache.get("a")
+    cache.set("c", (200, [], b"1234"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evictions == 1
+
+
+def test_middleware_hit_and_miss_headers(cache):
+    renders = []
+
+    async def tiler(scope, receive, send):
+        renders.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"image/png")]})
+        await send({"type": "http.response.body", "body": b"tile"})
+
+    middleware = app.TileCacheMiddleware(tiler, cache)
+
+    def get(query: bytes):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/tiles/WebMercatorQuad/1/0/0", "query_string": query}
+        asyncio.run(middleware(scope, None, send))
+        return dict(messages[0]["headers"])[b"x-tile-cache"], messages[-1]["body"]
+
+    assert get(b"url=s3://b/a.tif&bidx=1") == (b"MISS", b"tile")
+    assert get(b"bidx=1&url=s3://b/a.tif") == (b"HIT", b"tile")
+    assert len(renders) == 1
+
+
+def test_backends_must_implement_interface():
+    with pytest.raises(TypeError):
+        app.TileCache(max_bytes=1024, ttl=60)
+
+
+def test_disk_backend_used_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingDiskCache(app.DiskTileCache):
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, entry):
+            threads.append(threading.get_ident())
+            super().set(key, entry)
+
+    async def tiler(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"tile"})
+
+    middleware = app.TileCacheMiddleware(tiler, RecordingDiskCache(str(tmp_path), max_bytes=4096, ttl=60))
+
+    async def request():
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "GET", "path": "/tiles/WebMercatorQuad/1/0/0", "query_string": b""}
+        await middleware(scope, None, send)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(request())
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+def test_disk_backend_writes_outside_the_lock(tmp_path, monkeypatch):
+    cache = app.DiskTileCache(str(tmp_path), max_bytes=4096, ttl=60)
+    locked = []
+    write_bytes = app.Path.write_bytes
+
+    def recording_write_bytes(path, data):
+        locked.append(cache._lock.locked())
+        return write_bytes(path, data)
+
+    monkeypatch.setattr(app.Path, "write_bytes", recording_write_bytes)
+    cache.set("k", (200, [], b"png-bytes"))
+    assert locked == [False]
+    assert cache.get("k") == (200, [], b"png-bytes")
+    assert not list(tmp_path.glob("*.tmp"))
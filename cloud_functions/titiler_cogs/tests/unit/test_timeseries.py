@@ -0,0 +1,114 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+numpy = pytest.importorskip("numpy")
+
+from titiler_cogs import app  # noqa: E402
+
+from .conftest import write_cog  # noqa: E402
+
+TEMPLATE = "s3://resilienceatlas/timeline/rain_{{year}}-{{month}}.tif"
+SQUARE = {"type": "Polygon", "coordinates": [[[1, 1], [3, 1], [3, 3], [1, 3], [1, 1]]]}
+
+
+def test_expand_url_template():
+    urls = app.expand_url_template("s3://b/{{year}}/{month}_{{day}}.tif", [date(2020, 3, 7)])
+    assert urls == ["s3://b/2020/03_7.tif"]
+
+
+@pytest.fixture()
+def client(tmp_path, serve_cogs):
+    """COGs for Jan-Mar 2020 (value = month, nodata in the top half) and none for April."""
+    from starlette.testclient import TestClient
+
+    paths = {}
+    for month in (1, 2, 3):
+        data = numpy.full((1, 64, 64), month, dtype="int16")
+        data[:, :32] = -1
+        url = f"s3://resilienceatlas/timeline/rain_2020-{month:02d}.tif"
+        paths[url] = write_cog(tmp_path / Path(url).name, data, (0, 0, 4, 4), nodata=-1)
+
+    serve_cogs(paths)
+    return TestClient(app.app)
+
+
+def months(*numbers):
+    return [f"2020-{month:02d}-01" for month in numbers]
+
+
+def test_point_series(client):
+    body = {"url_template": TEMPLATE, "dates": months(1, 2, 3, 4), "point": [1.5, 1.5]}
+    response = client.post("/timeseries", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["band_names"] == ["b1"]
+    assert result["dates"] == months(1, 2, 3, 4)
+    assert result["urls"][0] == "s3://resilienceatlas/timeline/rain_2020-01.tif"
+    # April has no COG
+    assert result["values"] == [[1], [2], [3], None]
+
+    # Nodata and outside the datasets
+    body["point"] = [1.5, 3.5]
+    assert client.post("/timeseries", json=body).json()["values"][0] is None
+    body["point"] = [10, 10]
+    assert client.post("/timeseries", json=body).json()["values"][0] is None
+
+
+def test_feature_series(client):
+    urls = [f"s3://resilienceatlas/timeline/rain_2020-0{month}.tif" for month in (3, 1)]
+    body = {"urls": urls, "feature": {"type": "Feature", "properties": {}, "geometry": SQUARE}}
+    result = client.post("/timeseries", params={"stat": "mean"}, json=body).json()
+    assert result["dates"] is None
+    assert result["values"] == [[3.0], [1.0]]
+
+    # Only the bottom half of the square has data
+    counts = client.post("/timeseries", params={"stat": "count"}, json=body).json()["values"]
+    assert counts == [[16 * 32]] * 2
+
+
+def test_rejects_foreign_buckets(client):
+    body = {"urls": ["s3://other-bucket/rain.tif"], "point": [1, 1]}
+    response = client.post("/timeseries", json=body)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"point": [1, 1]},
+        {"url_template": TEMPLATE, "point": [1, 1]},
+        {"urls": ["s3://resilienceatlas/a.tif"]},
+        {"urls": ["s3://resilienceatlas/a.tif"], "point": [1, 1],
+         "feature": {"type": "Feature", "properties": {}, "geometry": SQUARE}},
+    ],
+)
+def test_invalid_requests(client, body):
+    assert client.post("/timeseries", json=body).status_code == 400
+
+
+def test_missing_bands_are_null(client):
+    body = {"url_template": TEMPLATE, "dates": months(1, 2), "point": [1.5, 1.5]}
+    response = client.post("/timeseries", params={"bidx": [2]}, json=body)
+    assert response.status_code == 200
+    assert response.json()["values"] == [None, None]
+
+    assert client.post("/timeseries", params={"bidx": [0]}, json=body).status_code == 400
+
+
+def test_failing_date_is_null(client, monkeypatch, caplog):
+    sample_points = app.sample_points
+
+    def failing(dataset, *args):
+        if "rain_2020-02" in dataset.name:
+            raise ValueError("corrupt block")
+        return sample_points(dataset, *args)
+
+    monkeypatch.setattr(app, "sample_points", failing)
+    body = {"url_template": TEMPLATE, "dates": months(1, 2, 3), "point": [1.5, 1.5]}
+    response = client.post("/timeseries", json=body)
+    assert response.status_code == 200
+    assert response.json()["values"] == [[1], None, [3]]
+    assert "rain_2020-02.tif" in caplog.text
@@ -0,0 +1,71 @@
+import pytest
+
+from titiler_cogs import app
+
+
+@pytest.fixture()
+def allowed_buckets(monkeypatch):
+    """Pin the whitelist and reset the verdict cache around each test."""
+    monkeypatch.setattr(
+        app, "_allowed_buckets", {"s3": {"resilienceatlas"}, "gs": {"trendsearth-public"}}
+    )
+    app._cached_url_verdict.cache_clear()
+    yield
+    app._cached_url_verdict.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("s3://resilienceatlas/cogs/layer.tif", True),
+        ("s3://other-bucket/cogs/layer.tif", False),
+        ("https://resilienceatlas.s3.amazonaws.com/cogs/layer.tif", True),
+        ("https://resilienceatlas.s3.us-east-1.amazonaws.com/cogs/layer.tif", True),
+        ("https://resilienceatlas.s3.amazonaws.com.evil.com/cogs/layer.tif", False),
+        ("https://s3.amazonaws.com/resilienceatlas/cogs/layer.tif", True),
+        ("https://s3.eu-west-1.amazonaws.com/other-bucket/layer.tif", False),
+        ("https://s3.amazonaws.com/", False),
+        ("gs://trendsearth-public/data/layer.tif", True),
+        ("https://storage.googleapis.com/trendsearth-public/data/layer.tif", True),
+        ("https://storage.cloud.google.com/trendsearth-public/data/layer.tif", True),
+        ("https://storage.googleapis.com.evil.com/trendsearth-public/layer.tif", False),
+        ("file:///etc/passwd", False),
+        ("", False),
+    ],
+)
+def test_is_url_allowed(allowed_buckets, url, expected):
+    assert app.is_url_allowed(url) is expected
+    # Second lookup is served from the verdict cache and must agree
+    assert app.is_url_allowed(url) is expected
+
+
+def test_verdicts_are_cached(allowed_buckets):
+    url = "s3://resilienceatlas/cogs/layer.tif"
+    app.is_url_allowed(url)
+    app.is_url_allowed(url)
+    assert app._cached_url_verdict.cache_info().hits == 1
+
+
+@pytest.fixture()
+def client(allowed_buckets):
+    from starlette.testclient import TestClient
+
+    return TestClient(app.app)
+
+
+def test_middleware_denies_foreign_bucket(client):
+    response = client.get("/info", params={"url": "s3://other-bucket/layer.tif"})
+    assert response.status_code == 403
+    assert "Access denied" in response.json()["detail"]
+    assert "s3://resilienceatlas" in response.json()["detail"]
+
+
+def test_middleware_skips_healthz(client):
+    response = client.get("/healthz", params={"url": "s3://other-bucket/layer.tif"})
+    assert response.status_code == 200
+    assert response.json() == {"ping": "pong!"}
+
+
+def test_middleware_passes_requests_without_url(client):
+    response = client.get("/healthz")
+    assert response.status_code == 200
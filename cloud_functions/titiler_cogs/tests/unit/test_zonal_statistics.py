@@ -0,0 +1,109 @@
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+numpy = pytest.importorskip("numpy")
+
+from titiler_cogs import app  # noqa: E402
+
+from .conftest import write_cog  # noqa: E402
+
+URL = "s3://resilienceatlas/cogs/zonal.tif"
+# Left half of the 0-8 degree square the test raster covers
+LEFT_HALF = {"type": "Polygon", "coordinates": [[[0, 0], [4, 0], [4, 8], [0, 8], [0, 0]]]}
+
+
+@pytest.fixture()
+def cog_path(tmp_path):
+    """1024px COG: value = column // 128 (0-7), with the top rows set to nodata."""
+    data = numpy.repeat(numpy.arange(1024, dtype="int16")[None, :] // 128, 1024, axis=0)
+    data[:128] = -1
+    return write_cog(tmp_path / "zonal.tif", data[None], (0, 0, 8, 8), nodata=-1, BLOCKSIZE=256)
+
+
+def test_geometry_hash_ignores_key_order():
+    reordered = {"coordinates": LEFT_HALF["coordinates"], "type": "Polygon"}
+    assert app.geometry_hash(reordered) == app.geometry_hash(LEFT_HALF)
+
+
+def test_pick_overview(cog_path):
+    with rasterio.open(cog_path) as dataset:
+        assert dataset.overviews(1) == [2, 4]
+        assert app.pick_overview(dataset, (1024, 1024), None, 2_000_000) == 1
+        # Coarsest level still at least as fine as 1/40 degree
+        assert app.pick_overview(dataset, (1024, 1024), 1 / 40, 2_000_000) == 2
+        # The pixel budget wins over the requested resolution
+        assert app.pick_overview(dataset, (1024, 1024), 1 / 200, 100_000) == 4
+
+
+def test_zonal_values_reads_only_touched_blocks(cog_path):
+    with rasterio.open(cog_path) as dataset:
+        read = app.zonal_values(dataset, LEFT_HALF, [1])
+    values = read["values"][0]
+    assert read["factor"] == 1
+    assert read["pixels"] == 512 * 1024
+    # Four block columns of the eight are right of the geometry
+    assert read["blocks"] == 8
+    assert values.size == 512 * (1024 - 128)
+    assert set(numpy.unique(values)) == {0, 1, 2, 3}
+
+
+def test_band_statistics():
+    values = numpy.array([1, 1, 2, 3], dtype="uint8")
+    stats = app.band_statistics(values, 5, [50], bins=3)
+    assert stats["count"] == 4 and stats["masked_pixels"] == 1
+    assert stats["mean"] == 1.75 and stats["percentile_50"] == 1.5
+    assert stats["histogram"][0] == [2, 1, 1]
+
+    categorical = app.band_statistics(values, 4, [50], categorical=True, categories=[1, 3, 9])
+    assert categorical["histogram"] == [[2, 1, 0], [1, 3, 9]]
+    assert categorical["majority"] == 1
+
+
+@pytest.fixture()
+def client(cog_path, serve_cogs):
+    from starlette.testclient import TestClient
+
+    serve_cogs({URL: cog_path})
+    app._zonal_cache.clear()
+    return TestClient(app.app)
+
+
+def test_endpoint_caches_by_geometry(client):
+    feature = {"type": "Feature", "properties": {"name": "aoi"}, "geometry": LEFT_HALF}
+    first = client.post("/statistics/zonal", params={"url": URL, "p": [50]}, json=feature)
+    assert first.status_code == 200
+    assert first.headers["X-Zonal-Cache"] == "MISS"
+    properties = first.json()["properties"]
+    assert properties["name"] == "aoi"
+    assert properties["statistics"]["b1"]["max"] == 3
+    assert properties["zonal"]["factor"] == 1
+
+    second = client.post("/statistics/zonal", params={"url": URL, "p": [50]}, json=feature)
+    assert second.headers["X-Zonal-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+
+def test_endpoint_outside_dataset(client):
+    feature = {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [50, 50]}}
+    response = client.post("/statistics/zonal", params={"url": URL}, json=feature)
+    assert response.status_code == 404
+
+
+def test_endpoint_cache_follows_dataset_version(client, cog_path, serve_cogs):
+    feature = {"type": "Feature", "properties": {}, "geometry": LEFT_HALF}
+    assert client.post("/statistics/zonal", params={"url": URL}, json=feature).headers["X-Zonal-Cache"] == "MISS"
+
+    # An overwritten COG gets a new ETag
+    serve_cogs({URL: cog_path}, version="v2")
+    assert client.post("/statistics/zonal", params={"url": URL}, json=feature).headers["X-Zonal-Cache"] == "MISS"
+    assert client.post("/statistics/zonal", params={"url": URL}, json=feature).headers["X-Zonal-Cache"] == "HIT"
+
+
+def test_endpoint_does_not_cache_unversioned_datasets(client, cog_path, serve_cogs):
+    serve_cogs({URL: cog_path}, version="")
+    feature = {"type": "Feature", "properties": {}, "geometry": LEFT_HALF}
+    for _ in range(2):
+        response = client.post("/statistics/zonal", params={"url": URL}, json=feature)
+        assert response.status_code == 200
+        assert response.headers["X-Zonal-Cache"] == "BYPASS"
+    assert not app._zonal_cache
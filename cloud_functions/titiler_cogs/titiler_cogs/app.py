@@ -1,14 +1,52 @@
+import abc
+import gzip
+import hashlib
+import json
 import logging
+import math
 import os
 import re
-from urllib.parse import urlparse
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal
+from urllib.parse import parse_qsl, urlencode, urlparse
+import attr
+import numpy
+import rasterio
+import rasterio.errors
+import requests
+from affine import Affine
+from cogeo_mosaic.backends.base import MosaicJSONBackend
+from cogeo_mosaic.errors import MosaicError
+from cogeo_mosaic.mosaic import MosaicJSON
+from geojson_pydantic import Feature
 from mangum import Mangum
+from pmtiles.tile import Compression, deserialize_directory, deserialize_header, find_tile, zxy_to_tileid
+from rasterio.features import bounds as feature_bounds, geometry_mask
+from rasterio.warp import transform as warp_transform, transform_geom
+from rasterio.windows import Window, transform as window_transform
+from rio_tiler.constants import WEB_MERCATOR_TMS
+from rio_tiler.errors import TileOutsideBounds
+from rio_tiler.io import Reader
 from titiler.core.factory import TilerFactory
 from titiler.core.errors import DEFAULT_STATUS_CODES, add_exception_handlers
 from titiler.core.middleware import CacheControlMiddleware
+from titiler.core.resources.enums import ImageType
+from titiler.core.utils import render_image
+from titiler.mosaic.factory import MosaicTilerFactory
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, Query, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import QueryParams
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import rollbar
 from rollbar.contrib.fastapi import ReporterMiddleware as RollbarMiddleware
 
@@ -71,7 +109,12 @@ def _get_allowed_buckets() -> dict[str, set[str]]:
             "Set it with comma-separated bucket URIs (e.g., 's3://my-bucket,gs://my-gcs-bucket')."
         )
     
-    # Parse bucket URIs into (provider, bucket_name) sets
+    _allowed_buckets = _parse_allowed_buckets(raw)
+    return _allowed_buckets
+
+
+def _parse_allowed_buckets(raw: list[str]) -> dict[str, set[str]]:
+    """Parse bucket URIs into (provider, bucket_name) sets."""
     buckets: dict[str, set[str]] = {"s3": set(), "gs": set()}
     
     for bucket_uri in raw:
@@ -95,8 +138,15 @@ def _get_allowed_buckets() -> dict[str, set[str]]:
             "Set TITILER_ALLOWED_BUCKETS with URIs like 's3://my-bucket,gs://my-gcs-bucket'."
         )
     
-    _allowed_buckets = buckets
-    return _allowed_buckets
+    return buckets
+
+
+def set_allowed_buckets(uris: list[str] | None):
+    """Replace the whitelist (e.g. in tests); None re-reads TITILER_ALLOWED_BUCKETS on next use."""
+    global _allowed_buckets
+    
+    _allowed_buckets = _parse_allowed_buckets(uris) if uris is not None else None
+    _cached_url_verdict.cache_clear()
 
 
 def _format_allowed_buckets() -> str:
@@ -110,128 +160,1072 @@ def _format_allowed_buckets() -> str:
     return ", ".join(sorted(buckets))
 
 
-def is_url_allowed(url: str) -> bool:
-    """Check if the URL is from an allowed cloud storage bucket.
-    
-    Validates against strict URL patterns for AWS S3 and Google Cloud Storage
-    to prevent spoofing. Checks both the provider and bucket name.
-    """
-    if not url:
-        return False
-    
-    allowed = _get_allowed_buckets()
+# AWS S3 URL formats:
+# - s3://bucket-name/key
+# - https://bucket-name.s3.amazonaws.com/key
+# - https://bucket-name.s3.region.amazonaws.com/key
+# - https://s3.amazonaws.com/bucket-name/key
+# - https://s3.region.amazonaws.com/bucket-name/key
+#
+# Google Cloud Storage URL formats:
+# - gs://bucket-name/key
+# - https://storage.googleapis.com/bucket-name/key
+# - https://storage.cloud.google.com/bucket-name/key
+
+# Virtual-hosted style: bucket-name.s3.amazonaws.com or bucket-name.s3.region.amazonaws.com
+# Pattern ensures host ENDS with .amazonaws.com (no suffix allowed)
+_S3_VIRTUAL_HOSTED_PATTERN = re.compile(
+    r'^(?P<bucket>[a-z0-9][a-z0-9.-]+[a-z0-9])\.s3(\.(?P<region>[a-z0-9-]+))?\.amazonaws\.com$'
+)
+
+# Path-style: s3.amazonaws.com/bucket-name or s3.region.amazonaws.com/bucket-name
+# Pattern ensures host is EXACTLY s3.amazonaws.com or s3.region.amazonaws.com
+_S3_PATH_STYLE_PATTERN = re.compile(
+    r'^s3(\.(?P<region>[a-z0-9-]+))?\.amazonaws\.com$'
+)
+
+# GCS hosts are matched EXACTLY (path-style and authenticated URL style)
+_GCS_HOSTS = frozenset({"storage.googleapis.com", "storage.cloud.google.com"})
+
+# Number of distinct `url` values whose verdict is remembered. A map pan asks
+# for hundreds of tiles of the same handful of COGs, so hits dominate.
+_URL_VERDICT_CACHE_SIZE = int(os.environ.get("TITILER_URL_CACHE_SIZE", "4096"))
+
+
+def _first_path_segment(path: str) -> str:
+    """Return the first segment of a URL path (the bucket for path-style URLs)."""
+    return path.strip("/").split("/", 1)[0]
+
+
+def _match_url(url: str, allowed: dict[str, set[str]]) -> bool:
+    """Match a URL against the allowed buckets using the precompiled patterns."""
     parsed = urlparse(url)
     
-    # AWS S3 URL formats:
-    # - s3://bucket-name/key
-    # - https://bucket-name.s3.amazonaws.com/key
-    # - https://bucket-name.s3.region.amazonaws.com/key
-    # - https://s3.amazonaws.com/bucket-name/key
-    # - https://s3.region.amazonaws.com/bucket-name/key
-    #
-    # Google Cloud Storage URL formats:
-    # - gs://bucket-name/key
-    # - https://storage.googleapis.com/bucket-name/key
-    # - https://storage.cloud.google.com/bucket-name/key
-    
-    # Native S3 scheme
+    # Native S3 / GCS schemes
     if parsed.scheme == "s3":
-        bucket = parsed.netloc
-        return bucket in allowed["s3"]
+        return parsed.netloc in allowed["s3"]
     
-    # Native GCS scheme
     if parsed.scheme == "gs":
-        bucket = parsed.netloc
-        return bucket in allowed["gs"]
+        return parsed.netloc in allowed["gs"]
     
     if parsed.scheme in ("http", "https"):
-        host = parsed.netloc.lower()
-        
         # Remove port if present
-        if ":" in host:
-            host = host.split(":")[0]
+        host = parsed.netloc.lower().split(":", 1)[0]
         
         # === AWS S3 URL patterns ===
-        
-        # Virtual-hosted style: bucket-name.s3.amazonaws.com or bucket-name.s3.region.amazonaws.com
-        # Pattern ensures host ENDS with .amazonaws.com (no suffix allowed)
-        s3_virtual_hosted_pattern = re.compile(
-            r'^(?P<bucket>[a-z0-9][a-z0-9.-]+[a-z0-9])\.s3(\.(?P<region>[a-z0-9-]+))?\.amazonaws\.com$'
-        )
-        match = s3_virtual_hosted_pattern.match(host)
+        match = _S3_VIRTUAL_HOSTED_PATTERN.match(host)
         if match:
-            bucket = match.group('bucket')
-            return bucket in allowed["s3"]
+            return match.group('bucket') in allowed["s3"]
         
-        # Path-style: s3.amazonaws.com/bucket-name or s3.region.amazonaws.com/bucket-name
-        # Pattern ensures host is EXACTLY s3.amazonaws.com or s3.region.amazonaws.com
-        s3_path_style_pattern = re.compile(
-            r'^s3(\.(?P<region>[a-z0-9-]+))?\.amazonaws\.com$'
-        )
-        match = s3_path_style_pattern.match(host)
-        if match:
-            path_parts = parsed.path.strip("/").split("/")
-            if path_parts and path_parts[0]:
-                bucket = path_parts[0]
+        if _S3_PATH_STYLE_PATTERN.match(host):
+            bucket = _first_path_segment(parsed.path)
+            if bucket:
                 return bucket in allowed["s3"]
         
         # === Google Cloud Storage URL patterns ===
-        
-        # GCS path-style: storage.googleapis.com/bucket-name/key
-        # Pattern ensures host is EXACTLY storage.googleapis.com
-        if host == "storage.googleapis.com":
-            path_parts = parsed.path.strip("/").split("/")
-            if path_parts and path_parts[0]:
-                bucket = path_parts[0]
-                return bucket in allowed["gs"]
-        
-        # GCS authenticated URL style: storage.cloud.google.com/bucket-name/key
-        # Pattern ensures host is EXACTLY storage.cloud.google.com
-        if host == "storage.cloud.google.com":
-            path_parts = parsed.path.strip("/").split("/")
-            if path_parts and path_parts[0]:
-                bucket = path_parts[0]
+        if host in _GCS_HOSTS:
+            bucket = _first_path_segment(parsed.path)
+            if bucket:
                 return bucket in allowed["gs"]
     
     # Reject all other URL formats
     return False
 
 
-class BucketWhitelistMiddleware(BaseHTTPMiddleware):
+@lru_cache(maxsize=_URL_VERDICT_CACHE_SIZE)
+def _cached_url_verdict(url: str) -> bool:
+    """Memoized verdict for a raw `url` query parameter."""
+    return _match_url(url, _get_allowed_buckets())
+
+
+def is_url_allowed(url: str) -> bool:
+    """Check if the URL is from an allowed cloud storage bucket.
+    
+    Validates against strict URL patterns for AWS S3 and Google Cloud Storage
+    to prevent spoofing. Checks both the provider and bucket name.
+    
+    Verdicts are cached per raw URL string; the whitelist is fixed for the
+    life of the container, so a cached verdict never goes stale.
+    """
+    if not url:
+        return False
+    
+    return _cached_url_verdict(url)
+
+
+class BucketWhitelistMiddleware:
     """Middleware to restrict access to whitelisted cloud storage buckets only.
     
     Supports AWS S3 and Google Cloud Storage buckets.
+    
+    Implemented as plain ASGI (rather than BaseHTTPMiddleware) so allowed
+    requests are passed straight through without an extra task or response
+    streaming wrapper.
     """
     
-    async def dispatch(self, request: Request, call_next):
-        # Skip health check
-        if request.url.path == "/healthz":
-            return await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip non-HTTP traffic and health check
+        if scope["type"] != "http" or scope["path"] == "/healthz":
+            await self.app(scope, receive, send)
+            return
         
         # Check the 'url' query parameter
-        url_param = request.query_params.get("url")
+        url_param = QueryParams(scope.get("query_string", b"")).get("url")
         if url_param and not is_url_allowed(url_param):
-            raise HTTPException(
+            response = JSONResponse(
                 status_code=403,
-                detail=f"Access denied. Only whitelisted cloud storage buckets are allowed. "
-                       f"Allowed buckets: {_format_allowed_buckets()}"
+                content={
+                    "detail": f"Access denied. Only whitelisted cloud storage buckets are allowed. "
+                              f"Allowed buckets: {_format_allowed_buckets()}"
+                },
+            )
+            await response(scope, receive, send)
+            return
+        
+        await self.app(scope, receive, send)
+
+
+# In-process cache of opened COG datasets
+# Opening a COG costs one or more ranged GETs for the header and IFDs. Warm
+# Lambda containers keep a pool of opened rasterio datasets keyed by URL +
+# ETag so repeated tiles of the same layer skip that work entirely.
+# Configure via TITILER_DATASET_CACHE_SIZE (idle handles kept, 0 disables),
+# TITILER_DATASET_CACHE_TTL (seconds a handle may be reused) and
+# TITILER_ETAG_TTL (seconds an ETag lookup is trusted before re-checking).
+
+_ETAG_TABLE_LIMIT = 10000
+
+_s3_client = None
+
+
+def _get_s3_client():
+    """Lazily create a boto3 S3 client (honours AWS_ENDPOINT_URL for local stand-ins)."""
+    global _s3_client
+    
+    if _s3_client is None:
+        import boto3
+        
+        _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+def _resolve_etag(url: str) -> str:
+    """Return a version tag for a dataset URL.
+    
+    Uses the object ETag for S3 and HTTP(S) URLs and mtime + size for local
+    files. Returns an empty string when no version can be determined, in
+    which case entries are only invalidated by TTL.
+    """
+    parsed = urlparse(url)
+    
+    try:
+        if parsed.scheme == "s3":
+            response = _get_s3_client().head_object(Bucket=parsed.netloc, Key=parsed.path.lstrip("/"))
+            return response.get("ETag", "").strip('"')
+        
+        if parsed.scheme in ("http", "https"):
+            response = requests.head(url, timeout=5, allow_redirects=True)
+            return response.headers.get("ETag", "").strip('"')
+        
+        if parsed.scheme in ("", "file"):
+            stat = os.stat(parsed.path if parsed.scheme == "file" else url)
+            return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except Exception as e:
+        logging.debug(f"Could not resolve ETag for {url}: {e}")
+    
+    return ""
+
+
+class DatasetCache:
+    """Size-bounded LRU pool of opened datasets with TTL expiry.
+    
+    Datasets are checked out for the duration of a request and checked back
+    in afterwards, so concurrent readers of the same URL never share a
+    handle: a busy key simply opens another one (counted as a miss).
+    """
+    
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        etag_ttl: float,
+        opener=rasterio.open,
+        etag_resolver=_resolve_etag,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.etag_ttl = etag_ttl
+        self._opener = opener
+        self._etag_resolver = etag_resolver
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (url, etag) -> [(opened_at, dataset), ...], least recently used first
+        self._idle: OrderedDict[tuple[str, str], list] = OrderedDict()
+        self._idle_count = 0
+        # url -> (resolved_at, etag)
+        self._etags: dict[str, tuple[float, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    def _etag(self, url: str) -> str:
+        now = self._clock()
+        with self._lock:
+            cached = self._etags.get(url)
+        if cached and now - cached[0] < self.etag_ttl:
+            return cached[1]
+        
+        etag = self._etag_resolver(url)
+        with self._lock:
+            # Keep the lookup table bounded on long-lived containers
+            if len(self._etags) >= _ETAG_TABLE_LIMIT:
+                self._etags.clear()
+            self._etags[url] = (now, etag)
+        return etag
+    
+    def version(self, url: str) -> str:
+        """Version tag (ETag, or mtime and size) of a URL, "" when unknown; cached for etag_ttl."""
+        return self._etag(url)
+    
+    def checkout(self, url: str):
+        """Return ((url, etag), dataset), reusing an idle handle when possible."""
+        key = (url, self._etag(url))
+        now = self._clock()
+        stale = []
+        dataset = None
+        
+        with self._lock:
+            # Any handle for an older ETag of this URL is stale
+            for other in [k for k in self._idle if k[0] == url and k != key]:
+                stale.extend(ds for _, ds in self._idle.pop(other))
+            
+            handles = self._idle.get(key, [])
+            while handles:
+                opened_at, candidate = handles.pop()
+                if now - opened_at < self.ttl:
+                    dataset = (opened_at, candidate)
+                    break
+                stale.append(candidate)
+            if not handles:
+                self._idle.pop(key, None)
+            
+            self.expirations += len(stale)
+            self._idle_count -= len(stale) + (1 if dataset else 0)
+            if dataset:
+                self.hits += 1
+            else:
+                self.misses += 1
+        
+        self._close(stale)
+        
+        if dataset:
+            return key, dataset
+        return key, (now, self._opener(url))
+    
+    def checkin(self, key: tuple[str, str], entry):
+        """Return a handle to the pool, evicting least recently used ones."""
+        evicted = []
+        
+        with self._lock:
+            self._idle.setdefault(key, []).append(entry)
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+            
+            while self._idle_count > self.max_entries:
+                oldest_key = next(iter(self._idle))
+                handles = self._idle[oldest_key]
+                evicted.append(handles.pop(0)[1])
+                if not handles:
+                    del self._idle[oldest_key]
+                self._idle_count -= 1
+                self.evictions += 1
+        
+        self._close(evicted)
+    
+    def use(self, opener=rasterio.open, etag_resolver=_resolve_etag):
+        """Open and version datasets with other callables (e.g. local files in tests); defaults restore S3."""
+        self.clear()
+        self._opener = opener
+        self._etag_resolver = etag_resolver
+    
+    def clear(self):
+        """Close every idle handle and forget cached ETags."""
+        with self._lock:
+            handles = [ds for entries in self._idle.values() for _, ds in entries]
+            self._idle.clear()
+            self._idle_count = 0
+            self._etags.clear()
+        self._close(handles)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "idle": self._idle_count,
+                "keys": len(self._idle),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+    
+    @staticmethod
+    def _close(datasets):
+        for dataset in datasets:
+            try:
+                dataset.close()
+            except Exception as e:
+                logging.debug(f"Error closing cached dataset: {e}")
+
+
+dataset_cache = DatasetCache(
+    max_entries=int(os.environ.get("TITILER_DATASET_CACHE_SIZE", "32")),
+    ttl=float(os.environ.get("TITILER_DATASET_CACHE_TTL", "300")),
+    etag_ttl=float(os.environ.get("TITILER_ETAG_TTL", "60")),
+)
+
+
+@attr.s
+class CachedReader(Reader):
+    """rio-tiler Reader that borrows its dataset from `dataset_cache`."""
+    
+    _cache_entry = attr.ib(init=False, default=None)
+    
+    def __attrs_post_init__(self):
+        if self.dataset is None and dataset_cache.enabled:
+            key, (opened_at, dataset) = dataset_cache.checkout(self.input)
+            if dataset.gcps[0]:
+                # GCP-referenced rasters need the WarpedVRT set up by Reader
+                dataset.close()
+            else:
+                self.dataset = dataset
+                self._cache_entry = (key, (opened_at, dataset))
+        
+        try:
+            super().__attrs_post_init__()
+        except Exception:
+            # Don't return a handle that failed to initialise to the pool
+            if self._cache_entry is not None:
+                self._cache_entry = None
+                self.dataset.close()
+            raise
+    
+    def close(self):
+        if self._cache_entry is not None:
+            key, entry = self._cache_entry
+            self._cache_entry = None
+            dataset_cache.checkin(key, entry)
+        super().close()
+
+
+# Rendered tile cache
+# Popular z/x/y tiles are requested by many users; keeping the rendered bytes
+# avoids re-running rio-tiler for each of them on a warm container.
+# Configure via TITILER_TILE_CACHE ("memory", "disk" or "off"),
+# TITILER_TILE_CACHE_MAX_BYTES, TITILER_TILE_CACHE_TTL and, for the disk
+# backend, TITILER_TILE_CACHE_DIR.
+
+_TILE_PATH_PATTERN = re.compile(r"^(/mosaic)?/tiles/")
+
+
+def tile_cache_key(path: str, query_string: bytes) -> str:
+    """Canonical cache key: hash of the path plus sorted query parameters."""
+    params = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    canonical = path + "?" + urlencode(params)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class TileCache(abc.ABC):
+    """Interface for rendered tile cache backends.
+    
+    Entries are (status, headers, body) tuples where headers is the raw ASGI
+    header list of the original response. Backends doing file or network I/O
+    set `blocking` so the middleware calls them from the thread pool.
+    """
+    
+    blocking = False
+    
+    def __init__(self, max_bytes: int, ttl: float, clock=time.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @abc.abstractmethod
+    def get(self, key: str):
+        """Return the cached entry, or None when missing or expired."""
+    
+    @abc.abstractmethod
+    def set(self, key: str, entry: tuple[int, list, bytes]):
+        """Store an entry, evicting others to stay within max_bytes."""
+    
+    @abc.abstractmethod
+    def size(self) -> tuple[int, int]:
+        """Return (entry count, total bytes)."""
+    
+    def stats(self) -> dict:
+        entries, total_bytes = self.size()
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class MemoryTileCache(TileCache):
+    """LRU tile cache bounded by total body bytes."""
+    
+    def __init__(self, max_bytes: int, ttl: float, clock=time.time):
+        super().__init__(max_bytes, ttl, clock)
+        self._entries: OrderedDict[str, tuple[float, tuple[int, list, bytes]]] = OrderedDict()
+        self._bytes = 0
+    
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item and self._clock() - item[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item:
+                self._remove(key)
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, entry: tuple[int, list, bytes]):
+        body_size = len(entry[2])
+        if body_size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock(), entry)
+            self._bytes += body_size
+            
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def size(self) -> tuple[int, int]:
+        with self._lock:
+            return len(self._entries), self._bytes
+    
+    def _remove(self, key: str):
+        _, entry = self._entries.pop(key)
+        self._bytes -= len(entry[2])
+
+
+class DiskTileCache(TileCache):
+    """Tile cache on local disk (e.g. Lambda /tmp), evicting least recently used files."""
+    
+    blocking = True
+    
+    def __init__(self, directory: str, max_bytes: int, ttl: float, clock=time.time):
+        super().__init__(max_bytes, ttl, clock)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # key -> file size, least recently used first
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        
+        # Pick up entries left by a previous container using the same directory
+        existing = sorted(self.directory.glob("*.tile"), key=lambda p: p.stat().st_mtime)
+        for path in existing:
+            size = path.stat().st_size
+            self._index[path.stem] = size
+            self._bytes += size
+    
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.tile"
+    
+    def get(self, key: str):
+        path = self._path(key)
+        
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            
+            try:
+                if self._clock() - path.stat().st_mtime >= self.ttl:
+                    self._remove(key)
+                    self.misses += 1
+                    return None
+                data = path.read_bytes()
+            except OSError:
+                self._index.pop(key, None)
+                self.misses += 1
+                return None
+            
+            self._index.move_to_end(key)
+            self.hits += 1
+        
+        header_length = int.from_bytes(data[:4], "big")
+        meta = json.loads(data[4:4 + header_length])
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in meta["headers"]]
+        return meta["status"], headers, data[4 + header_length:]
+    
+    def set(self, key: str, entry: tuple[int, list, bytes]):
+        status, headers, body = entry
+        meta = json.dumps({
+            "status": status,
+            "headers": [(k.decode("latin-1"), v.decode("latin-1")) for k, v in headers],
+        }).encode()
+        data = len(meta).to_bytes(4, "big") + meta + body
+        if len(data) > self.max_bytes:
+            return
+        
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        # The temp file is per thread: only the rename has to agree with the index
+        try:
+            tmp_path.write_bytes(data)
+        except OSError as e:
+            logging.warning(f"Could not write tile cache entry: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        
+        with self._lock:
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logging.warning(f"Could not write tile cache entry: {e}")
+                tmp_path.unlink(missing_ok=True)
+                return
+            
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._index)))
+                self.evictions += 1
+    
+    def size(self) -> tuple[int, int]:
+        with self._lock:
+            return len(self._index), self._bytes
+    
+    def _remove(self, key: str):
+        self._bytes -= self._index.pop(key)
+        self._path(key).unlink(missing_ok=True)
+
+
+def _create_tile_cache() -> TileCache | None:
+    """Build the tile cache backend selected by TITILER_TILE_CACHE."""
+    backend = os.environ.get("TITILER_TILE_CACHE", "memory").lower()
+    ttl = float(os.environ.get("TITILER_TILE_CACHE_TTL", "3600"))
+    
+    if backend == "memory":
+        max_bytes = int(os.environ.get("TITILER_TILE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+        return MemoryTileCache(max_bytes=max_bytes, ttl=ttl)
+    
+    if backend == "disk":
+        max_bytes = int(os.environ.get("TITILER_TILE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        directory = os.environ.get("TITILER_TILE_CACHE_DIR", "/tmp/titiler-tiles")
+        return DiskTileCache(directory, max_bytes=max_bytes, ttl=ttl)
+    
+    if backend != "off":
+        logging.warning(f"Unknown TITILER_TILE_CACHE backend '{backend}', tile cache disabled")
+    return None
+
+
+tile_cache = _create_tile_cache()
+
+
+class TileCacheMiddleware:
+    """Serve rendered tiles from `tile_cache`, storing successful renders.
+    
+    Adds an `X-Tile-Cache: HIT|MISS` header to cacheable tile responses.
+    """
+    
+    def __init__(self, app: ASGIApp, cache: TileCache | None = None):
+        self.app = app
+        self.cache = cache
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        cache = self.cache or tile_cache
+        if (
+            cache is None
+            or scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not _TILE_PATH_PATTERN.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        key = tile_cache_key(scope["path"], scope.get("query_string", b""))
+        cached = await run_in_threadpool(cache.get, key) if cache.blocking else cache.get(key)
+        if cached is not None:
+            status, headers, body = cached
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers + [(b"x-tile-cache", b"HIT")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        
+        response_start = {}
+        body_parts = []
+        
+        async def send_wrapper(message: Message):
+            entry = None
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-tile-cache", b"MISS")]}
+            elif message["type"] == "http.response.body" and response_start.get("status") == 200:
+                body_parts.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    entry = (200, list(response_start.get("headers", [])), b"".join(body_parts))
+            await send(message)
+            
+            # Store after the client has the tile so a slow write does not delay it
+            if entry is not None:
+                if cache.blocking:
+                    await run_in_threadpool(cache.set, key, entry)
+                else:
+                    cache.set(key, entry)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
+# Pre-rendered tile archives
+# The most viewed layers are seeded offline at low zooms into PMTiles archives
+# by seed_tiles.py, which renders them through this app. Each archive records
+# the tile path template and query string it was seeded with. Matching tile
+# requests are answered with ranged reads of the archive (header, metadata and
+# root directory are read once, leaf directories are cached) and fall back to
+# dynamic rendering for tiles the archive does not hold.
+# Configure via TITILER_TILE_ARCHIVES (comma-separated s3://, http(s):// or
+# local archive paths) and TITILER_TILE_ARCHIVE_TTL (seconds before the
+# archives are re-opened to pick up re-seeded ones).
+
+_ARCHIVE_TILE_PATTERN = re.compile(
+    r"^(?P<prefix>/mosaic)?/tiles/(?P<tms>[^/]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)(?P<suffix>(@\dx)?(\.\w+)?)$"
+)
+# PMTiles puts the header and root directory in the first 16 KB
+_ARCHIVE_HEAD_BYTES = 16384
+_ARCHIVE_LEAF_CACHE_SIZE = 64
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8", "image/jpeg"),
+    (b"RIFF", "image/webp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+
+def archive_template(path: str) -> str | None:
+    """Tile path with z/x/y replaced by placeholders, None for non-tile paths."""
+    match = _ARCHIVE_TILE_PATTERN.match(path)
+    if match is None:
+        return None
+    return f"{match['prefix'] or ''}/tiles/{match['tms']}/{{z}}/{{x}}/{{y}}{match['suffix']}"
+
+
+def _range_reader(url: str):
+    """Return fetch(offset, length) -> bytes reading a byte range of `url`."""
+    parsed = urlparse(url)
+    
+    if parsed.scheme == "s3":
+        def fetch(offset: int, length: int) -> bytes:
+            response = _get_s3_client().get_object(
+                Bucket=parsed.netloc, Key=parsed.path.lstrip("/"), Range=f"bytes={offset}-{offset + length - 1}"
             )
+            return response["Body"].read()
+    elif parsed.scheme in ("gs", "http", "https"):
+        if parsed.scheme == "gs":
+            url = f"https://storage.googleapis.com/{parsed.netloc}{parsed.path}"
+        
+        def fetch(offset: int, length: int) -> bytes:
+            response = requests.get(url, headers={"Range": f"bytes={offset}-{offset + length - 1}"}, timeout=10)
+            response.raise_for_status()
+            # Servers ignoring Range send the whole object
+            if response.status_code == 200:
+                return response.content[offset:offset + length]
+            return response.content
+    else:
+        path = parsed.path if parsed.scheme == "file" else url
         
-        return await call_next(request)
+        def fetch(offset: int, length: int) -> bytes:
+            with open(path, "rb") as f:
+                return os.pread(f.fileno(), length, offset)
+    
+    return fetch
+
+
+class TileArchive:
+    """One PMTiles archive read with ranged requests."""
+    
+    def __init__(self, url: str, fetch=None):
+        self.url = url
+        self._fetch = fetch or _range_reader(url)
+        head = self._fetch(0, _ARCHIVE_HEAD_BYTES)
+        self.header = deserialize_header(head[:127])
+        if self.header["tile_compression"] not in (Compression.NONE, Compression.UNKNOWN):
+            raise ValueError(f"Unsupported tile compression {self.header['tile_compression']}")
+        
+        self._root = deserialize_directory(self._read(head, self.header["root_offset"], self.header["root_length"]))
+        metadata = self._read(head, self.header["metadata_offset"], self.header["metadata_length"])
+        if self.header["internal_compression"] == Compression.GZIP:
+            metadata = gzip.decompress(metadata)
+        self.metadata = json.loads(metadata)
+        
+        self._leaves: OrderedDict[tuple[int, int], list] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _read(self, head: bytes, offset: int, length: int) -> bytes:
+        if offset + length <= len(head):
+            return head[offset:offset + length]
+        return self._fetch(offset, length)
+    
+    def _leaf(self, offset: int, length: int) -> list:
+        key = (offset, length)
+        with self._lock:
+            entries = self._leaves.get(key)
+            if entries is not None:
+                self._leaves.move_to_end(key)
+                return entries
+        
+        entries = deserialize_directory(self._fetch(offset, length))
+        with self._lock:
+            self._leaves[key] = entries
+            while len(self._leaves) > _ARCHIVE_LEAF_CACHE_SIZE:
+                self._leaves.popitem(last=False)
+        return entries
+    
+    def get(self, z: int, x: int, y: int) -> bytes | None:
+        """Tile bytes, or None when the archive does not hold the tile."""
+        if not self.header["min_zoom"] <= z <= self.header["max_zoom"]:
+            return None
+        
+        tile_id = zxy_to_tileid(z, x, y)
+        directory = self._root
+        # The spec allows at most three levels of leaf directories
+        for _ in range(4):
+            entry = find_tile(directory, tile_id)
+            if entry is None:
+                return None
+            if entry.run_length > 0:
+                return self._fetch(self.header["tile_data_offset"] + entry.offset, entry.length)
+            directory = self._leaf(self.header["leaf_directory_offset"] + entry.offset, entry.length)
+        return None
+
+
+class TileArchives:
+    """Seeded archives keyed by the tile request they answer.
+    
+    The key is `tile_cache_key` of the archive's path template and query
+    string, so a request matches when it differs only in z/x/y and the order
+    of its query parameters. Archives are reopened every `ttl` seconds by one
+    request, outside the lock; the others keep using the loaded archives.
+    """
+    
+    def __init__(self, urls: list[str], ttl: float, clock=time.monotonic):
+        self.urls = urls
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._archives: dict[str, TileArchive] = {}
+        self._loaded_at: float | None = None
+        self._loading = False
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+    
+    def _load(self, previous: dict[str, TileArchive]) -> dict[str, TileArchive]:
+        """Open every archive, keeping the previously loaded one of a URL that fails to open."""
+        loaded = {archive.url: (key, archive) for key, archive in previous.items()}
+        archives = {}
+        for url in self.urls:
+            try:
+                archive = TileArchive(url)
+                seeded = archive.metadata["titiler"]
+                archives[tile_cache_key(seeded["path"], seeded["query"].encode())] = archive
+            except Exception as e:
+                logging.warning(f"Could not open tile archive {url}: {e}")
+                if url in loaded:
+                    key, archive = loaded[url]
+                    archives[key] = archive
+        return archives
+    
+    def lookup(self, path: str, query_string: bytes) -> TileArchive | None:
+        template = archive_template(path)
+        if template is None:
+            return None
+        
+        now = self._clock()
+        with self._lock:
+            reload = not self._loading and (self._loaded_at is None or now - self._loaded_at >= self.ttl)
+            if reload:
+                self._loading = True
+            previous = self._archives
+        
+        if reload:
+            archives = previous
+            try:
+                archives = self._load(previous)
+            finally:
+                with self._lock:
+                    self._archives = archives
+                    self._loaded_at = now
+                    self._loading = False
+        
+        with self._lock:
+            return self._archives.get(tile_cache_key(template, query_string))
+    
+    def get(self, path: str, query_string: bytes) -> bytes | None:
+        """Seeded bytes of a tile request, None when no archive holds the tile."""
+        archive = self.lookup(path, query_string)
+        match = _ARCHIVE_TILE_PATTERN.match(path)
+        data = archive.get(int(match["z"]), int(match["x"]), int(match["y"])) if archive else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+    
+    def clear(self):
+        with self._lock:
+            self._archives = {}
+            self._loaded_at = None
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "archives": [archive.url for archive in self._archives.values()],
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+tile_archives = TileArchives(
+    urls=[url.strip() for url in os.environ.get("TITILER_TILE_ARCHIVES", "").split(",") if url.strip()],
+    ttl=float(os.environ.get("TITILER_TILE_ARCHIVE_TTL", "900")),
+)
+
+
+class TileArchiveMiddleware:
+    """Serve seeded tiles from `tile_archives`, rendering the others.
+    
+    Adds an `X-Tile-Archive: HIT` header to tiles read from an archive.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            not tile_archives.enabled
+            or scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not _TILE_PATH_PATTERN.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            data = await run_in_threadpool(tile_archives.get, scope["path"], scope.get("query_string", b""))
+        except Exception as e:
+            logging.warning(f"Tile archive read failed for {scope['path']}: {e}")
+            data = None
+        if data is None:
+            await self.app(scope, receive, send)
+            return
+        
+        media_type = next((t for signature, t in _IMAGE_SIGNATURES if data.startswith(signature)), "application/octet-stream")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", media_type.encode()),
+                (b"content-length", str(len(data)).encode()),
+                (b"x-tile-archive", b"HIT"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+
+# MosaicJSON layers
+# The conversion pipeline writes one COG per CartoDB table and several of them
+# often make up one map layer. `manage_cog_conversion.py mosaic` builds a
+# MosaicJSON index of those COGs (quadkey -> assets) together with the lon/lat
+# footprint of each COG. For a tile under /mosaic/ the quadkeys covering it are
+# looked up, only the assets whose footprint intersects the tile are opened
+# (through CachedReader) and they are read in parallel by rio-tiler
+# (MOSAIC_CONCURRENCY threads). Parsed indexes are kept per warm container,
+# keyed by URL + ETag like opened datasets.
+# Configure via TITILER_MOSAIC_CACHE_SIZE (indexes kept) and
+# TITILER_API_DISABLE_MOSAIC ("true" removes the /mosaic routes).
+
+_MOSAIC_CACHE_SIZE = int(os.environ.get("TITILER_MOSAIC_CACHE_SIZE", "16"))
+_MOSAIC_DISABLED = os.environ.get("TITILER_API_DISABLE_MOSAIC", "false").lower() == "true"
+
+
+def _read_mosaic_bytes(url: str) -> bytes:
+    """Fetch a mosaic index from S3, GCS, HTTP(S) or a local path (gunzipping .gz)."""
+    parsed = urlparse(url)
+    
+    if parsed.scheme == "s3":
+        body = _get_s3_client().get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip("/"))["Body"].read()
+    elif parsed.scheme in ("gs", "http", "https"):
+        if parsed.scheme == "gs":
+            url = f"https://storage.googleapis.com/{parsed.netloc}{parsed.path}"
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        body = response.content
+    else:
+        body = Path(parsed.path if parsed.scheme == "file" else url).read_bytes()
+    
+    if parsed.path.endswith(".gz"):
+        body = gzip.decompress(body)
+    return body
+
+
+_mosaic_indexes: OrderedDict[tuple[str, str], tuple[MosaicJSON, dict, str]] = OrderedDict()
+_mosaic_indexes_lock = threading.Lock()
+
+
+def load_mosaic_index(url: str) -> tuple[MosaicJSON, dict, str]:
+    """Return (mosaic definition, asset footprints, mosaic id) for an index URL.
+    
+    Assets outside the allowed buckets are dropped so a mosaic cannot be used
+    to reach data the whitelist would refuse.
+    """
+    key = (url, dataset_cache._etag(url))
+    with _mosaic_indexes_lock:
+        cached = _mosaic_indexes.get(key)
+        if cached is not None:
+            _mosaic_indexes.move_to_end(key)
+            return cached
+    
+    body = _read_mosaic_bytes(url)
+    document = json.loads(body)
+    footprints = {asset: tuple(bbox) for asset, bbox in (document.pop("footprints", None) or {}).items()}
+    mosaic_def = MosaicJSON(**document)
+    
+    prefix = mosaic_def.asset_prefix or ""
+    tiles = {}
+    denied = set()
+    for quadkey, assets in mosaic_def.tiles.items():
+        kept = []
+        for asset in assets:
+            if is_url_allowed(prefix + asset):
+                kept.append(asset)
+            else:
+                denied.add(asset)
+        if kept:
+            tiles[quadkey] = kept
+    if denied:
+        logging.warning(f"Mosaic {url}: ignoring {len(denied)} assets outside the allowed buckets")
+        mosaic_def.tiles = tiles
+    
+    entry = (mosaic_def, footprints, hashlib.sha224(body).hexdigest())
+    with _mosaic_indexes_lock:
+        # Older versions of the same index are stale
+        for other in [k for k in _mosaic_indexes if k[0] == url and k != key]:
+            del _mosaic_indexes[other]
+        _mosaic_indexes[key] = entry
+        while len(_mosaic_indexes) > _MOSAIC_CACHE_SIZE:
+            _mosaic_indexes.popitem(last=False)
+    return entry
+
+
+@attr.s
+class FootprintMosaicBackend(MosaicJSONBackend):
+    """Read-only MosaicJSON backend that skips assets not covering the tile."""
+    
+    _footprints: dict = attr.ib(init=False, factory=dict)
+    _mosaic_id: str = attr.ib(init=False, default="")
+    
+    def _read(self) -> MosaicJSON:
+        mosaic_def, self._footprints, self._mosaic_id = load_mosaic_index(self.input)
+        return mosaic_def
+    
+    def write(self, overwrite: bool = True):
+        # Abstract in MosaicJSONBackend; this backend only serves indexes
+        raise MosaicError("Mosaic indexes are built with `manage_cog_conversion.py mosaic`")
+    
+    @property
+    def mosaicid(self) -> str:
+        # Hashing the whole document on every tile lookup is costly for big mosaics
+        return self._mosaic_id or super().mosaicid
+    
+    def get_assets(self, x: int, y: int, z: int, reverse: bool = False) -> list[str]:
+        assets = super().get_assets(x, y, z, reverse=reverse)
+        if not self._footprints:
+            return assets
+        
+        mosaic_tms = self.mosaic_def.tilematrixset or WEB_MERCATOR_TMS
+        west, south, east, north = mosaic_tms.bounds(x, y, z)
+        covering = []
+        for asset in assets:
+            footprint = self._footprints.get(asset)
+            if footprint is None or (
+                footprint[0] < east and footprint[2] > west and footprint[1] < north and footprint[3] > south
+            ):
+                covering.append(asset)
+        return covering
 
 
 # Create cog tiler
-cog = TilerFactory()
+cog = TilerFactory(reader=CachedReader)
+
+# Create mosaic tiler
+mosaic = MosaicTilerFactory(
+    backend=FootprintMosaicBackend,
+    dataset_reader=CachedReader,
+    router_prefix="/mosaic",
+)
 
 # Create FastAPI app
 app = FastAPI(title="Resilience COG tiler", description="Cloud Optimized GeoTIFF")
 
 app.include_router(cog.router, tags=["Cloud Optimized GeoTIFF"])
+if not _MOSAIC_DISABLED:
+    app.include_router(mosaic.router, prefix="/mosaic", tags=["MosaicJSON"])
 
 # Add Rollbar middleware for error tracking (must be first to catch all errors)
 if _rollbar_token:
     app.add_middleware(RollbarMiddleware)
 
+# Serve seeded tiles from archives (inside the tile cache so archive hits are cached too)
+app.add_middleware(TileArchiveMiddleware)
+
+# Add rendered tile cache (inside the whitelist so denied URLs never reach it)
+app.add_middleware(TileCacheMiddleware)
+
 # Add bucket whitelist middleware (must be added before other middlewares)
 # Supports both AWS S3 and Google Cloud Storage buckets
 app.add_middleware(BucketWhitelistMiddleware)
@@ -254,6 +1248,591 @@ app.add_middleware(
 add_exception_handlers(app, DEFAULT_STATUS_CODES)
 
 
+# Batch tile rendering
+# Map clients on slow connections fire dozens of tile requests per viewport.
+# This endpoint renders a list of z/x/y tiles of one COG in a thread pool and
+# returns them as a single multipart/mixed response. Each worker borrows a
+# dataset handle from `dataset_cache`, so the COG header is parsed once per
+# worker and reused across batches on a warm container.
+
+_BATCH_MAX_TILES = int(os.environ.get("TITILER_BATCH_MAX_TILES", "64"))
+_BATCH_WORKERS = int(os.environ.get("TITILER_BATCH_WORKERS", "8"))
+
+
+class TileBatchRequest(BaseModel):
+    """Tiles to render, as [z, x, y] triplets."""
+    
+    tiles: list[tuple[int, int, int]] = Field(..., min_length=1)
+
+
+def _encode_multipart(parts: list[tuple[dict[str, str], bytes]]) -> tuple[bytes, str]:
+    """Encode (headers, body) parts as multipart/mixed, returning (body, media type)."""
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for headers, body in parts:
+        chunks.append(f"--{boundary}\r\n".encode())
+        for name, value in headers.items():
+            chunks.append(f"{name}: {value}\r\n".encode())
+        chunks.append(b"\r\n")
+        chunks.append(body)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), f"multipart/mixed; boundary={boundary}"
+
+
+@app.post(
+    "/tiles/batch",
+    description="Render many tiles of one COG in a single multipart/mixed response",
+    tags=["Cloud Optimized GeoTIFF"],
+    response_class=Response,
+)
+def batch_tiles(
+    body: TileBatchRequest,
+    tileMatrixSetId: Literal[tuple(cog.supported_tms.list())] = Query(
+        "WebMercatorQuad", description="Tile matrix set identifier"
+    ),
+    format: ImageType = Query(ImageType.png, description="Output image format"),
+    src_path=Depends(cog.path_dependency),
+    reader_params=Depends(cog.reader_dependency),
+    tile_params=Depends(cog.tile_dependency),
+    layer_params=Depends(cog.layer_dependency),
+    dataset_params=Depends(cog.dataset_dependency),
+    post_process=Depends(cog.process_dependency),
+    colormap=Depends(cog.colormap_dependency),
+    render_params=Depends(cog.render_dependency),
+    env=Depends(cog.environment_dependency),
+):
+    """Render the requested tiles concurrently.
+    
+    Each part carries `X-Tile` (z/x/y) and `X-Tile-Status` headers; tiles
+    outside the dataset bounds come back with status 404 and an empty body.
+    """
+    if len(body.tiles) > _BATCH_MAX_TILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many tiles: {len(body.tiles)} (maximum {_BATCH_MAX_TILES})",
+        )
+    
+    tms = cog.supported_tms.get(tileMatrixSetId)
+    
+    def render(tile: tuple[int, int, int]) -> tuple[dict[str, str], bytes]:
+        z, x, y = tile
+        headers = {"X-Tile": f"{z}/{x}/{y}"}
+        try:
+            with rasterio.Env(**env):
+                with cog.reader(src_path, tms=tms, **reader_params.as_dict()) as src_dst:
+                    image = src_dst.tile(
+                        x, y, z,
+                        **tile_params.as_dict(),
+                        **layer_params.as_dict(),
+                        **dataset_params.as_dict(),
+                    )
+                    dst_colormap = getattr(src_dst, "colormap", None)
+        except TileOutsideBounds:
+            return {**headers, "X-Tile-Status": "404"}, b""
+        
+        if post_process:
+            image = post_process(image)
+        
+        content, media_type = render_image(
+            image,
+            output_format=format,
+            colormap=colormap or dst_colormap,
+            **render_params.as_dict(),
+        )
+        return {**headers, "X-Tile-Status": "200", "Content-Type": media_type}, content
+    
+    workers = max(1, min(_BATCH_WORKERS, len(body.tiles)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(render, body.tiles))
+    
+    content, media_type = _encode_multipart(parts)
+    return Response(content, media_type=media_type)
+
+
+# Zonal statistics
+# The analysis panel asks for statistics of drawn or administrative polygons.
+# For layers already published as COGs these are computed here instead of in
+# Earth Engine: the coarsest overview that still meets the requested
+# resolution is chosen, only the blocks of that level touched by the geometry
+# are read, and the valid pixels are reduced with NumPy. Results are cached
+# per dataset version (URL + ETag) and geometry hash.
+
+_ZONAL_MAX_PIXELS = int(os.environ.get("TITILER_ZONAL_MAX_PIXELS", "4000000"))
+_ZONAL_CACHE_SIZE = int(os.environ.get("TITILER_ZONAL_CACHE_SIZE", "256"))
+# Metres per degree of latitude, to compare metre resolutions with geographic CRSs
+_METERS_PER_DEGREE = 111320.0
+
+
+def geometry_hash(geometry: dict) -> str:
+    """Hash of a GeoJSON geometry that ignores key order and whitespace."""
+    canonical = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def resolution_in_crs_units(crs, meters: float) -> float:
+    """Convert a pixel size in metres to the units of `crs`."""
+    if crs.is_geographic:
+        return meters / _METERS_PER_DEGREE
+    return meters / crs.linear_units_factor[1]
+
+
+def pick_overview(dataset, window_shape: tuple[int, int], resolution: float | None, max_pixels: int) -> int:
+    """Decimation factor of the level to read a full resolution window from.
+
+    Takes the coarsest level whose pixel size is at most `resolution` (in
+    the dataset's CRS units; full resolution when no level is that fine),
+    then coarser levels while the window would exceed `max_pixels`.
+    """
+    factors = [1] + sorted(dataset.overviews(1))
+    pixel_size = abs(dataset.transform.a)
+    chosen = 0
+    if resolution:
+        for i, factor in enumerate(factors):
+            if pixel_size * factor <= resolution:
+                chosen = i
+
+    rows, cols = window_shape
+    while (
+        chosen + 1 < len(factors)
+        and math.ceil(rows / factors[chosen]) * math.ceil(cols / factors[chosen]) > max_pixels
+    ):
+        chosen += 1
+    return factors[chosen]
+
+
+def zonal_values(dataset, geometry: dict, indexes: list[int], resolution: float | None = None,
+                 max_pixels: int = _ZONAL_MAX_PIXELS, all_touched: bool = False) -> dict:
+    """Read the valid pixels of `indexes` inside a GeoJSON (EPSG:4326) geometry.
+
+    Returns a dict with `values` (one 1-D array per band), `pixels` (pixels
+    inside the geometry), the decimation `factor` and pixel size read, and
+    the number of `blocks` read. Blocks of the chosen level that the
+    geometry does not touch are never requested.
+    """
+    geometry = transform_geom("EPSG:4326", dataset.crs, geometry)
+
+    # Geometry bounds as a full resolution window, clipped to the dataset
+    left, bottom, right, top = feature_bounds(geometry)
+    inverse = ~dataset.transform
+    cols, rows = zip(*(inverse * corner for corner in ((left, top), (right, top), (left, bottom), (right, bottom))))
+    col_start, col_stop = max(0, math.floor(min(cols))), min(dataset.width, math.ceil(max(cols)))
+    row_start, row_stop = max(0, math.floor(min(rows))), min(dataset.height, math.ceil(max(rows)))
+    result = {"values": [numpy.empty(0, dtype=dataset.dtypes[0]) for _ in indexes], "pixels": 0, "blocks": 0}
+    if col_start >= col_stop or row_start >= row_stop:
+        return {**result, "factor": 1, "pixel_size": [abs(dataset.transform.a), abs(dataset.transform.e)]}
+
+    if resolution:
+        resolution = resolution_in_crs_units(dataset.crs, resolution)
+    factor = pick_overview(dataset, (row_stop - row_start, col_stop - col_start), resolution, max_pixels)
+
+    # Grid of the chosen level; GDAL sizes overviews by rounding up
+    level_width = math.ceil(dataset.width / factor)
+    level_height = math.ceil(dataset.height / factor)
+    scale_x = dataset.width / level_width
+    scale_y = dataset.height / level_height
+    level_transform = dataset.transform * Affine.scale(scale_x, scale_y)
+    result["factor"] = factor
+    result["pixel_size"] = [abs(level_transform.a), abs(level_transform.e)]
+
+    col_start, col_stop = math.floor(col_start / scale_x), min(level_width, math.ceil(col_stop / scale_x))
+    row_start, row_stop = math.floor(row_start / scale_y), min(level_height, math.ceil(row_stop / scale_y))
+    window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    inside = geometry_mask(
+        [geometry], out_shape=(window.height, window.width),
+        transform=window_transform(window, level_transform), invert=True, all_touched=all_touched,
+    )
+    result["pixels"] = int(inside.sum())
+
+    # Read block by block, skipping blocks the geometry does not touch
+    block_height, block_width = dataset.block_shapes[0]
+    values = [[] for _ in indexes]
+    for block_row in range(row_start - row_start % block_height, row_stop, block_height):
+        for block_col in range(col_start - col_start % block_width, col_stop, block_width):
+            r0, r1 = max(block_row, row_start), min(block_row + block_height, row_stop)
+            c0, c1 = max(block_col, col_start), min(block_col + block_width, col_stop)
+            block_inside = inside[r0 - row_start:r1 - row_start, c0 - col_start:c1 - col_start]
+            if not block_inside.any():
+                continue
+
+            data = dataset.read(
+                indexes,
+                window=Window(c0 * scale_x, r0 * scale_y, (c1 - c0) * scale_x, (r1 - r0) * scale_y),
+                out_shape=(len(indexes), r1 - r0, c1 - c0),
+                masked=True,
+            )
+            valid = block_inside & ~numpy.ma.getmaskarray(data)
+            for band, band_values in enumerate(values):
+                band_values.append(data.data[band][valid[band]])
+            result["blocks"] += 1
+
+    result["values"] = [
+        numpy.concatenate(band_values) if band_values else empty
+        for band_values, empty in zip(values, result["values"])
+    ]
+    return result
+
+
+def band_statistics(values, pixels: int, percentiles: list[int], bins=10, histogram_range=None,
+                    categorical: bool = False, categories: list | None = None) -> dict:
+    """Statistics of one band's valid pixel values, in titiler's /statistics layout."""
+    count = int(values.size)
+    stats = {
+        "count": count,
+        "valid_pixels": count,
+        "masked_pixels": pixels - count,
+        "valid_percent": round(100 * count / pixels, 2) if pixels else 0.0,
+    }
+    if not count:
+        return stats
+
+    as_float = values.astype("float64")
+    quantiles = numpy.percentile(as_float, [*percentiles, 50])
+    stats.update({
+        "min": float(as_float.min()),
+        "max": float(as_float.max()),
+        "mean": float(as_float.mean()),
+        "std": float(as_float.std()),
+        "sum": float(as_float.sum()),
+        "median": float(quantiles[-1]),
+        **{f"percentile_{p}": float(q) for p, q in zip(percentiles, quantiles)},
+    })
+
+    if categorical:
+        unique, counts = numpy.unique(values, return_counts=True)
+        if categories:
+            lookup = dict(zip(unique.tolist(), counts.tolist()))
+            unique = numpy.asarray(categories)
+            counts = numpy.asarray([lookup.get(c, 0) for c in categories])
+        stats["majority"] = unique[counts.argmax()].item()
+        stats["minority"] = unique[counts.argmin()].item()
+        stats["unique"] = len(unique)
+        stats["histogram"] = [counts.tolist(), unique.tolist()]
+    else:
+        counts, edges = numpy.histogram(as_float, bins=bins, range=histogram_range)
+        stats["histogram"] = [counts.tolist(), edges.tolist()]
+    return stats
+
+
+_zonal_cache: OrderedDict[str, dict] = OrderedDict()
+_zonal_cache_lock = threading.Lock()
+
+
+@app.post(
+    "/statistics/zonal",
+    description="Statistics of a COG inside a GeoJSON feature, read from the coarsest sufficient overview",
+    tags=["Cloud Optimized GeoTIFF"],
+)
+def zonal_statistics(
+    feature: Feature,
+    response: Response,
+    src_path=Depends(cog.path_dependency),
+    bidx: list[int] | None = Query(None, description="Band indexes (default: all bands)"),
+    resolution: float | None = Query(
+        None, gt=0, description="Pixel size in metres the statistics must be computed at or finer than"
+    ),
+    max_pixels: int = Query(
+        _ZONAL_MAX_PIXELS, gt=0, le=_ZONAL_MAX_PIXELS,
+        description="Pixel budget; coarser overviews are used when the AOI would exceed it",
+    ),
+    all_touched: bool = Query(False, description="Include every pixel the geometry touches"),
+    stats_params=Depends(cog.stats_dependency),
+    histogram_params=Depends(cog.histogram_dependency),
+    env=Depends(cog.environment_dependency),
+):
+    """Return the feature with per-band statistics in `properties.statistics`.
+
+    `properties.zonal` reports the overview factor, pixel size (in the
+    dataset's CRS units) and number of blocks read. Responses carry an
+    `X-Zonal-Cache: HIT|MISS|BYPASS` header; statistics of datasets whose
+    version cannot be resolved are not cached, since an overwritten COG
+    could not invalidate them.
+    """
+    geometry = feature.geometry.model_dump(exclude_none=True)
+    version = dataset_cache.version(src_path)
+    key = hashlib.sha256(json.dumps([
+        src_path, version, geometry_hash(geometry), bidx, resolution, max_pixels, all_touched,
+        stats_params.as_dict(), histogram_params.as_dict(),
+    ], sort_keys=True, default=str).encode()).hexdigest()
+
+    with rasterio.Env(**env):
+        with cog.reader(src_path) as src_dst:
+            cached = None
+            if version:
+                with _zonal_cache_lock:
+                    cached = _zonal_cache.get(key)
+                    if cached is not None:
+                        _zonal_cache.move_to_end(key)
+
+            if cached is None:
+                indexes = bidx or list(src_dst.dataset.indexes)
+                read = zonal_values(src_dst.dataset, geometry, indexes, resolution, max_pixels, all_touched)
+                if not read["pixels"]:
+                    raise HTTPException(status_code=404, detail="Feature does not cover any pixel of the dataset")
+
+                cached = {
+                    "statistics": {
+                        f"b{index}": band_statistics(
+                            values, read["pixels"], stats_params.percentiles,
+                            bins=histogram_params.bins, histogram_range=histogram_params.range,
+                            categorical=bool(stats_params.categorical), categories=stats_params.categories,
+                        )
+                        for index, values in zip(indexes, read["values"])
+                    },
+                    "zonal": {name: read[name] for name in ("factor", "pixel_size", "pixels", "blocks")},
+                }
+                if version:
+                    with _zonal_cache_lock:
+                        _zonal_cache[key] = cached
+                        while len(_zonal_cache) > _ZONAL_CACHE_SIZE:
+                            _zonal_cache.popitem(last=False)
+                response.headers["X-Zonal-Cache"] = "MISS" if version else "BYPASS"
+            else:
+                response.headers["X-Zonal-Cache"] = "HIT"
+
+    return {
+        **feature.model_dump(exclude_none=True),
+        "properties": {**(feature.properties or {}), **cached},
+    }
+
+
+# Bulk point queries
+# Layer inspection and charts look up values at many locations of one COG.
+# Instead of one /point request per location, this endpoint takes them all,
+# groups them by the internal block they fall in, reads each block once and
+# samples it with NumPy fancy indexing.
+
+_POINTS_MAX = int(os.environ.get("TITILER_POINTS_MAX", "10000"))
+
+
+class PointsRequest(BaseModel):
+    """Locations to sample, as [lon, lat] pairs in EPSG:4326."""
+
+    coordinates: list[tuple[float, float]] = Field(..., min_length=1)
+
+
+def sample_points(dataset, lons, lats, indexes: list[int]) -> tuple:
+    """Values of `indexes` at EPSG:4326 locations, reading each block once.
+
+    Returns (values, valid, blocks): a (points, bands) array, a boolean
+    array of the same shape that is False outside the dataset and for
+    nodata, and the number of blocks read.
+    """
+    xs, ys = warp_transform("EPSG:4326", dataset.crs, lons, lats)
+    cols, rows = ~dataset.transform * (numpy.asarray(xs), numpy.asarray(ys))
+    cols = numpy.floor(cols).astype("int64")
+    rows = numpy.floor(rows).astype("int64")
+
+    values = numpy.zeros((len(cols), len(indexes)), dtype=dataset.dtypes[0])
+    valid = numpy.zeros((len(cols), len(indexes)), dtype=bool)
+    inside = numpy.flatnonzero((cols >= 0) & (cols < dataset.width) & (rows >= 0) & (rows < dataset.height))
+    if not inside.size:
+        return values, valid, 0
+
+    block_height, block_width = dataset.block_shapes[0]
+    blocks_x = math.ceil(dataset.width / block_width)
+    block_ids = (rows[inside] // block_height) * blocks_x + cols[inside] // block_width
+    order = numpy.argsort(block_ids, kind="stable")
+    block_ids, points = block_ids[order], inside[order]
+    unique_ids, starts = numpy.unique(block_ids, return_index=True)
+
+    for block_id, group in zip(unique_ids, numpy.split(points, starts[1:])):
+        row_off = int(block_id // blocks_x) * block_height
+        col_off = int(block_id % blocks_x) * block_width
+        window = Window(
+            col_off, row_off,
+            min(block_width, dataset.width - col_off), min(block_height, dataset.height - row_off),
+        )
+        data = dataset.read(indexes, window=window, masked=True)
+        r, c = rows[group] - row_off, cols[group] - col_off
+        values[group] = data.data[:, r, c].T
+        valid[group] = ~numpy.ma.getmaskarray(data)[:, r, c].T
+    return values, valid, len(unique_ids)
+
+
+@app.post(
+    "/points",
+    description="Values of one COG at many locations",
+    tags=["Cloud Optimized GeoTIFF"],
+)
+def points(
+    body: PointsRequest,
+    src_path=Depends(cog.path_dependency),
+    bidx: list[int] | None = Query(None, description="Band indexes (default: all bands)"),
+    env=Depends(cog.environment_dependency),
+):
+    """Return `values` with one entry per coordinate, in request order.
+
+    Each entry lists the band values at that location; it is null outside
+    the dataset and per band for nodata pixels.
+    """
+    if len(body.coordinates) > _POINTS_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many points: {len(body.coordinates)} (maximum {_POINTS_MAX})",
+        )
+
+    lons, lats = zip(*body.coordinates)
+    with rasterio.Env(**env):
+        with cog.reader(src_path) as src_dst:
+            indexes = bidx or list(src_dst.dataset.indexes)
+            values, valid, blocks = sample_points(src_dst.dataset, lons, lats, indexes)
+
+    rows = values.tolist()
+    return {
+        "band_names": [f"b{index}" for index in indexes],
+        "coordinates": body.coordinates,
+        "values": [
+            [v if ok else None for v, ok in zip(row, row_valid)] if row_valid.any() else None
+            for row, row_valid in zip(rows, valid)
+        ],
+        "blocks_read": blocks,
+    }
+
+
+# Time series
+# Timeline layers are published as one COG per date. This endpoint reads a
+# point or polygon from every date of a layer in one request, with a bounded
+# thread pool. Each worker borrows its handle from `dataset_cache`, so the
+# headers of all dates stay parsed between queries on a warm container.
+
+_TIMESERIES_MAX_DATASETS = int(os.environ.get("TITILER_TIMESERIES_MAX_DATASETS", "400"))
+_TIMESERIES_WORKERS = int(os.environ.get("TITILER_TIMESERIES_WORKERS", "16"))
+
+_TIMESERIES_STATS = {
+    "mean": numpy.mean,
+    "median": numpy.median,
+    "min": numpy.min,
+    "max": numpy.max,
+    "sum": numpy.sum,
+    "count": numpy.size,
+}
+
+
+class TimeSeriesRequest(BaseModel):
+    """Datasets (explicit `urls`, or `url_template` + `dates`) and a `point` or `feature`."""
+
+    urls: list[str] | None = None
+    url_template: str | None = Field(
+        None, description="URL with {{year}}, {{month}} and {{day}} placeholders, as in layer configs"
+    )
+    dates: list[date] | None = None
+    point: tuple[float, float] | None = Field(None, description="[lon, lat] in EPSG:4326")
+    feature: Feature | None = None
+
+
+def expand_url_template(template: str, dates: list[date]) -> list[str]:
+    """URLs of a timeline layer, substituting dates as the frontend does."""
+    urls = []
+    for day in dates:
+        url = template
+        for key, value in (("year", day.year), ("month", f"{day.month:02d}"), ("day", day.day)):
+            url = url.replace(f"{{{{{key}}}}}", str(value)).replace(f"{{{key}}}", str(value))
+        urls.append(url)
+    return urls
+
+
+@app.post(
+    "/timeseries",
+    description="Values at a point, or statistics inside a feature, across an ordered list of COGs",
+    tags=["Cloud Optimized GeoTIFF"],
+)
+def timeseries(
+    body: TimeSeriesRequest,
+    bidx: list[int] | None = Query(None, description="Band indexes (default: all bands)"),
+    stat: str = Query("mean", description=f"Reduction for features: {', '.join(_TIMESERIES_STATS)}"),
+    resolution: float | None = Query(
+        None, gt=0, description="Pixel size in metres features are read at or finer than"
+    ),
+    max_pixels: int = Query(_ZONAL_MAX_PIXELS, gt=0, le=_ZONAL_MAX_PIXELS),
+    all_touched: bool = Query(False, description="Include every pixel the feature touches"),
+    env=Depends(cog.environment_dependency),
+):
+    """Return `values` with one entry per dataset, in request order.
+
+    Each entry lists one value per band: the pixel value at `point`, or
+    `stat` of the valid pixels inside `feature`. Values are null for
+    nodata, and the whole entry is null when the location is outside the
+    dataset, the dataset lacks one of the `bidx` bands or it cannot be
+    read; failed dates are logged.
+    """
+    if body.url_template is not None:
+        if body.urls is not None or not body.dates:
+            raise HTTPException(status_code=400, detail="url_template needs dates and excludes urls")
+        urls = expand_url_template(body.url_template, body.dates)
+    elif body.urls:
+        urls = body.urls
+    else:
+        raise HTTPException(status_code=400, detail="Either urls or url_template and dates are required")
+
+    if (body.point is None) == (body.feature is None):
+        raise HTTPException(status_code=400, detail="Exactly one of point and feature is required")
+    if stat not in _TIMESERIES_STATS:
+        raise HTTPException(status_code=400, detail=f"Unknown stat '{stat}'")
+    if bidx and min(bidx) < 1:
+        raise HTTPException(status_code=400, detail="Band indexes start at 1")
+    if len(urls) > _TIMESERIES_MAX_DATASETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many datasets: {len(urls)} (maximum {_TIMESERIES_MAX_DATASETS})",
+        )
+
+    # Body URLs bypass BucketWhitelistMiddleware, which only sees `url`
+    denied = [url for url in urls if not is_url_allowed(url)]
+    if denied:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Access denied for {denied[0]}. Only whitelisted cloud storage buckets are allowed. "
+                   f"Allowed buckets: {_format_allowed_buckets()}",
+        )
+
+    geometry = body.feature.geometry.model_dump(exclude_none=True) if body.feature else None
+    reduce = _TIMESERIES_STATS[stat]
+
+    def read(url: str) -> tuple[list[int], list | None]:
+        try:
+            with rasterio.Env(**env):
+                with cog.reader(url) as src_dst:
+                    indexes = bidx or list(src_dst.dataset.indexes)
+                    # Dates of a layer may differ in band count
+                    if max(indexes) > src_dst.dataset.count:
+                        logging.warning(f"{url} has {src_dst.dataset.count} bands, bidx {max(indexes)} requested")
+                        return indexes, None
+                    if geometry is None:
+                        values, valid, _ = sample_points(src_dst.dataset, [body.point[0]], [body.point[1]], indexes)
+                        if not valid[0].any():
+                            return indexes, None
+                        return indexes, [v if ok else None for v, ok in zip(values[0].tolist(), valid[0])]
+
+                    zonal = zonal_values(src_dst.dataset, geometry, indexes, resolution, max_pixels, all_touched)
+        except rasterio.errors.RasterioIOError as e:
+            logging.warning(f"Could not read {url}: {e}")
+            return bidx or [], None
+        except Exception:
+            # One corrupt date must not fail the whole series
+            logging.exception(f"Could not read values from {url}")
+            return bidx or [], None
+
+        if not zonal["pixels"]:
+            return indexes, None
+        return indexes, [
+            numpy.asarray(reduce(values)).item() if values.size or stat == "count" else None
+            for values in zonal["values"]
+        ]
+
+    workers = max(1, min(_TIMESERIES_WORKERS, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(read, urls))
+
+    indexes = next((indexes for indexes, values in results if values is not None), bidx or [])
+    return {
+        "band_names": [f"b{index}" for index in indexes],
+        "dates": [day.isoformat() for day in body.dates] if body.url_template is not None else None,
+        "urls": urls,
+        "values": [values for _, values in results],
+    }
+
+
 # Add health check
 
 
@@ -263,5 +1842,15 @@ def ping():
 	return {"ping": "pong!"}
 
 
+@app.get("/debug/cache", description="Cache statistics", tags=["Debug"])
+def cache_stats():
+	"""Hit/miss counters for the in-process caches of this container."""
+	return {
+		"datasets": dataset_cache.stats(),
+		"tiles": tile_cache.stats() if tile_cache else {"backend": None},
+		"archives": tile_archives.stats(),
+	}
+
+
 # Create Mangum handler that can be used by AWS Lambda
 handler = Mangum(app, lifespan="off")
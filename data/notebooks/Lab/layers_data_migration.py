@@ -1,22 +1,40 @@
+import asyncio
 import logging
 import os
 from pathlib import Path
 import pickle
-from typing import Literal
-import requests
 import subprocess
+import tempfile
+import time
+from typing import Literal
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-import boto3
+
+# Shared S3 client and multipart settings of the COG conversion tools; needs
+# scripts/cartodb_cog_conversion/batch_container on PYTHONPATH, e.g. from the
+# repository root:
+#   PYTHONPATH=scripts/cartodb_cog_conversion/batch_container python data/notebooks/Lab/layers_data_migration.py
+import s3_transfer
 
 # Google Sheets API setup
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+# Status values are written back, so the read-only scope is not enough
+# (delete an old read-only token.pickle to re-authorize)
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 SPREADSHEET_ID = "your_spreadsheet_id"
-RANGE_NAME = "Sheet1!G1:I"
+# bucket, input key, output key, overview resampling; row 1 is the header
+RANGE_NAME = "Sheet1!G2:J"
+FIRST_ROW = 2
+STATUS_COLUMN = "E"
 
-# AWS S3 setup
-s3 = boto3.client("s3")
+# Layers migrated at once; each holds its input and output in its own temp dir
+MAX_CONCURRENCY = int(os.environ.get("MIGRATION_CONCURRENCY", "8"))
+# Rows whose status is written with one batchUpdate call
+STATUS_BATCH_SIZE = int(os.environ.get("STATUS_BATCH_SIZE", "25"))
+
+# AWS S3 setup: one pooled client for all concurrent transfers
+s3 = s3_transfer.get_s3_client(concurrent_files=MAX_CONCURRENCY)
+TRANSFER_CONFIG = s3_transfer.get_transfer_config()
 
 
 # google credentials setup
@@ -39,12 +57,13 @@ def get_credentials():
     return creds
 
 
-# Read inputs from Google Sheet
-def read_inputs():
-    creds = get_credentials()
+def get_sheets_service():
+    """Build the Sheets client once; it is reused for every read and write."""
+    return build("sheets", "v4", credentials=get_credentials(), cache_discovery=False)
 
-    service = build("sheets", "v4", credentials=creds)
 
+# Read inputs from Google Sheet
+def read_inputs(service):
     result = (
         service.spreadsheets()
         .values()
@@ -53,81 +72,102 @@ def read_inputs():
     )
     values = result.get("values", [])
     if not values:
-        logging.warning(f"No data found.")
+        logging.warning("No data found.")
     else:
-        logging.warning(f"Data found.")
+        logging.warning(f"Data found: {len(values)} rows.")
     return values
 
 
-def write_value_in_sheet(value, column, row):
-    creds = get_credentials()
-    service = build("sheets", "v4", credentials=creds)
-    body = {"majorDimension": "ROWS", "values": [[value]]}
-    range_name = f"Sheet1!{column}{row}"
-    result = (
-        service.spreadsheets()
-        .values()
-        .update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=range_name,
-            valueInputOption="USER_ENTERED",
-            body=body,
+class StatusWriter:
+    """Collect row statuses and write them with one batchUpdate per batch_size rows."""
+
+    def __init__(self, service, column=STATUS_COLUMN, batch_size=STATUS_BATCH_SIZE):
+        self.service = service
+        self.column = column
+        self.batch_size = batch_size
+        self.pending = []
+        # The Sheets client is not thread-safe: one write at a time
+        self.lock = asyncio.Lock()
+
+    async def set(self, row: int, value: str):
+        self.pending.append((row, value))
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self.lock:
+            updates, self.pending = self.pending, []
+            if updates:
+                await asyncio.to_thread(self._write, updates)
+
+    def _write(self, updates):
+        body = {
+            "valueInputOption": "USER_ENTERED",
+            "data": [
+                {
+                    "range": f"Sheet1!{self.column}{row}",
+                    "majorDimension": "ROWS",
+                    "values": [[value]],
+                }
+                for row, value in updates
+            ],
+        }
+        result = (
+            self.service.spreadsheets()
+            .values()
+            .batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body)
+            .execute()
         )
-    )
-    logging.info(f"{str(result)}")
+        logging.info(f"Updated {result.get('totalUpdatedCells', 0)} status cells")
 
 
-# Download TIFF file
-def download_tiff(url, local_path):
-    response = requests.get(url, stream=True)
-    with open(local_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=1024):
-            if chunk:
-                f.write(chunk)
+# Download TIFF file (multipart, in parallel ranges)
+def download_tiff(bucket, key, local_path):
+    s3.download_file(bucket, str(key), Path(local_path).as_posix(), Config=TRANSFER_CONFIG)
 
 
-def create_overviews(
-    input_file: Path,
-    operation: Literal[
-        "nearest",
-        "average",
-        "rms",
-        "gauss",
-        "cubic",
-        "cubicspline",
-        "lanczos",
-        "average_magphase",
-        "mode",
-    ] = "nearest",
-):
-    cmd = ["gdaladdo", "-clean" "-r", operation, input_file.as_posix()]
-    subprocess.run(cmd, check=True)
+async def run_command(cmd: list[str]):
+    """Run a command without blocking the event loop."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr.decode())
+
 
+# gdalwarp has no gauss or average_magphase; the overviews still use them
+WARP_RESAMPLING = {"gauss": "average", "average_magphase": "average"}
 
-def transform_cog(input_file: Path, output_file: Path):
+
+async def transform_cog(input_file: Path, output_file: Path, operation: str = "nearest"):
+    # TILED and COPY_SRC_OVERVIEWS are GTiff options: the COG driver always
+    # tiles, and rebuilds overviews on the GoogleMapsCompatible grid, so the
+    # row's resampling is passed for the warp and the overviews here
     cmd = [
         "gdal_translate",
-        input_file.as_posix(),
-        output_file.as_posix(),
-        "of=COG",
+        "-of",
+        "COG",
+        "-co",
         "TILING_SCHEME=GoogleMapsCompatible",
         "-co",
         "COMPRESS=LZW",
         "-co",
-        "TILED=YES",
+        f"RESAMPLING={WARP_RESAMPLING.get(operation, operation)}",
         "-co",
-        "COPY_SRC_OVERVIEWS=YES",
+        f"OVERVIEW_RESAMPLING={operation}",
+        Path(input_file).as_posix(),
+        Path(output_file).as_posix(),
     ]
-    subprocess.run(cmd, check=True)
+    await run_command(cmd)
 
 
 # Upload COG file to S3
 def upload_cog(local_path: Path, bucket, key):
-    s3.upload_file(local_path, bucket, key)
+    s3.upload_file(Path(local_path).as_posix(), bucket, key, Config=TRANSFER_CONFIG)
 
 
-def process_file(
-    idx: int,
+async def process_file(
     bucket: str,
     input_file: Path,
     output_file: Path,
@@ -143,39 +183,55 @@ def process_file(
         "mode",
     ],
 ):
-    input_url = f"https://{bucket}.s3.amazonaws.com/{input_file}"
-    local_input_file = "/tmp/input.tif"
-    local_output_file = "/tmp/output.tif"
-
-    download_tiff(input_url, local_input_file)
-    create_overviews(local_input_file, operation)
-    transform_cog(local_input_file, local_output_file)
-    upload_cog(local_output_file, bucket, output_file)
-    os.remove(local_input_file)
-    os.remove(local_output_file)
-    write_value_in_sheet("yes", "E", idx + 2)
-
+    with tempfile.TemporaryDirectory(prefix="layer-") as tmpdir:
+        local_input_file = Path(tmpdir) / "input.tif"
+        local_output_file = Path(tmpdir) / "output.tif"
 
-# Process TIFF files
+        await asyncio.to_thread(download_tiff, bucket, input_file, local_input_file)
+        await transform_cog(local_input_file, local_output_file, operation)
+        await asyncio.to_thread(upload_cog, local_output_file, bucket, output_file)
 
 
-def process_tiff_files():
-    inputs = read_inputs()
-    for pos, (bucket, input_file, output_file, operation) in enumerate(inputs):
-        input_file = Path(input_file)
-        row = pos + 2
-        status_col = "E"
+async def process_row(pos: int, inputs: list, semaphore: asyncio.Semaphore, status: StatusWriter):
+    row = pos + FIRST_ROW
+    async with semaphore:
         try:
+            bucket, input_file, output_file, operation = inputs
+            input_file = Path(input_file)
             if not input_file or input_file.exists() or input_file.suffix != ".tif":
                 raise Exception("Could not find file: %s" % input_file)
-            process_file(pos, bucket, input_file, output_file, operation)
+            await process_file(bucket, input_file, output_file, operation)
         except Exception as e:
             logging.exception(
-                f"Failed to process file: {input_file} because: \n {str(e)}"
+                f"Failed to process row {row}: {inputs} because: \n {str(e)}"
             )
-            write_value_in_sheet("no", status_col, row)
-            continue
+            await status.set(row, "no")
+            return False
+    await status.set(row, "yes")
+    return True
+
+
+# Process TIFF files
+
+
+async def process_tiff_files():
+    service = get_sheets_service()
+    inputs = read_inputs(service)
+    status = StatusWriter(service)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    start = time.monotonic()
+    try:
+        results = await asyncio.gather(
+            *(process_row(pos, row, semaphore, status) for pos, row in enumerate(inputs))
+        )
+    finally:
+        await status.flush()
+    logging.warning(
+        f"Migrated {sum(results)}/{len(results)} layers in {time.monotonic() - start:.0f}s "
+        f"({MAX_CONCURRENCY} at a time)"
+    )
 
 
 if __name__ == "__main__":
-    process_tiff_files()
+    asyncio.run(process_tiff_files())
@@ -5,7 +5,8 @@ AWS Batch handler for COG conversion.
 This script is invoked by AWS Batch jobs. It:
 1. Receives a list of S3 keys to process (via environment variable or file)
 2. Checks which COGs already exist (skip logic for resume)
-3. Downloads each TIFF, converts to COG, uploads result
+3. Downloads each TIFF, converts to COG, uploads result, overlapping the
+   download, conversion and upload of consecutive files
 4. Handles failures gracefully, continuing with remaining files
 5. Preserves and verifies CRS (Coordinate Reference System) throughout the pipeline
 6. Fails if source file has no CRS defined
@@ -14,21 +15,50 @@ Environment variables:
     S3_BUCKET: S3 bucket name
     SOURCE_PREFIX: Source prefix for raw TIFFs
     COG_PREFIX: Destination prefix for COGs
-    COMPRESSION: COG compression (LZW, DEFLATE, ZSTD)
+    COG_PROFILE: COG creation profile (auto, categorical, continuous-int,
+        continuous-float, imagery, legacy), default auto; see cog_profiles.py
+    COMPRESSION: Overrides the profile's compression (LZW, DEFLATE, ZSTD, WEBP)
     TIFF_KEYS: Comma-separated list of S3 keys to process
-    MANIFEST_KEY: S3 key to a manifest file listing keys to process
+    MANIFEST_KEY: S3 key to a manifest file listing keys to process, as
+        [key, size] pairs (or plain keys, whose sizes are then looked up)
     OVERWRITE: Whether to overwrite existing COGs (true/false)
+    WORKERS: Threads per pipeline stage (download, convert, upload), default 1
+    MAX_TEMP_GB: Upper bound on temporary disk used by in-flight files, default 10
+    INDEX_MIN_KEYS: Jobs with at least this many keys check existing COGs with
+        listings around the expected keys instead of a head_object per file,
+        default 10
+    STREAMING: Read sources and write COGs through GDAL's /vsis3/ instead of
+        downloading to local disk (true/false), default false
+    STREAM_BUFFER_MB: Multipart upload buffer for streaming writes, default 50
+    WEB_MERCATOR: Also write a GoogleMapsCompatible (EPSG:3857) copy of each
+        COG under {COG_PREFIX}webmercator/ (true/false), default false
+    S3_ENDPOINT_URL: Alternative S3 endpoint (e.g. a local S3 stand-in)
+    S3_MULTIPART_THRESHOLD_MB, S3_MULTIPART_CHUNKSIZE_MB, S3_MAX_CONCURRENCY,
+        S3_MAX_POOL_CONNECTIONS, S3_MAX_ATTEMPTS: Transfer settings, see s3_transfer.py
+    JOB_VCPUS, JOB_MEMORY: Resources the job was given, recorded with the results
+
+Per-file timings, sizes and peak memory are written as JSON lines to
+{COG_PREFIX}results/{AWS_BATCH_JOB_ID}.jsonl when the job finishes.
 """
 
+import array
 import json
 import os
+import re
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import urlparse
 
-import boto3
+from cog_keys import get_expected_cog_key, get_web_mercator_cog_key
+from cog_profiles import PROFILES, choose_profile, creation_options
+import s3_transfer
 
 
 def log(level: str, message: str):
@@ -45,59 +75,299 @@ def error(message: str):
     log("ERROR", message)
 
 
-def get_s3_client():
-    """Get S3 client."""
-    return boto3.client("s3")
+# Multipart thresholds, part size and threads for upload_file/download_file
+# (S3_MULTIPART_* and S3_MAX_CONCURRENCY, see s3_transfer)
+TRANSFER_CONFIG = s3_transfer.get_transfer_config()
 
 
-def get_raster_crs(filepath: str) -> tuple[str, str]:
+def get_s3_client(concurrent_files: int = 1):
+    """
+    Get S3 client (pointed at S3_ENDPOINT_URL when set, e.g. a local S3 stand-in).
+    
+    The connection pool covers `concurrent_files` multipart transfers at once.
+    """
+    return s3_transfer.get_s3_client(concurrent_files=concurrent_files)
+
+
+def configure_gdal_streaming(buffer_mb: int, tmpdir: str = ""):
+    """
+    Configure GDAL's /vsis3/ driver for streaming conversion.
+    
+    GDAL reads these config options from the environment, so they apply to
+    both in-process reads and the gdal_translate subprocess. Writes to
+    /vsis3/ are multipart uploads buffered in memory `buffer_mb` at a time.
+    """
+    os.environ["CPL_VSIS3_CHUNK_SIZE"] = str(buffer_mb)
+    os.environ.setdefault("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+    os.environ.setdefault("CPL_VSIL_CURL_ALLOWED_EXTENSIONS", ".tif,.TIF,.tiff")
+    if tmpdir:
+        # Scratch space for overviews generated by the COG driver
+        os.environ["CPL_TMPDIR"] = tmpdir
+    
+    endpoint_url = os.environ.get("S3_ENDPOINT_URL", "")
+    if endpoint_url:
+        parsed = urlparse(endpoint_url)
+        os.environ["AWS_S3_ENDPOINT"] = parsed.netloc
+        os.environ["AWS_HTTPS"] = "YES" if parsed.scheme == "https" else "NO"
+        os.environ["AWS_VIRTUAL_HOSTING"] = "FALSE"
+
+
+def vsis3_path(bucket: str, key: str) -> str:
+    """GDAL virtual path for an S3 object."""
+    return f"/vsis3/{bucket}/{key}"
+
+
+def new_telemetry() -> dict:
+    """Per-file measurements recorded alongside each conversion result."""
+    return {
+        "download_seconds": 0.0,
+        "translate_seconds": 0.0,
+        "upload_seconds": 0.0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+        "peak_rss_bytes": 0,
+        "pixels": 0,
+        "profile": "",
+    }
+
+
+def run_measured(cmd: list[str], timeout: float) -> tuple[int, str, float, int]:
     """
-    Get the CRS of a raster file using gdalinfo.
+    Run a command and measure its wall time and peak resident memory.
+    
+    subprocess.run reaps the child itself, so the rusage of that one child
+    is lost; here the child is reaped with os.wait4 instead, which is safe
+    with several conversions running in parallel threads.
     
     Returns:
-        Tuple of (crs_wkt, crs_epsg) where crs_epsg may be empty if not an EPSG code
+        (return code, stderr, seconds, peak RSS in bytes)
+    
+    Raises:
+        subprocess.TimeoutExpired if the command ran longer than timeout
     """
-    try:
-        result = subprocess.run(
-            ["gdalinfo", "-json", filepath],
-            capture_output=True,
-            text=True,
-            timeout=60,
-        )
-        if result.returncode != 0:
-            return ("", "")
+    with tempfile.TemporaryFile(mode="w+") as stderr:
+        start = time.monotonic()
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr, text=True)
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        try:
+            _, status, rusage = os.wait4(proc.pid, 0)
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        seconds = time.monotonic() - start
         
-        import json as json_module
-        info_data = json_module.loads(result.stdout)
+        if timed_out:
+            raise subprocess.TimeoutExpired(cmd, timeout)
         
-        # Get CRS from coordinateSystem
-        crs_wkt = ""
+        stderr.seek(0)
+        # ru_maxrss is in kilobytes on Linux
+        return proc.returncode, stderr.read(), seconds, rusage.ru_maxrss * 1024
+
+
+# GDAL's Python bindings ship with the osgeo/gdal base image; when they are
+# unavailable (e.g. running outside the container) fall back to gdalinfo.
+try:
+    from osgeo import gdal
+    
+    gdal.UseExceptions()
+except ImportError:
+    gdal = None
+
+
+# CRS of GoogleMapsCompatible COGs
+WEB_MERCATOR_EPSG = "EPSG:3857"
+
+# GDAL data type names that differ from their numpy equivalents
+_GDAL_DTYPES = {"Byte": "uint8", "CFloat32": "complex64", "CFloat64": "complex128"}
+
+# array module type codes for the integer types whose values are sampled
+_ARRAY_TYPECODES = {
+    "uint8": "B", "int8": "b", "uint16": "H", "int16": "h", "uint32": "I", "int32": "i",
+}
+
+# Side of the window read from the middle of band 1 to count distinct values
+SAMPLE_SIZE = 512
+
+
+def _epsg_from_wkt(crs_wkt: str) -> str:
+    """Extract an EPSG code from WKT using authority patterns."""
+    # Look for AUTHORITY["EPSG","XXXX"] pattern
+    epsg_match = re.search(r'AUTHORITY\["EPSG","(\d+)"\]', crs_wkt)
+    if epsg_match:
+        return f"EPSG:{epsg_match.group(1)}"
+    # Try ID["EPSG",XXXX] pattern (newer WKT2)
+    epsg_match = re.search(r'ID\["EPSG",(\d+)\]', crs_wkt)
+    if epsg_match:
+        return f"EPSG:{epsg_match.group(1)}"
+    return ""
+
+
+def _count_distinct_values(band, dtype: str, width: int, height: int) -> int | None:
+    """
+    Count distinct values in a window from the middle of an integer band.
+    
+    Only the blocks under the window are read, so this stays cheap on
+    /vsis3/ sources. Returns None for non-integer bands.
+    """
+    typecode = _ARRAY_TYPECODES.get(dtype)
+    if typecode is None:
+        return None
+    xsize, ysize = min(width, SAMPLE_SIZE), min(height, SAMPLE_SIZE)
+    values = array.array(typecode)
+    values.frombytes(band.ReadRaster((width - xsize) // 2, (height - ysize) // 2, xsize, ysize))
+    distinct = set(values)
+    nodata = band.GetNoDataValue()
+    if nodata is not None:
+        distinct.discard(int(nodata))
+    return len(distinct)
+
+
+def _read_metadata_gdal(filepath: str, sample_values: bool = False) -> dict:
+    """Read raster metadata in-process with the GDAL Python bindings."""
+    dataset = gdal.Open(filepath)
+    try:
+        srs = dataset.GetSpatialRef()
+        crs_wkt = srs.ExportToWkt() if srs else ""
         crs_epsg = ""
+        if srs and srs.GetAuthorityName(None) == "EPSG":
+            crs_epsg = f"EPSG:{srs.GetAuthorityCode(None)}"
+        elif crs_wkt:
+            crs_epsg = _epsg_from_wkt(crs_wkt)
         
-        if "coordinateSystem" in info_data and "wkt" in info_data["coordinateSystem"]:
-            crs_wkt = info_data["coordinateSystem"]["wkt"]
-            
-            # Try to extract EPSG code from WKT
-            # Look for AUTHORITY["EPSG","XXXX"] pattern
-            import re
-            epsg_match = re.search(r'AUTHORITY\["EPSG","(\d+)"\]', crs_wkt)
-            if epsg_match:
-                crs_epsg = f"EPSG:{epsg_match.group(1)}"
-            else:
-                # Try ID["EPSG",XXXX] pattern (newer WKT2)
-                epsg_match = re.search(r'ID\["EPSG",(\d+)\]', crs_wkt)
-                if epsg_match:
-                    crs_epsg = f"EPSG:{epsg_match.group(1)}"
-        
-        return (crs_wkt, crs_epsg)
+        band = dataset.GetRasterBand(1)
+        dtype = gdal.GetDataTypeName(band.DataType)
+        overviews = [
+            [band.GetOverview(i).XSize, band.GetOverview(i).YSize]
+            for i in range(band.GetOverviewCount())
+        ]
         
+        return {
+            "crs_wkt": crs_wkt,
+            "crs_epsg": crs_epsg,
+            "width": dataset.RasterXSize,
+            "height": dataset.RasterYSize,
+            "bands": dataset.RasterCount,
+            "dtype": _GDAL_DTYPES.get(dtype, dtype.lower()),
+            "nodata": band.GetNoDataValue(),
+            "block_size": list(band.GetBlockSize()),
+            "overviews": overviews,
+            "layout": dataset.GetMetadataItem("LAYOUT", "IMAGE_STRUCTURE") or "",
+            "compression": dataset.GetMetadataItem("COMPRESSION", "IMAGE_STRUCTURE") or "",
+            "color_table": band.GetColorTable() is not None,
+            "color_interp": [
+                gdal.GetColorInterpretationName(dataset.GetRasterBand(i).GetColorInterpretation())
+                for i in range(1, dataset.RasterCount + 1)
+            ],
+            "distinct_values": (
+                _count_distinct_values(
+                    band, _GDAL_DTYPES.get(dtype, dtype.lower()), dataset.RasterXSize, dataset.RasterYSize
+                )
+                if sample_values else None
+            ),
+        }
+    finally:
+        dataset = None  # Closes the dataset
+
+
+def _read_metadata_gdalinfo(filepath: str) -> dict:
+    """Read raster metadata by spawning `gdalinfo -json`."""
+    result = subprocess.run(
+        ["gdalinfo", "-json", filepath],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"gdalinfo failed: {result.stderr.strip()}")
+    
+    info_data = json.loads(result.stdout)
+    crs_wkt = info_data.get("coordinateSystem", {}).get("wkt", "")
+    bands = info_data.get("bands", [])
+    band = bands[0] if bands else {}
+    dtype = band.get("type", "")
+    width, height = info_data.get("size", [0, 0])
+    image_structure = info_data.get("metadata", {}).get("IMAGE_STRUCTURE", {})
+    
+    return {
+        "crs_wkt": crs_wkt,
+        "crs_epsg": _epsg_from_wkt(crs_wkt) if crs_wkt else "",
+        "width": width,
+        "height": height,
+        "bands": len(bands),
+        "dtype": _GDAL_DTYPES.get(dtype, dtype.lower()),
+        "nodata": band.get("noDataValue"),
+        "block_size": band.get("block", []),
+        "overviews": [ov["size"] for ov in band.get("overviews", [])],
+        "layout": image_structure.get("LAYOUT", ""),
+        "compression": image_structure.get("COMPRESSION", ""),
+        "color_table": "colorTable" in band,
+        "color_interp": [b.get("colorInterpretation", "") for b in bands],
+        "distinct_values": None,
+    }
+
+
+def read_raster_metadata(filepath: str, sample_values: bool = False) -> dict:
+    """
+    Read CRS, EPSG, size, block size, overviews, dtype and nodata of a raster.
+    
+    Uses the GDAL Python bindings in-process when available, avoiding a
+    gdalinfo process spawn and JSON round trip per call. With sample_values,
+    distinct values of integer rasters are counted from a window of band 1
+    (in-process only) to help choose a COG profile.
+    
+    Returns:
+        dict with crs_wkt, crs_epsg (may be empty), width, height, bands,
+        dtype, nodata, block_size, overviews, layout, compression,
+        color_table, color_interp and distinct_values (None when not sampled).
+        Empty dict if the file cannot be read.
+    """
+    if gdal is not None:
+        try:
+            return _read_metadata_gdal(filepath, sample_values)
+        except Exception as e:
+            error(f"In-process metadata read failed, falling back to gdalinfo: {e}")
+    
+    try:
+        return _read_metadata_gdalinfo(filepath)
     except Exception as e:
-        error(f"Failed to get CRS: {e}")
-        return ("", "")
+        error(f"Failed to read raster metadata: {e}")
+        return {}
+
+
+def get_raster_crs(filepath: str) -> tuple[str, str]:
+    """
+    Get the CRS of a raster file.
+    
+    Returns:
+        Tuple of (crs_wkt, crs_epsg) where crs_epsg may be empty if not an EPSG code
+    """
+    metadata = read_raster_metadata(filepath)
+    return (metadata.get("crs_wkt", ""), metadata.get("crs_epsg", ""))
+
+
+def build_cog_index(s3_client, bucket: str, cog_prefix: str, cog_keys: list[str]) -> dict[str, dict]:
+    """
+    Build an existence index for the expected COG keys of a job.
+    
+    Lists only the parts of the COG prefix around the expected keys (see
+    s3_transfer.existing_objects) instead of issuing one head_object per
+    file, so keys spread across the prefix do not page through all of it.
+    
+    Returns:
+        Dict of key -> {"size": ..., "etag": ...} for existing objects
+    """
+    index, requests = s3_transfer.existing_objects(s3_client, bucket, cog_prefix, cog_keys)
+    info(f"Existence index: {len(index)}/{len(set(cog_keys))} COGs present ({requests} listing requests)")
+    return index
 
 
-def cog_exists(s3_client, bucket: str, cog_key: str) -> bool:
-    """Check if a COG already exists in S3."""
+def cog_exists(s3_client, bucket: str, cog_key: str, index: dict | None = None) -> bool:
+    """Check if a COG already exists in S3, using a prebuilt index when available."""
+    if index is not None:
+        return cog_key in index
+    
     try:
         s3_client.head_object(Bucket=bucket, Key=cog_key)
         return True
@@ -107,29 +377,309 @@ def cog_exists(s3_client, bucket: str, cog_key: str) -> bool:
         raise
 
 
-def strip_table_prefix(filename: str) -> str:
+def prepare_conversion(
+    s3_client,
+    bucket: str,
+    source_key: str,
+    cog_prefix: str,
+    overwrite: bool = False,
+    index: dict | None = None,
+    web_mercator: bool = False,
+) -> dict:
+    """
+    Start a conversion task for a source TIFF.
+    
+    If an existence index (see build_cog_index) is given it is consulted
+    instead of issuing a head_object request. With web_mercator the task
+    also carries the key of the Web Mercator copy, and is only skipped when
+    both COGs exist.
+    
+    Returns:
+        Task dict. If the COG already exists (and overwrite is off) the task
+        already carries its final "result".
+    """
+    cog_key = get_expected_cog_key(source_key, cog_prefix)
+    task = {"source_key": source_key, "cog_key": cog_key, "result": None, "telemetry": new_telemetry()}
+    wanted = [cog_key]
+    if web_mercator:
+        task["mercator_key"] = get_web_mercator_cog_key(source_key, cog_prefix)
+        wanted.append(task["mercator_key"])
+    
+    # Check if already converted (skip logic for resume)
+    if not overwrite and all(cog_exists(s3_client, bucket, key, index) for key in wanted):
+        info(f"Skipping (already exists): {source_key}")
+        task["result"] = {
+            "success": True,
+            "source_key": source_key,
+            "dest_key": cog_key,
+            "skipped": True,
+        }
+    
+    return task
+
+
+def download_stage(s3_client, bucket: str, task: dict, workdir: str):
+    """Download the source TIFF of a task into workdir."""
+    source_key = task["source_key"]
+    task["source_path"] = os.path.join(workdir, "source.tif")
+    task["cog_path"] = os.path.join(workdir, "output_cog.tif")
+    task["mercator_path"] = os.path.join(workdir, "output_mercator.tif")
+    
+    try:
+        info(f"Downloading from s3://{bucket}/{source_key}")
+        start = time.monotonic()
+        s3_client.download_file(bucket, source_key, task["source_path"], Config=TRANSFER_CONFIG)
+        task["telemetry"]["download_seconds"] = time.monotonic() - start
+        task["telemetry"]["bytes_in"] = os.path.getsize(task["source_path"])
+    except Exception as e:
+        task["result"] = {
+            "success": False,
+            "source_key": source_key,
+            "error": f"Download failed: {e}",
+        }
+
+
+def translate(task: dict, cmd: list[str]) -> bool:
     """
-    Strip CartoDB table prefixes from filename.
+    Run a gdal_translate command for a task, adding to its telemetry.
+    
+    Returns:
+        True on success; otherwise the task carries the failure result
+    """
+    source_key = task["source_key"]
+    try:
+        info(f"Running: {' '.join(cmd)}")
+        returncode, stderr, seconds, peak_rss = run_measured(
+            cmd,
+            timeout=3600,  # 1 hour timeout per file
+        )
+        task["telemetry"]["translate_seconds"] += seconds
+        task["telemetry"]["peak_rss_bytes"] = max(task["telemetry"]["peak_rss_bytes"], peak_rss)
+        
+        if returncode != 0:
+            task["result"] = {
+                "success": False,
+                "source_key": source_key,
+                "error": f"gdal_translate failed: {stderr}",
+            }
+            return False
+            
+    except subprocess.TimeoutExpired:
+        task["result"] = {
+            "success": False,
+            "source_key": source_key,
+            "error": "gdal_translate timed out after 1 hour",
+        }
+        return False
+    except Exception as e:
+        task["result"] = {
+            "success": False,
+            "source_key": source_key,
+            "error": f"gdal_translate error: {e}",
+        }
+        return False
+    
+    return True
+
+
+def convert_stage(task: dict, compression: str = "", profile: str = "auto"):
+    """
+    Run gdal_translate on a downloaded task, verifying CRS before and after.
+    
+    Creation options come from the COG profile (chosen from the source
+    metadata when "auto"); a non-empty compression overrides the profile's.
+    Tasks with a "mercator_key" also get a GoogleMapsCompatible copy in
+    EPSG:3857 at "mercator_path".
+    """
+    source_key = task["source_key"]
+    source_path = task["source_path"]
+    cog_path = task["cog_path"]
+    
+    # Get source CRS for logging and verification
+    source_metadata = read_raster_metadata(source_path, sample_values=profile == "auto")
+    source_wkt = source_metadata.get("crs_wkt", "")
+    source_epsg = source_metadata.get("crs_epsg", "")
+    task["source_metadata"] = source_metadata
+    task["telemetry"]["pixels"] = (
+        source_metadata.get("width", 0) * source_metadata.get("height", 0) * source_metadata.get("bands", 0)
+    )
+    if source_epsg:
+        info(f"Source CRS: {source_epsg}")
+    elif source_wkt:
+        info(f"Source CRS: (custom WKT, not EPSG)")
+    else:
+        # Fail if source has no CRS - data integrity requirement
+        error(f"Source file has no CRS defined: {source_key}")
+        error("Fix the source raster export to include SRID before converting to COG")
+        task["result"] = {
+            "success": False,
+            "source_key": source_key,
+            "error": "Source file has no CRS defined. Cannot convert to COG without valid CRS.",
+        }
+        return
+    
+    if profile == "auto":
+        profile = choose_profile(source_metadata)
+    task["telemetry"]["profile"] = profile
+    info(f"COG profile: {profile}")
+    
+    # Build gdal_translate command
+    # CRS is preserved by default when converting to COG
+    cmd = [
+        "gdal_translate",
+        "-of", "COG",
+        *creation_options(profile, source_metadata, compression),
+        source_path,
+        cog_path,
+    ]
+    if not translate(task, cmd):
+        return
+    
+    # Verify output CRS matches expected
+    output_metadata = read_raster_metadata(cog_path)
+    output_wkt = output_metadata.get("crs_wkt", "")
+    output_epsg = output_metadata.get("crs_epsg", "")
+    task["output_metadata"] = output_metadata
+    if output_epsg:
+        info(f"Output CRS: {output_epsg}")
+    elif output_wkt:
+        info(f"Output CRS: (custom WKT preserved)")
+    else:
+        info(f"WARNING: Output has no CRS - source may have been missing CRS")
+    
+    # Verify CRS was preserved
+    if source_epsg and output_epsg and source_epsg != output_epsg:
+        error(f"CRS mismatch! Source: {source_epsg}, Output: {output_epsg}")
+        task["result"] = {
+            "success": False,
+            "source_key": source_key,
+            "error": f"CRS not preserved: {source_epsg} -> {output_epsg}",
+        }
+        return
+    
+    # Web Mercator copy, warped onto the GoogleMapsCompatible tile grid so
+    # the tiler serves XYZ tiles without reprojecting
+    if task.get("mercator_key"):
+        cmd = [
+            "gdal_translate",
+            "-of", "COG",
+            *creation_options(profile, source_metadata, compression, tiling_scheme="GoogleMapsCompatible"),
+            source_path,
+            task["mercator_path"],
+        ]
+        if not translate(task, cmd):
+            return
+        
+        mercator_epsg = read_raster_metadata(task["mercator_path"]).get("crs_epsg", "")
+        if mercator_epsg != WEB_MERCATOR_EPSG:
+            error(f"Web Mercator output has CRS {mercator_epsg or '(none)'}, expected {WEB_MERCATOR_EPSG}")
+            task["result"] = {
+                "success": False,
+                "source_key": source_key,
+                "error": f"Web Mercator output not in {WEB_MERCATOR_EPSG}: {mercator_epsg or '(none)'}",
+            }
+            return
+        info(f"Web Mercator output CRS: {mercator_epsg}")
+    
+    task["source_epsg"] = source_epsg
+    task["output_epsg"] = output_epsg
+
+
+def upload_stage(s3_client, bucket: str, task: dict):
+    """Upload a converted COG and record the final result."""
+    source_key = task["source_key"]
+    cog_key = task["cog_key"]
     
-    Removes 'public_' and 'cdb_importer_' prefixes that come from
-    PostgreSQL schema/table naming conventions.
+    try:
+        info(f"Uploading to s3://{bucket}/{cog_key}")
+        start = time.monotonic()
+        s3_client.upload_file(task["cog_path"], bucket, cog_key, Config=TRANSFER_CONFIG)
+        task["telemetry"]["bytes_out"] = os.path.getsize(task["cog_path"])
+        if task.get("mercator_key"):
+            info(f"Uploading to s3://{bucket}/{task['mercator_key']}")
+            s3_client.upload_file(task["mercator_path"], bucket, task["mercator_key"], Config=TRANSFER_CONFIG)
+            task["telemetry"]["bytes_out"] += os.path.getsize(task["mercator_path"])
+        task["telemetry"]["upload_seconds"] = time.monotonic() - start
+    except Exception as e:
+        task["result"] = {
+            "success": False,
+            "source_key": source_key,
+            "error": f"Upload failed: {e}",
+        }
+        return
+    
+    finish_stage(task)
+
+
+def finish_stage(task: dict):
+    """Record the success result of a converted and stored COG."""
+    info(f"Successfully converted: {task['source_key']} -> {task['cog_key']}")
+    task["result"] = {
+        "success": True,
+        "source_key": task["source_key"],
+        "dest_key": task["cog_key"],
+        "source_crs": task["source_epsg"] or "(custom)",
+        "output_crs": task["output_epsg"] or "(custom)",
+        "skipped": False,
+        "telemetry": task["telemetry"],
+    }
+    if task.get("mercator_key"):
+        task["result"]["mercator_key"] = task["mercator_key"]
+
+
+def streaming_convert_stage(
+    bucket: str, task: dict, compression: str = "", profile: str = "auto", source_size: int = 0
+):
+    """
+    Convert a task straight from S3 to S3 without a local copy.
     
-    Examples:
-        public_rainfall_data.tif -> rainfall_data.tif
-        cdb_importer_12345_population.tif -> 12345_population.tif
+    The source is read with ranged requests through /vsis3/ and the COG is
+    written back through /vsis3/ as a multipart upload, so neither file
+    lands on local disk (see configure_gdal_streaming). `source_size` is
+    recorded as bytes_in; the output sizes are filled in afterwards by
+    record_streamed_sizes.
     """
-    for prefix in ["public_", "cdb_importer_"]:
-        if filename.startswith(prefix):
-            return filename[len(prefix):]
-    return filename
+    task["source_path"] = vsis3_path(bucket, task["source_key"])
+    task["cog_path"] = vsis3_path(bucket, task["cog_key"])
+    if task.get("mercator_key"):
+        task["mercator_path"] = vsis3_path(bucket, task["mercator_key"])
+    
+    info(f"Streaming s3://{bucket}/{task['source_key']} -> s3://{bucket}/{task['cog_key']}")
+    convert_stage(task, compression, profile)
+    if task["result"]:
+        return
+    
+    task["telemetry"]["bytes_in"] = source_size
+    finish_stage(task)
 
 
-def get_expected_cog_key(source_key: str, cog_prefix: str) -> str:
-    """Get the expected COG key for a source TIFF, stripping table prefixes."""
-    filename = os.path.basename(source_key)
-    # Strip table prefixes (public_, cdb_importer_)
-    clean_filename = strip_table_prefix(filename)
-    return f"{cog_prefix}{clean_filename}"
+def record_streamed_sizes(s3_client, bucket: str, file_results: list[dict]):
+    """
+    Fill in bytes_out (and missing bytes_in) of streamed conversions.
+    
+    GDAL does not report what it wrote through /vsis3/, so the sizes come
+    from one listing around all the outputs of the job (see
+    s3_transfer.existing_objects) rather than a head_object per file.
+    """
+    converted = [r for r in file_results if r.get("success") and not r.get("skipped") and r.get("telemetry")]
+    keys = set()
+    for result in converted:
+        keys.update(key for key in (result["dest_key"], result.get("mercator_key")) if key)
+        if not result["telemetry"]["bytes_in"]:
+            keys.add(result["source_key"])
+    if not keys:
+        return
+    
+    try:
+        found, _ = s3_transfer.existing_objects(s3_client, bucket, os.path.commonprefix(sorted(keys)), sorted(keys))
+    except Exception as e:
+        error(f"Could not read object sizes for telemetry: {e}")
+        return
+    size = lambda key: found.get(key, {}).get("size", 0)
+    for result in converted:
+        telemetry = result["telemetry"]
+        telemetry["bytes_in"] = telemetry["bytes_in"] or size(result["source_key"])
+        telemetry["bytes_out"] = sum(size(key) for key in (result["dest_key"], result.get("mercator_key")) if key)
 
 
 def convert_to_cog(
@@ -137,8 +687,12 @@ def convert_to_cog(
     bucket: str,
     source_key: str,
     cog_prefix: str,
-    compression: str = "LZW",
+    compression: str = "",
     overwrite: bool = False,
+    index: dict | None = None,
+    streaming: bool = False,
+    profile: str = "auto",
+    web_mercator: bool = False,
 ) -> dict:
     """
     Convert a single TIFF to COG, preserving CRS.
@@ -148,148 +702,247 @@ def convert_to_cog(
         bucket: S3 bucket name
         source_key: S3 key of source TIFF
         cog_prefix: S3 prefix for output COGs
-        compression: Compression algorithm (LZW, DEFLATE, ZSTD)
+        compression: Overrides the profile's compression (LZW, DEFLATE, ZSTD, WEBP)
         overwrite: Whether to overwrite existing COGs
+        index: Optional existence index from build_cog_index
+        streaming: Read and write through /vsis3/ instead of local temp files
+        profile: COG profile name, or "auto" to choose from the source
+        web_mercator: Also write a GoogleMapsCompatible (EPSG:3857) copy,
+            keeping the native-grid COG alongside
     
     Returns:
-        dict with success, source_key, dest_key, source_crs, and error if failed
+        dict with success, source_key, dest_key, source_crs, mercator_key
+        (with web_mercator), and error if failed
     
     Raises:
         Fails if source file has no CRS defined.
     """
-    cog_key = get_expected_cog_key(source_key, cog_prefix)
-    
-    # Check if already converted (skip logic for resume)
-    if not overwrite and cog_exists(s3_client, bucket, cog_key):
-        info(f"Skipping (already exists): {source_key}")
-        return {
-            "success": True,
-            "source_key": source_key,
-            "dest_key": cog_key,
-            "skipped": True,
-        }
+    task = prepare_conversion(s3_client, bucket, source_key, cog_prefix, overwrite, index, web_mercator)
+    if task["result"]:
+        return task["result"]
     
     info(f"Converting: {source_key}")
     
+    if streaming:
+        streaming_convert_stage(bucket, task, compression, profile)
+        record_streamed_sizes(s3_client, bucket, [task["result"]])
+        return task["result"]
+    
     with tempfile.TemporaryDirectory() as tmpdir:
-        # Download source TIFF
-        source_path = os.path.join(tmpdir, "source.tif")
-        cog_path = os.path.join(tmpdir, "output_cog.tif")
-        
+        download_stage(s3_client, bucket, task, tmpdir)
+        if not task["result"]:
+            convert_stage(task, compression, profile)
+        if not task["result"]:
+            upload_stage(s3_client, bucket, task)
+    
+    return task["result"]
+
+
+class TempDiskBudget:
+    """
+    Bound the bytes of temporary files held by in-flight conversions.
+    
+    A reservation that does not fit waits until others are released. A
+    single file larger than the whole budget is still allowed through once
+    nothing else is reserved, so oversized rasters never deadlock the job.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._cond = threading.Condition()
+    
+    @contextmanager
+    def reserve(self, nbytes: int):
+        with self._cond:
+            while self.used > 0 and self.used + nbytes > self.max_bytes:
+                self._cond.wait()
+            self.used += nbytes
         try:
-            info(f"Downloading from s3://{bucket}/{source_key}")
-            s3_client.download_file(bucket, source_key, source_path)
-        except Exception as e:
-            return {
-                "success": False,
-                "source_key": source_key,
-                "error": f"Download failed: {e}",
-            }
-        
-        # Get source CRS for logging and verification
-        source_wkt, source_epsg = get_raster_crs(source_path)
-        if source_epsg:
-            info(f"Source CRS: {source_epsg}")
-        elif source_wkt:
-            info(f"Source CRS: (custom WKT, not EPSG)")
-        else:
-            # Fail if source has no CRS - data integrity requirement
-            error(f"Source file has no CRS defined: {source_key}")
-            error("Fix the source raster export to include SRID before converting to COG")
-            return {
-                "success": False,
-                "source_key": source_key,
-                "error": "Source file has no CRS defined. Cannot convert to COG without valid CRS.",
-            }
-        
-        # Build gdal_translate command
-        # CRS is preserved by default when converting to COG
-        cmd = [
-            "gdal_translate",
-            "-of", "COG",
-            "-co", f"COMPRESS={compression}",
-            "-co", "BIGTIFF=IF_SAFER",
-            "-co", "NUM_THREADS=ALL_CPUS",
-            "-co", "OVERVIEWS=AUTO",
-            source_path,
-            cog_path,
-        ]
-        
+            yield
+        finally:
+            with self._cond:
+                self.used -= nbytes
+                self._cond.notify_all()
+
+
+def run_pipeline(
+    s3_client,
+    bucket: str,
+    keys: list[str],
+    cog_prefix: str,
+    compression: str = "",
+    overwrite: bool = False,
+    workers: int = 1,
+    max_temp_bytes: int = 10 * 1024**3,
+    index: dict | None = None,
+    streaming: bool = False,
+    profile: str = "auto",
+    web_mercator: bool = False,
+    sizes: dict[str, int] | None = None,
+) -> list[dict]:
+    """
+    Convert keys with download, conversion and upload running as overlapping stages.
+    
+    Each stage has its own pool of `workers` threads, so while file N is
+    being converted, file N+1 can be downloading and file N-1 uploading.
+    Temporary disk usage is bounded by `max_temp_bytes` (source + COG,
+    estimated as twice the source size, or three times with the Web
+    Mercator copy). Source sizes come from `sizes` (the manifest); keys
+    missing from it are looked up with head_object. In streaming mode there
+    is no download or upload stage: `workers` S3-to-S3 conversions run at
+    once.
+    
+    Returns:
+        One result dict per key, in input order. Unexpected exceptions are
+        returned as {"exception": e} so the caller can report them.
+    """
+    budget = TempDiskBudget(max_temp_bytes)
+    download_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download")
+    convert_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="convert")
+    upload_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+    sizes = sizes or {}
+    
+    def process(position: int, source_key: str) -> dict:
+        info(f"[{position}/{len(keys)}] Processing: {source_key}")
         try:
-            info(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=3600,  # 1 hour timeout per file
-            )
+            task = prepare_conversion(s3_client, bucket, source_key, cog_prefix, overwrite, index, web_mercator)
+            if task["result"]:
+                return task["result"]
             
-            if result.returncode != 0:
-                return {
-                    "success": False,
-                    "source_key": source_key,
-                    "error": f"gdal_translate failed: {result.stderr}",
-                }
-                
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "source_key": source_key,
-                "error": "gdal_translate timed out after 1 hour",
-            }
+            if streaming:
+                info(f"Converting: {source_key}")
+                convert_pool.submit(
+                    streaming_convert_stage, bucket, task, compression, profile, sizes.get(source_key, 0)
+                ).result()
+                return task["result"]
+            
+            size = sizes.get(source_key)
+            if size is None:
+                # Manifests of plain keys carry no sizes
+                try:
+                    size = s3_client.head_object(Bucket=bucket, Key=source_key)["ContentLength"]
+                except Exception:
+                    size = 0  # Let the download stage report the failure
+            
+            outputs = 2 if web_mercator else 1
+            with budget.reserve((1 + outputs) * size), tempfile.TemporaryDirectory() as tmpdir:
+                info(f"Converting: {source_key}")
+                download_pool.submit(download_stage, s3_client, bucket, task, tmpdir).result()
+                if not task["result"]:
+                    convert_pool.submit(convert_stage, task, compression, profile).result()
+                if not task["result"]:
+                    upload_pool.submit(upload_stage, s3_client, bucket, task).result()
+            return task["result"]
         except Exception as e:
-            return {
-                "success": False,
-                "source_key": source_key,
-                "error": f"gdal_translate error: {e}",
-            }
-        
-        # Verify output CRS matches expected
-        output_wkt, output_epsg = get_raster_crs(cog_path)
-        if output_epsg:
-            info(f"Output CRS: {output_epsg}")
-        elif output_wkt:
-            info(f"Output CRS: (custom WKT preserved)")
+            error(f"Exception processing {source_key}: {e}")
+            traceback.print_exc()
+            return {"exception": e}
+    
+    # Enough files in flight to keep every stage busy
+    with ThreadPoolExecutor(max_workers=3 * workers, thread_name_prefix="pipeline") as coordinator:
+        futures = [coordinator.submit(process, i, key) for i, key in enumerate(keys, 1)]
+        results = [f.result() for f in futures]
+    
+    for pool in (download_pool, convert_pool, upload_pool):
+        pool.shutdown()
+    
+    if streaming:
+        record_streamed_sizes(s3_client, bucket, results)
+    
+    return results
+
+
+def summarize_results(keys: list[str], file_results: list[dict]) -> dict:
+    """Count converted, skipped and failed files of a job, listing the failures."""
+    results = {
+        "total": len(keys),
+        "success": 0,
+        "skipped": 0,
+        "failed": 0,
+        "failures": [],
+    }
+    
+    for source_key, result in zip(keys, file_results):
+        if "exception" in result:
+            results["failed"] += 1
+            results["failures"].append({
+                "key": source_key,
+                "error": str(result["exception"]),
+            })
+        elif result["success"]:
+            if result.get("skipped"):
+                results["skipped"] += 1
+            else:
+                results["success"] += 1
         else:
-            info(f"WARNING: Output has no CRS - source may have been missing CRS")
-        
-        # Verify CRS was preserved
-        if source_epsg and output_epsg and source_epsg != output_epsg:
-            error(f"CRS mismatch! Source: {source_epsg}, Output: {output_epsg}")
-            return {
-                "success": False,
-                "source_key": source_key,
-                "error": f"CRS not preserved: {source_epsg} -> {output_epsg}",
-            }
-        
-        # Upload COG to S3
-        try:
-            info(f"Uploading to s3://{bucket}/{cog_key}")
-            s3_client.upload_file(cog_path, bucket, cog_key)
-        except Exception as e:
-            return {
-                "success": False,
-                "source_key": source_key,
-                "error": f"Upload failed: {e}",
-            }
+            results["failed"] += 1
+            results["failures"].append({
+                "key": source_key,
+                "error": result.get("error", "Unknown error"),
+            })
+            error(f"Failed {source_key}: {result.get('error')}")
     
-    info(f"Successfully converted: {source_key} -> {cog_key}")
-    return {
-        "success": True,
+    return results
+
+
+def result_record(source_key: str, result: dict) -> dict:
+    """Flatten one file's result into a results JSONL record."""
+    if "exception" in result:
+        status, message = "failed", str(result["exception"])
+    elif not result["success"]:
+        status, message = "failed", result.get("error", "Unknown error")
+    elif result.get("skipped"):
+        status, message = "skipped", ""
+    else:
+        status, message = "converted", ""
+    
+    record = {
         "source_key": source_key,
-        "dest_key": cog_key,
-        "source_crs": source_epsg or "(custom)",
-        "output_crs": output_epsg or "(custom)",
-        "skipped": False,
+        "dest_key": result.get("dest_key", ""),
+        "status": status,
+        "error": message,
     }
+    record.update(result.get("telemetry") or {})
+    return record
+
+
+def write_results(s3_client, bucket: str, cog_prefix: str, records: list[dict], job: dict) -> str:
+    """
+    Store per-file records of this job as JSON lines under {cog_prefix}results/.
+    
+    Every line carries the job fields (job id, vCPUs, memory, workers,
+    compression, streaming) so the planner can fit a cost model across runs.
+    
+    Returns:
+        S3 key of the results object
+    """
+    results_key = f"{cog_prefix}results/{job['job_id']}.jsonl"
+    body = "".join(json.dumps({**job, **record}) + "\n" for record in records)
+    s3_client.put_object(Bucket=bucket, Key=results_key, Body=body.encode())
+    info(f"Results written to s3://{bucket}/{results_key}")
+    return results_key
+
+
+def parse_manifest(entries: list) -> tuple[list[str], dict[str, int]]:
+    """Split manifest entries, [key, size] pairs or plain keys, into keys and known sizes."""
+    keys, sizes = [], {}
+    for entry in entries:
+        if isinstance(entry, str):
+            keys.append(entry)
+        else:
+            key, size = entry
+            keys.append(key)
+            sizes[key] = int(size)
+    return keys, sizes
 
 
-def get_keys_to_process(s3_client, bucket: str) -> list[str]:
-    """Get list of S3 keys to process from environment."""
+def get_keys_to_process(s3_client, bucket: str) -> tuple[list[str], dict[str, int]]:
+    """Get the S3 keys to process, and the source sizes the manifest lists, from environment."""
     # Option 1: Direct list in environment variable
     tiff_keys = os.environ.get("TIFF_KEYS", "")
     if tiff_keys:
-        return [k.strip() for k in tiff_keys.split(",") if k.strip()]
+        return [k.strip() for k in tiff_keys.split(",") if k.strip()], {}
     
     # Option 2: Manifest file in S3
     manifest_key = os.environ.get("MANIFEST_KEY", "")
@@ -303,18 +956,18 @@ def get_keys_to_process(s3_client, bucket: str) -> list[str]:
             with open(manifest_path) as f:
                 data = json.load(f)
                 if isinstance(data, list):
-                    return data
+                    return parse_manifest(data)
                 elif isinstance(data, dict) and "keys" in data:
-                    return data["keys"]
+                    return parse_manifest(data["keys"])
                 else:
                     error(f"Invalid manifest format")
-                    return []
+                    return [], {}
         finally:
             if os.path.exists(manifest_path):
                 os.remove(manifest_path)
     
     error("No TIFF_KEYS or MANIFEST_KEY specified")
-    return []
+    return [], {}
 
 
 def main():
@@ -328,69 +981,93 @@ def main():
         sys.exit(1)
     
     cog_prefix = os.environ.get("COG_PREFIX", "cartodb_exports/cogs/")
-    compression = os.environ.get("COMPRESSION", "LZW")
+    profile = os.environ.get("COG_PROFILE", "auto")
+    compression = os.environ.get("COMPRESSION", "")
+    if profile != "auto" and profile not in PROFILES:
+        error(f"Unknown COG_PROFILE {profile!r}, expected auto or one of {', '.join(PROFILES)}")
+        sys.exit(1)
     overwrite = os.environ.get("OVERWRITE", "false").lower() == "true"
+    workers = max(1, int(os.environ.get("WORKERS", "1")))
+    max_temp_bytes = int(float(os.environ.get("MAX_TEMP_GB", "10")) * 1024**3)
+    index_min_keys = int(os.environ.get("INDEX_MIN_KEYS", "10"))
+    streaming = os.environ.get("STREAMING", "false").lower() == "true"
+    stream_buffer_mb = int(os.environ.get("STREAM_BUFFER_MB", "50"))
+    web_mercator = os.environ.get("WEB_MERCATOR", "false").lower() == "true"
     
     info(f"Configuration:")
     info(f"  Bucket: {bucket}")
     info(f"  COG Prefix: {cog_prefix}")
-    info(f"  Compression: {compression}")
+    info(f"  COG profile: {profile}")
+    info(f"  Compression: {compression or '(from profile)'}")
     info(f"  Overwrite: {overwrite}")
+    info(f"  Workers per stage: {workers}")
+    info(f"  Temp disk budget: {max_temp_bytes / 1024**3:.1f} GB")
+    info(f"  Web Mercator copies: {web_mercator}")
+    info(f"  Streaming: {streaming}" + (f" ({stream_buffer_mb} MB upload buffer)" if streaming else ""))
     
-    # Get S3 client
-    s3_client = get_s3_client()
+    if streaming:
+        configure_gdal_streaming(stream_buffer_mb, os.environ.get("TMPDIR", ""))
+    
+    # Get S3 client, pooled for the download and upload stages of every worker
+    s3_client = get_s3_client(concurrent_files=2 * workers)
     
     # Get keys to process
-    keys = get_keys_to_process(s3_client, bucket)
+    keys, sizes = get_keys_to_process(s3_client, bucket)
     if not keys:
         error("No keys to process")
         sys.exit(1)
     
     info(f"Processing {len(keys)} files")
     
-    # Process each file
-    results = {
-        "total": len(keys),
-        "success": 0,
-        "skipped": 0,
-        "failed": 0,
-        "failures": [],
-    }
-    
-    for i, source_key in enumerate(keys, 1):
-        info(f"[{i}/{len(keys)}] Processing: {source_key}")
-        
+    # One listing for the whole job instead of a head_object per file;
+    # tiny jobs keep the per-key path
+    index = None
+    if not overwrite and len(keys) >= index_min_keys:
+        expected = [get_expected_cog_key(k, cog_prefix) for k in keys]
+        if web_mercator:
+            expected += [get_web_mercator_cog_key(k, cog_prefix) for k in keys]
         try:
-            result = convert_to_cog(
-                s3_client,
-                bucket,
-                source_key,
-                cog_prefix,
-                compression,
-                overwrite,
-            )
-            
-            if result["success"]:
-                if result.get("skipped"):
-                    results["skipped"] += 1
-                else:
-                    results["success"] += 1
-            else:
-                results["failed"] += 1
-                results["failures"].append({
-                    "key": source_key,
-                    "error": result.get("error", "Unknown error"),
-                })
-                error(f"Failed: {result.get('error')}")
-                
+            index = build_cog_index(s3_client, bucket, cog_prefix, expected)
         except Exception as e:
-            results["failed"] += 1
-            results["failures"].append({
-                "key": source_key,
-                "error": str(e),
-            })
-            error(f"Exception processing {source_key}: {e}")
-            traceback.print_exc()
+            error(f"Could not build existence index, falling back to per-key checks: {e}")
+    
+    # Process files through the download/convert/upload pipeline
+    file_results = run_pipeline(
+        s3_client,
+        bucket,
+        keys,
+        cog_prefix,
+        compression,
+        overwrite,
+        workers=workers,
+        max_temp_bytes=max_temp_bytes,
+        index=index,
+        streaming=streaming,
+        profile=profile,
+        web_mercator=web_mercator,
+        sizes=sizes,
+    )
+    
+    results = summarize_results(keys, file_results)
+    
+    job = {
+        "job_id": os.environ.get("AWS_BATCH_JOB_ID") or f"local-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "job_vcpus": int(os.environ.get("JOB_VCPUS", "0")) or os.cpu_count(),
+        "job_memory": int(os.environ.get("JOB_MEMORY", "0")),
+        "workers": workers,
+        "compression": compression,
+        "streaming": streaming,
+    }
+    try:
+        write_results(
+            s3_client,
+            bucket,
+            cog_prefix,
+            [result_record(k, r) for k, r in zip(keys, file_results)],
+            job,
+        )
+    except Exception as e:
+        error(f"Could not write results: {e}")
     
     # Summary
     info("=" * 60)
@@ -0,0 +1,83 @@
+"""
+COG key naming shared by the conversion planner, the Batch job and the Lambda handler.
+
+A source TIFF maps to a COG with the same filename, minus the CartoDB table
+prefix, directly under the COG prefix:
+
+    cartodb_exports/rasters/public_rainfall.tif -> cartodb_exports/cogs/rainfall.tif
+
+All three components must agree on this mapping: the planner decides what is
+pending by looking for these keys, and the converters skip files whose key
+already exists.
+"""
+
+import os
+
+# PostgreSQL schema/table naming prefixes added by the CartoDB export
+TABLE_PREFIXES = ("public_", "cdb_importer_")
+
+# Sub-prefix of the COG prefix holding the GoogleMapsCompatible (EPSG:3857) copies
+WEB_MERCATOR_PREFIX = "webmercator/"
+
+
+def strip_table_prefix(filename: str) -> str:
+    """
+    Strip CartoDB table prefixes from filename.
+
+    Removes 'public_' and 'cdb_importer_' prefixes that come from
+    PostgreSQL schema/table naming conventions.
+
+    Examples:
+        public_rainfall_data.tif -> rainfall_data.tif
+        cdb_importer_12345_population.tif -> 12345_population.tif
+    """
+    for prefix in TABLE_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+
+def get_expected_cog_key(source_key: str, cog_prefix: str) -> str:
+    """Get the expected COG key for a source TIFF, stripping table prefixes."""
+    filename = os.path.basename(source_key)
+    return f"{cog_prefix}{strip_table_prefix(filename)}"
+
+
+def get_web_mercator_cog_key(source_key: str, cog_prefix: str) -> str:
+    """
+    Get the key of the Web Mercator copy of a COG.
+
+    Example:
+        cartodb_exports/rasters/public_rainfall.tif -> cartodb_exports/cogs/webmercator/rainfall.tif
+    """
+    return get_expected_cog_key(source_key, f"{cog_prefix}{WEB_MERCATOR_PREFIX}")
+
+
+def get_legacy_cog_key(source_key: str, cog_prefix: str) -> str:
+    """
+    COG key the planner and the Lambda handler used to expect ({stem}_cog.tif).
+
+    Only used to reconcile runs made with the old naming.
+    """
+    stem = os.path.splitext(os.path.basename(source_key))[0]
+    return f"{cog_prefix}{stem}_cog.tif"
+
+
+def find_collisions(source_keys, cog_prefix: str) -> dict[str, list[str]]:
+    """
+    Find source TIFFs that map to the same COG key.
+
+    e.g. public_rainfall.tif and cdb_importer_rainfall.tif both become
+    rainfall.tif; only one of them ends up converted.
+
+    Returns:
+        Dict of COG key -> sorted source keys, for keys with more than one source
+    """
+    by_cog_key: dict[str, list[str]] = {}
+    for source_key in source_keys:
+        by_cog_key.setdefault(get_expected_cog_key(source_key, cog_prefix), []).append(source_key)
+    return {
+        cog_key: sorted(sources)
+        for cog_key, sources in by_cog_key.items()
+        if len(sources) > 1
+    }
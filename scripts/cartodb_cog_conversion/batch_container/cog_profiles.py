@@ -0,0 +1,169 @@
+"""
+Named COG creation profiles shared by the Batch job and the Lambda handler.
+
+A profile fixes the compression, predictor and overview resampling suited to
+a kind of raster; block size and overview level count follow the raster
+size, or follow the tiling scheme when the COG is warped onto one (e.g.
+GoogleMapsCompatible). `choose_profile` picks one from the source metadata:
+
+    categorical       classes / palette rasters: ZSTD, no predictor, MODE overviews
+    continuous-int    integer measurements: ZSTD, horizontal predictor, AVERAGE overviews
+    continuous-float  float measurements: ZSTD, floating point predictor, AVERAGE overviews
+    imagery           3/4-band 8-bit RGB(A): lossless WEBP, AVERAGE overviews
+    legacy            the former fixed settings (LZW, PREDICTOR=YES, 512 blocks)
+
+The metadata dict uses the keys produced by batch_handler.read_raster_metadata
+(dtype, bands, width, height) plus optional color_table, color_interp and
+distinct_values; `metadata_from_gdalinfo` builds it from `gdalinfo -json`.
+"""
+
+import math
+
+PROFILES = {
+    "categorical": {
+        "compress": "ZSTD",
+        "predictor": "NO",
+        "resampling": "MODE",
+        "warp_resampling": "NEAREST",
+    },
+    "continuous-int": {
+        "compress": "ZSTD",
+        "predictor": "STANDARD",
+        "resampling": "AVERAGE",
+        "warp_resampling": "BILINEAR",
+    },
+    "continuous-float": {
+        "compress": "ZSTD",
+        "predictor": "FLOATING_POINT",
+        "resampling": "AVERAGE",
+        "warp_resampling": "BILINEAR",
+    },
+    "imagery": {
+        "compress": "WEBP",
+        "predictor": "NO",
+        "resampling": "AVERAGE",
+        "warp_resampling": "BILINEAR",
+        # QUALITY=100 makes WEBP lossless
+        "quality": 100,
+    },
+    "legacy": {
+        "compress": "LZW",
+        "predictor": "YES",
+        "resampling": "AVERAGE",
+        "warp_resampling": "BILINEAR",
+        "blocksize": 512,
+    },
+}
+
+# Integer rasters with at most this many distinct values in the sample are classes
+CATEGORICAL_MAX_VALUES = 64
+
+# Rasters up to this size in both dimensions use 256 pixel blocks
+SMALL_RASTER_SIZE = 2048
+
+# gdalinfo type names -> numpy names used in metadata
+_GDAL_DTYPES = {"Byte": "uint8", "CFloat32": "complex64", "CFloat64": "complex128"}
+
+
+def choose_profile(metadata: dict) -> str:
+    """
+    Pick a profile name from raster metadata.
+
+    Palette rasters and integer rasters with few distinct sampled values are
+    categorical. Without a sample (distinct_values is None), single-band
+    8-bit rasters are treated as categorical and other integers as
+    continuous.
+    """
+    dtype = metadata.get("dtype", "")
+    bands = metadata.get("bands", 1)
+    color_interp = [c.lower() for c in metadata.get("color_interp") or []]
+
+    if metadata.get("color_table") or "palette" in color_interp:
+        return "categorical"
+    if dtype.startswith("float") or dtype.startswith("complex"):
+        return "continuous-float"
+    if dtype == "uint8" and bands in (3, 4) and color_interp[:3] in ([], ["red", "green", "blue"]):
+        return "imagery"
+
+    distinct_values = metadata.get("distinct_values")
+    if distinct_values is None:
+        return "categorical" if dtype == "uint8" and bands == 1 else "continuous-int"
+    return "categorical" if distinct_values <= CATEGORICAL_MAX_VALUES else "continuous-int"
+
+
+def overview_count(width: int, height: int, blocksize: int) -> int:
+    """Overview levels needed until the whole raster fits in one block."""
+    size = max(width, height)
+    if size <= blocksize:
+        return 0
+    return math.ceil(math.log2(size / blocksize))
+
+
+def creation_options(
+    profile: str, metadata: dict, compression: str = "", tiling_scheme: str = ""
+) -> list[str]:
+    """
+    gdal_translate arguments (-co pairs) for the COG driver.
+
+    Args:
+        profile: Profile name, or "auto" to choose from metadata
+        metadata: Source raster metadata
+        compression: Overrides the profile's compression when set
+        tiling_scheme: Warp onto this tiling scheme (e.g. GoogleMapsCompatible);
+            block size and overview levels then follow the scheme's zoom levels
+
+    Returns:
+        Flat argument list, e.g. ["-co", "COMPRESS=ZSTD", ...]
+    """
+    if profile == "auto":
+        profile = choose_profile(metadata)
+    settings = PROFILES[profile]
+
+    width = metadata.get("width", 0)
+    height = metadata.get("height", 0)
+    blocksize = settings.get("blocksize") or (
+        256 if max(width, height) <= SMALL_RASTER_SIZE else 512
+    )
+    compress = compression or settings["compress"]
+
+    options = [
+        f"COMPRESS={compress}",
+        f"BLOCKSIZE={blocksize}",
+        f"OVERVIEW_RESAMPLING={settings['resampling']}",
+        "BIGTIFF=IF_SAFER",
+        "NUM_THREADS=ALL_CPUS",
+        "OVERVIEWS=IGNORE_EXISTING",
+    ]
+    if compress in ("LZW", "DEFLATE", "ZSTD"):
+        options.append(f"PREDICTOR={settings['predictor']}")
+    if compress in ("WEBP", "JPEG") and "quality" in settings:
+        options.append(f"QUALITY={settings['quality']}")
+    if tiling_scheme:
+        options = [o for o in options if not o.startswith("BLOCKSIZE=")]
+        options += [f"TILING_SCHEME={tiling_scheme}", f"RESAMPLING={settings['warp_resampling']}"]
+    elif profile != "legacy":
+        # Legacy leaves the level count to GDAL
+        options.append(f"OVERVIEW_COUNT={overview_count(width, height, blocksize)}")
+
+    args = []
+    for option in options:
+        args += ["-co", option]
+    return args
+
+
+def metadata_from_gdalinfo(info: dict) -> dict:
+    """Profile inputs from parsed `gdalinfo -json` output."""
+    bands = info.get("bands", [])
+    band = bands[0] if bands else {}
+    dtype = band.get("type", "")
+    width, height = info.get("size", [0, 0])
+    return {
+        "width": width,
+        "height": height,
+        "bands": len(bands),
+        "dtype": _GDAL_DTYPES.get(dtype, dtype.lower()),
+        "nodata": band.get("noDataValue"),
+        "color_table": "colorTable" in band,
+        "color_interp": [b.get("colorInterpretation", "") for b in bands],
+        "distinct_values": None,
+    }
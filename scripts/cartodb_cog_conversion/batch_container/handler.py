@@ -9,21 +9,56 @@ import os
 import json
 import subprocess
 import tempfile
+import time
+import uuid
 import logging
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 
+from cog_keys import get_expected_cog_key
+from cog_profiles import PROFILES, creation_options, choose_profile, metadata_from_gdalinfo
+import s3_transfer
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# S3 client
-s3_client = boto3.client('s3')
+# Stream S3 -> GDAL -> S3 through /vsis3/ instead of downloading to /tmp
+STREAMING = os.environ.get('STREAMING', 'false').lower() == 'true'
+STREAM_BUFFER_MB = int(os.environ.get('STREAM_BUFFER_MB', '50'))
+
+# COG creation profile (see cog_profiles); "auto" chooses one per file
+COG_PROFILE = os.environ.get('COG_PROFILE', 'auto')
+
+# Batches at least this large check existing COGs with one prefix listing
+INDEX_MIN_KEYS = int(os.environ.get('INDEX_MIN_KEYS', '10'))
+
+# Batch fan-out: "auto" invokes this function for large items and converts
+# small ones in threads, "threads" converts everything in threads, "off"
+# converts items one after another
+FAN_OUT = os.environ.get('FAN_OUT', 'auto').lower()
+FAN_OUT_SMALL_MB = float(os.environ.get('FAN_OUT_SMALL_MB', '64'))  # Items up to this size stay local
+FAN_OUT_WORKER_MB = float(os.environ.get('FAN_OUT_WORKER_MB', '1024'))  # Source MB per worker invocation
+FAN_OUT_THREADS = int(os.environ.get('FAN_OUT_THREADS', '4'))
+FAN_OUT_MAX_INVOCATIONS = int(os.environ.get('FAN_OUT_MAX_INVOCATIONS', '32'))
+# Workers run as asynchronous invocations and write their results to S3;
+# the coordinator polls for them until it has FAN_OUT_MARGIN_SECONDS left
+FAN_OUT_POLL_SECONDS = float(os.environ.get('FAN_OUT_POLL_SECONDS', '2'))
+FAN_OUT_MARGIN_SECONDS = float(os.environ.get('FAN_OUT_MARGIN_SECONDS', '20'))
+FAN_OUT_WAIT_SECONDS = 900  # Without a Lambda context (e.g. run locally)
+
+# S3 client and multipart settings shared with the Batch job (see s3_transfer);
+# the pool covers FAN_OUT_THREADS files transferring at once.
+# S3_ENDPOINT_URL points it at a local S3 stand-in for testing
+s3_client = s3_transfer.get_s3_client(concurrent_files=FAN_OUT_THREADS)
+TRANSFER_CONFIG = s3_transfer.get_transfer_config()
 
 
-def lambda_handler(event, context):
+def lambda_handler(event, context, invoker=None):
     """
     Lambda handler for COG conversion.
     
@@ -33,55 +68,392 @@ def lambda_handler(event, context):
         "source_key": "cartodb-rasters/schema_table.tif",
         "dest_bucket": "my-bucket",  # optional, defaults to source_bucket
         "dest_prefix": "cartodb-cogs/",  # optional, defaults to cartodb-cogs/
-        "compression": "LZW",  # optional, defaults to LZW
-        "overwrite": false  # optional, skip if COG exists
+        "profile": "auto",  # optional, COG profile (default from COG_PROFILE)
+        "compression": "ZSTD",  # optional, overrides the profile's compression
+        "overwrite": false,  # optional, skip if COG exists
+        "streaming": false  # optional, convert S3 -> S3 via /vsis3/ (default from STREAMING)
     }
     
     Can also process batch:
     {
         "batch": [
-            {"source_key": "path/to/file1.tif"},
+            {"source_key": "path/to/file1.tif", "size": 1048576},  # size optional
             {"source_key": "path/to/file2.tif"}
         ],
         "source_bucket": "my-bucket",
         "dest_bucket": "my-bucket",
-        "dest_prefix": "cartodb-cogs/"
+        "dest_prefix": "cartodb-cogs/",
+        "fan_out": "auto"  # optional: auto, threads or off (default from FAN_OUT)
     }
+    
+    Batches are fanned out (see run_batch): large items go to worker
+    invocations of this function, small ones are converted in threads.
+    `invoker` replaces the asynchronous Lambda invoke call, e.g. with a
+    local stub. Worker batches carry a "result_bucket" and "result_key";
+    their summary body is also written there as JSON.
     """
     logger.info(f"Received event: {json.dumps(event)}")
     
     # Handle batch processing
     if 'batch' in event:
-        results = []
+        item_events = []
         for item in event['batch']:
             item_event = {**event, **item}
             del item_event['batch']
-            result = process_single_tiff(item_event)
-            results.append(result)
+            item_events.append(item_event)
+        
+        if context is not None:
+            budget = context.get_remaining_time_in_millis() / 1000 - FAN_OUT_MARGIN_SECONDS
+        else:
+            budget = FAN_OUT_WAIT_SECONDS
+        batch_id = getattr(context, 'aws_request_id', None) or uuid.uuid4().hex
+        try:
+            index = build_batch_index(item_events)
+            mode = event.get('fan_out', FAN_OUT).lower()
+            results = run_batch(
+                event, item_events, index, mode, invoker or invoke_worker,
+                deadline=time.monotonic() + budget, batch_id=batch_id,
+            )
+        except Exception as e:
+            if not event.get('result_key'):
+                raise
+            # A worker always reports, or the coordinator waits for it until its deadline
+            logger.error(f"Worker batch failed: {e}")
+            results = [
+                {'status': 'error', 'source_key': item_event.get('source_key'), 'error': f'Worker batch failed: {e}'}
+                for item_event in item_events
+            ]
         
         success_count = sum(1 for r in results if r.get('status') == 'success')
         skip_count = sum(1 for r in results if r.get('status') == 'skipped')
         fail_count = sum(1 for r in results if r.get('status') == 'error')
         
-        return {
-            'statusCode': 200,
-            'body': {
-                'message': f'Batch complete: {success_count} converted, {skip_count} skipped, {fail_count} failed',
-                'results': results
-            }
+        body = {
+            'message': f'Batch complete: {success_count} converted, {skip_count} skipped, {fail_count} failed',
+            'results': results
         }
+        if event.get('result_key'):
+            # Worker of a fanned-out batch: report to the coordinator
+            s3_client.put_object(
+                Bucket=event['result_bucket'], Key=event['result_key'], Body=json.dumps(body).encode()
+            )
+        return {'statusCode': 200, 'body': body}
     
     # Single file processing
     return process_single_tiff(event)
 
 
-def process_single_tiff(event):
-    """Process a single TIFF file."""
-    source_bucket = event.get('source_bucket')
+def run_batch(event, item_events, index, mode, invoker, deadline=None, batch_id=''):
+    """
+    Process the items of a batch event, fanning out according to `mode`.
+    
+    - "off": items are converted one after another in this invocation.
+    - "threads": items are converted by FAN_OUT_THREADS threads.
+    - "auto": COGs that already exist are skipped up front. Items up to
+      FAN_OUT_SMALL_MB are converted in threads here. Larger items are
+      packed into groups of about FAN_OUT_WORKER_MB and sent to
+      asynchronous worker invocations of this function, at most
+      FAN_OUT_MAX_INVOCATIONS at once (see collect_worker_results).
+      Without a function name (e.g. when run locally) everything stays in
+      threads.
+    
+    Workers that have not reported by `deadline` (time.monotonic()) are
+    returned as errors; they keep running and still write their results.
+    
+    Returns:
+        One result dict per item, in input order
+    """
+    if mode == 'off':
+        return [process_single_tiff(item_event, index) for item_event in item_events]
+    
+    results = [None] * len(item_events)
+    local, remote = [], []
+    
+    can_invoke = mode == 'auto' and (invoker is not invoke_worker or os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+    if can_invoke:
+        sizes = get_item_sizes(item_events)
+        for i, item_event in enumerate(item_events):
+            if not item_event.get('overwrite', False) and index is not None and (
+                get_dest_location(item_event) in index
+            ):
+                results[i] = process_single_tiff(item_event, index)  # Recorded as skipped
+            elif sizes[i] <= FAN_OUT_SMALL_MB * 1024**2:
+                local.append(i)
+            else:
+                remote.append(i)
+    else:
+        local = list(range(len(item_events)))
+    
+    groups = pack_worker_groups(remote, sizes) if remote else []
+    if groups:
+        logger.info(f"Fan-out: {len(local)} items in threads, {len(remote)} items in {len(groups)} worker invocations")
+    
+    with ThreadPoolExecutor(max_workers=max(1, FAN_OUT_THREADS)) as threads:
+        local_futures = {i: threads.submit(process_single_tiff, item_events[i], index) for i in local}
+        
+        if groups:
+            group_results = collect_worker_results(
+                event, item_events, groups, invoker,
+                deadline if deadline is not None else time.monotonic() + FAN_OUT_WAIT_SECONDS,
+                batch_id or uuid.uuid4().hex,
+            )
+            for group, group_result in zip(groups, group_results):
+                for i, result in zip(group, group_result):
+                    results[i] = result
+        
+        for i, future in local_futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                logger.error(f"Conversion failed: {e}")
+                results[i] = {'status': 'error', 'source_key': item_events[i].get('source_key'), 'error': str(e)}
+    
+    return results
+
+
+def worker_result_location(event, batch_id, number):
+    """(bucket, key) a worker writes its results to: {dest_prefix}fan_out/{batch_id}/{number}.json."""
+    dest_bucket = event.get('dest_bucket', event.get('source_bucket'))
+    dest_prefix = event.get('dest_prefix', 'cartodb-cogs/')
+    if dest_prefix and not dest_prefix.endswith('/'):
+        dest_prefix += '/'
+    return dest_bucket, f"{dest_prefix}fan_out/{batch_id}/{number}.json"
+
+
+def read_worker_result(bucket, key):
+    """Results a worker wrote, or None if it has not finished. The object is removed once read."""
+    try:
+        body = json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    s3_client.delete_object(Bucket=bucket, Key=key)
+    return body['results']
+
+
+def collect_worker_results(event, item_events, groups, invoker, deadline, batch_id):
+    """
+    Run item groups on asynchronous worker invocations and gather their results.
+    
+    Keeps up to FAN_OUT_MAX_INVOCATIONS workers in flight, polling S3 for the
+    result each one writes every FAN_OUT_POLL_SECONDS. The coordinator does
+    not wait on the invocations themselves, so a worker running close to the
+    function timeout no longer takes the coordinator down with it: groups
+    without results at `deadline` are reported as errors instead.
+    
+    Returns:
+        One list of result dicts per group
+    """
+    def failed(group, error):
+        return [{'status': 'error', 'source_key': item_events[i].get('source_key'), 'error': error} for i in group]
+    
+    group_results = [None] * len(groups)
+    waiting = list(range(len(groups)))
+    in_flight = {}  # group number -> (bucket, key)
+    
+    while waiting or in_flight:
+        while waiting and len(in_flight) < max(1, FAN_OUT_MAX_INVOCATIONS):
+            number = waiting.pop(0)
+            bucket, key = worker_result_location(event, batch_id, number)
+            payload = {
+                **event,
+                'fan_out': 'off',
+                'batch': [event['batch'][i] for i in groups[number]],
+                'result_bucket': bucket,
+                'result_key': key,
+            }
+            try:
+                invoker(payload)
+                in_flight[number] = (bucket, key)
+            except Exception as e:
+                logger.error(f"Worker invocation failed: {e}")
+                group_results[number] = failed(groups[number], f'Worker invocation failed: {e}')
+        
+        for number, (bucket, key) in list(in_flight.items()):
+            try:
+                reported = read_worker_result(bucket, key)
+            except Exception as e:
+                logger.warning(f"Could not read worker results s3://{bucket}/{key}: {e}")
+                continue
+            if reported is not None:
+                group_results[number] = reported
+                del in_flight[number]
+        
+        if not in_flight and not waiting:
+            break
+        if time.monotonic() >= deadline:
+            for number, (bucket, key) in in_flight.items():
+                group_results[number] = failed(
+                    groups[number],
+                    f"Worker did not report before the coordinator's deadline; results will be written to s3://{bucket}/{key}",
+                )
+            for number in waiting:
+                group_results[number] = failed(groups[number], "Not started before the coordinator's deadline")
+            logger.error(f"{len(in_flight)} workers still running and {len(waiting)} groups not started at the deadline")
+            break
+        time.sleep(max(0.0, min(FAN_OUT_POLL_SECONDS, deadline - time.monotonic())))
+    
+    return group_results
+
+
+def get_item_sizes(item_events):
+    """Source sizes of batch items: the optional "size" field, or head_object."""
+    def size_of(item_event):
+        if item_event.get('size') is not None:
+            return int(item_event['size'])
+        try:
+            return s3_client.head_object(
+                Bucket=item_event['source_bucket'], Key=item_event['source_key']
+            )['ContentLength']
+        except Exception:
+            return 0  # Converted locally, where the error is reported
+    
+    with ThreadPoolExecutor(max_workers=max(1, FAN_OUT_THREADS)) as executor:
+        return list(executor.map(size_of, item_events))
+
+
+def pack_worker_groups(indices, sizes):
+    """
+    Pack items into worker invocations of about FAN_OUT_WORKER_MB each.
+    
+    Largest items first, each into the first group it fits (first-fit
+    decreasing); an item larger than the limit gets a group of its own.
+    """
+    limit = FAN_OUT_WORKER_MB * 1024**2
+    groups, loads = [], []
+    for i in sorted(indices, key=lambda i: -sizes[i]):
+        for g, load in enumerate(loads):
+            if load + sizes[i] <= limit:
+                groups[g].append(i)
+                loads[g] += sizes[i]
+                break
+        else:
+            groups.append([i])
+            loads.append(sizes[i])
+    return [sorted(group) for group in groups]
+
+
+def invoke_worker(payload):
+    """Invoke this function asynchronously for one group of batch items."""
+    disable_async_retries()
+    response = lambda_client().invoke(
+        FunctionName=os.environ['AWS_LAMBDA_FUNCTION_NAME'],
+        InvocationType='Event',
+        Payload=json.dumps(payload).encode(),
+    )
+    if response.get('StatusCode') != 202:
+        raise RuntimeError(f"Asynchronous invoke returned status {response.get('StatusCode')}")
+
+
+_lambda_client = None
+_async_retries_disabled = False
+
+
+def disable_async_retries():
+    """
+    Turn off Lambda's retries of failed asynchronous invocations, once per container.
+    
+    Lambda retries a failed Event invocation twice by default, whatever the
+    client's retry settings, which would convert a worker's files again
+    (and, with overwrite, replace COGs a coordinator already reported).
+    Needs lambda:PutFunctionEventInvokeConfig; without it a warning is
+    logged and the function's own event invoke config applies.
+    """
+    global _async_retries_disabled
+    if _async_retries_disabled:
+        return
+    _async_retries_disabled = True
+    try:
+        lambda_client().put_function_event_invoke_config(
+            FunctionName=os.environ['AWS_LAMBDA_FUNCTION_NAME'],
+            MaximumRetryAttempts=0,
+        )
+    except Exception as e:
+        logger.warning(f"Could not set MaximumRetryAttempts=0 for worker invocations: {e}")
+
+
+def lambda_client():
+    """Lambda client for worker invocations, created on first use."""
+    global _lambda_client
+    if _lambda_client is None:
+        # Asynchronous invokes return once queued; a retry of one that was
+        # queued would convert the same files twice
+        _lambda_client = boto3.client('lambda', config=BotoConfig(
+            retries={'max_attempts': 0},
+            max_pool_connections=max(10, FAN_OUT_MAX_INVOCATIONS),
+        ))
+    return _lambda_client
+
+
+def get_dest_location(event):
+    """Return (dest_bucket, dest_key) for a single-file event."""
     source_key = event.get('source_key')
-    dest_bucket = event.get('dest_bucket', source_bucket)
+    dest_bucket = event.get('dest_bucket', event.get('source_bucket'))
     dest_prefix = event.get('dest_prefix', 'cartodb-cogs/')
-    compression = event.get('compression', 'LZW')
+    
+    # Ensure dest_prefix ends with /
+    if dest_prefix and not dest_prefix.endswith('/'):
+        dest_prefix += '/'
+    
+    # Same naming as the Batch converter (see cog_keys)
+    return dest_bucket, get_expected_cog_key(source_key, dest_prefix)
+
+
+def build_batch_index(item_events):
+    """
+    Build an existence index for the destination keys of a batch.
+    
+    Batches with at least INDEX_MIN_KEYS items that skip existing COGs list
+    each destination prefix once instead of issuing a head_object per item.
+    Returns None when the per-key check should be used instead.
+    """
+    pending = [e for e in item_events if not e.get('overwrite', False) and e.get('source_bucket') and e.get('source_key')]
+    if len(pending) < INDEX_MIN_KEYS:
+        return None
+    
+    # Group expected keys by (bucket, prefix)
+    groups = {}
+    for item_event in pending:
+        dest_bucket, dest_key = get_dest_location(item_event)
+        prefix = dest_key.rsplit('/', 1)[0] + '/' if '/' in dest_key else ''
+        groups.setdefault((dest_bucket, prefix), []).append(dest_key)
+    
+    index = set()
+    try:
+        for (bucket, prefix), keys in groups.items():
+            index.update((bucket, key) for key in list_existing_keys(bucket, prefix, keys))
+    except Exception as e:
+        logger.warning(f"Could not build existence index, falling back to per-key checks: {e}")
+        return None
+    
+    logger.info(f"Existence index: {len(index)}/{len(pending)} COGs already present")
+    return index
+
+
+def list_existing_keys(bucket, prefix, keys):
+    """
+    Return which of `keys` exist under `prefix`.
+    
+    Lists only the parts of the prefix around the keys (see
+    s3_transfer.existing_objects). Zero-byte objects and objects without an
+    ETag are ignored.
+    """
+    found, _ = s3_transfer.existing_objects(s3_client, bucket, prefix, keys)
+    return set(found)
+
+
+def process_single_tiff(event, index=None):
+    """
+    Process a single TIFF file.
+    
+    If an existence index from build_batch_index is given, it replaces the
+    per-key head_object check.
+    """
+    source_bucket = event.get('source_bucket')
+    source_key = event.get('source_key')
+    compression = event.get('compression', '')
+    profile = event.get('profile', COG_PROFILE)
     overwrite = event.get('overwrite', False)
     
     if not source_bucket or not source_key:
@@ -90,22 +462,24 @@ def process_single_tiff(event):
             'source_key': source_key,
             'error': 'Missing required parameters: source_bucket and source_key'
         }
+    if profile != 'auto' and profile not in PROFILES:
+        return {
+            'status': 'error',
+            'source_key': source_key,
+            'error': f"Unknown COG profile: {profile}"
+        }
     
-    # Ensure dest_prefix ends with /
-    if dest_prefix and not dest_prefix.endswith('/'):
-        dest_prefix += '/'
-    
-    # Build destination key
-    filename = Path(source_key).name
-    # Add _cog suffix before extension
-    stem = Path(filename).stem
-    dest_key = f"{dest_prefix}{stem}_cog.tif"
+    dest_bucket, dest_key = get_dest_location(event)
     
     logger.info(f"Processing: s3://{source_bucket}/{source_key} -> s3://{dest_bucket}/{dest_key}")
     
     # Check if COG already exists
     if not overwrite:
-        if s3_object_exists(dest_bucket, dest_key):
+        if index is not None:
+            exists = (dest_bucket, dest_key) in index
+        else:
+            exists = s3_object_exists(dest_bucket, dest_key)
+        if exists:
             logger.info(f"COG already exists, skipping: {dest_key}")
             return {
                 'status': 'skipped',
@@ -114,6 +488,9 @@ def process_single_tiff(event):
                 'message': 'COG already exists'
             }
     
+    if event.get('streaming', STREAMING):
+        return process_streaming(source_bucket, source_key, dest_bucket, dest_key, compression, profile)
+    
     # Create temp directory for processing
     with tempfile.TemporaryDirectory() as tmpdir:
         input_path = os.path.join(tmpdir, 'input.tif')
@@ -122,14 +499,14 @@ def process_single_tiff(event):
         try:
             # Download source TIFF
             logger.info(f"Downloading {source_key}...")
-            s3_client.download_file(source_bucket, source_key, input_path)
+            s3_client.download_file(source_bucket, source_key, input_path, Config=TRANSFER_CONFIG)
             
             input_size = os.path.getsize(input_path)
             logger.info(f"Downloaded {input_size} bytes")
             
             # Convert to COG using gdal_translate
-            logger.info(f"Converting to COG with {compression} compression...")
-            result = convert_to_cog(input_path, output_path, compression)
+            logger.info("Converting to COG...")
+            result = convert_to_cog(input_path, output_path, compression, profile=profile)
             
             if not result['success']:
                 return {
@@ -147,11 +524,13 @@ def process_single_tiff(event):
                 output_path, 
                 dest_bucket, 
                 dest_key,
+                Config=TRANSFER_CONFIG,
                 ExtraArgs={
                     'ContentType': 'image/tiff',
                     'Metadata': {
                         'source-key': source_key,
-                        'cog-compression': compression
+                        'cog-profile': result['profile'],
+                        'cog-compression': compression or PROFILES[result['profile']]['compress']
                     }
                 }
             )
@@ -162,6 +541,7 @@ def process_single_tiff(event):
                 'dest_key': dest_key,
                 'source_size': input_size,
                 'cog_size': output_size,
+                'profile': result['profile'],
                 'compression_ratio': round(input_size / output_size, 2) if output_size > 0 else 0
             }
             
@@ -183,29 +563,117 @@ def process_single_tiff(event):
             }
 
 
-def convert_to_cog(input_path, output_path, compression='LZW'):
+def process_streaming(source_bucket, source_key, dest_bucket, dest_key, compression='', profile='auto'):
+    """
+    Convert a TIFF from S3 to S3 without using /tmp for the source or output.
+    
+    GDAL reads the source with ranged requests through /vsis3/ and writes
+    the COG back through /vsis3/ as a multipart upload buffered in memory
+    (STREAM_BUFFER_MB per part). Only overview scratch files use /tmp.
+    """
+    source_path = f"/vsis3/{source_bucket}/{source_key}"
+    output_path = f"/vsis3/{dest_bucket}/{dest_key}"
+    
+    try:
+        input_size = s3_client.head_object(Bucket=source_bucket, Key=source_key)['ContentLength']
+        
+        logger.info("Streaming conversion...")
+        result = convert_to_cog(source_path, output_path, compression, env=get_streaming_env(), profile=profile)
+        if not result['success']:
+            return {
+                'status': 'error',
+                'source_key': source_key,
+                'error': result['error']
+            }
+        
+        output_size = s3_client.head_object(Bucket=dest_bucket, Key=dest_key)['ContentLength']
+        logger.info(f"COG streamed: {output_size} bytes")
+        
+        return {
+            'status': 'success',
+            'source_key': source_key,
+            'dest_key': dest_key,
+            'source_size': input_size,
+            'cog_size': output_size,
+            'profile': result['profile'],
+            'compression_ratio': round(input_size / output_size, 2) if output_size > 0 else 0
+        }
+        
+    except ClientError as e:
+        error_msg = str(e)
+        logger.error(f"S3 error: {error_msg}")
+        return {
+            'status': 'error',
+            'source_key': source_key,
+            'error': f"S3 error: {error_msg}"
+        }
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Unexpected error: {error_msg}")
+        return {
+            'status': 'error',
+            'source_key': source_key,
+            'error': error_msg
+        }
+
+
+def get_streaming_env():
+    """Environment for gdal_translate when reading and writing through /vsis3/."""
+    env = {
+        **os.environ,
+        'CPL_VSIS3_CHUNK_SIZE': str(STREAM_BUFFER_MB),
+        'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+        'CPL_TMPDIR': tempfile.gettempdir(),
+    }
+    
+    # Point GDAL at an alternative endpoint (e.g. a local S3 stand-in)
+    endpoint_url = os.environ.get('S3_ENDPOINT_URL', '')
+    if endpoint_url:
+        parsed = urlparse(endpoint_url)
+        env['AWS_S3_ENDPOINT'] = parsed.netloc
+        env['AWS_HTTPS'] = 'YES' if parsed.scheme == 'https' else 'NO'
+        env['AWS_VIRTUAL_HOSTING'] = 'FALSE'
+    
+    return env
+
+
+def read_profile_metadata(input_path, env=None):
+    """Read the inputs for choosing a COG profile with `gdalinfo -json`."""
+    result = subprocess.run(
+        ['gdalinfo', '-json', input_path],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"gdalinfo failed: {result.stderr.strip()}")
+    return metadata_from_gdalinfo(json.loads(result.stdout))
+
+
+def convert_to_cog(input_path, output_path, compression='', env=None, profile='auto'):
     """
     Convert a GeoTIFF to Cloud-Optimized GeoTIFF using GDAL 3.9+.
     
-    Uses native COG driver with optimal settings for cloud streaming.
+    Creation options (compression, predictor, block size, overview
+    resampling and level count) come from the COG profile, chosen from the
+    source metadata when profile is "auto". A non-empty compression
+    overrides the profile's.
     """
-    # COG creation options for GDAL 3.1+ native COG driver
-    # - COMPRESS: LZW, DEFLATE, ZSTD, JPEG, WEBP, NONE
-    # - PREDICTOR: YES auto-selects best predictor for data type
-    # - BLOCKSIZE: 512 is standard for COG (good balance of size/requests)
-    # - OVERVIEWS: AUTO generates overviews automatically
-    # - BIGTIFF: IF_SAFER handles files > 4GB automatically
+    try:
+        metadata = read_profile_metadata(input_path, env)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f"Could not read source metadata: {e}"
+        }
+    if profile == 'auto':
+        profile = choose_profile(metadata)
     
     cmd = [
         'gdal_translate',
         '-of', 'COG',
-        '-co', f'COMPRESS={compression}',
-        '-co', 'PREDICTOR=YES',
-        '-co', 'BLOCKSIZE=512',
-        '-co', 'OVERVIEWS=IGNORE_EXISTING',
-        '-co', 'OVERVIEW_RESAMPLING=AVERAGE',
-        '-co', 'BIGTIFF=IF_SAFER',
-        '-co', 'NUM_THREADS=ALL_CPUS',
+        *creation_options(profile, metadata, compression),
         input_path,
         output_path
     ]
@@ -217,7 +685,8 @@ def convert_to_cog(input_path, output_path, compression='LZW'):
             cmd,
             capture_output=True,
             text=True,
-            timeout=600  # 10 minute timeout
+            timeout=600,  # 10 minute timeout
+            env=env,
         )
         
         if result.returncode != 0:
@@ -226,9 +695,13 @@ def convert_to_cog(input_path, output_path, compression='LZW'):
                 'error': f"gdal_translate failed: {result.stderr}"
             }
         
+        # Streamed output is verified by the caller with head_object
+        if output_path.startswith('/vsis3/'):
+            return {'success': True, 'profile': profile}
+        
         # Verify output is valid COG
         if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-            return {'success': True}
+            return {'success': True, 'profile': profile}
         else:
             return {
                 'success': False,
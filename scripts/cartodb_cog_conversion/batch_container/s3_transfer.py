@@ -0,0 +1,135 @@
+"""
+S3 clients and transfer settings shared by the conversion tools.
+
+boto3's defaults (8 MB multipart threshold and parts, 10 transfer threads,
+10 pooled connections) are sized for small objects. Our rasters run from
+tens of MB to several GB, and the Batch job and the Lambda handler transfer
+several files at once, so every tool builds its client and TransferConfig
+here instead:
+
+    S3_MULTIPART_THRESHOLD_MB  Objects at least this large use multipart transfers (default: 32)
+    S3_MULTIPART_CHUNKSIZE_MB  Part size of multipart transfers (default: 16)
+    S3_MAX_CONCURRENCY         Parallel part transfers per file (default: 16)
+    S3_MAX_POOL_CONNECTIONS    Pooled HTTP connections per client (default: 64)
+    S3_MAX_ATTEMPTS            Attempts per request, standard retry mode (default: 5)
+    S3_ENDPOINT_URL            Alternative S3 endpoint (e.g. a local S3 stand-in)
+
+Clients get at least S3_MAX_POOL_CONNECTIONS pooled connections, raised to
+cover concurrent_files x S3_MAX_CONCURRENCY for callers that transfer
+several files at once.
+
+existing_objects checks which of many keys exist with a few listing
+requests, for the converters' skip-existing logic.
+"""
+
+import os
+from bisect import bisect_right
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+
+MB = 1024 * 1024
+
+
+def transfer_settings() -> dict:
+    """Current transfer settings from the environment."""
+    return {
+        "multipart_threshold_mb": int(os.environ.get("S3_MULTIPART_THRESHOLD_MB", "32")),
+        "multipart_chunksize_mb": int(os.environ.get("S3_MULTIPART_CHUNKSIZE_MB", "16")),
+        "max_concurrency": int(os.environ.get("S3_MAX_CONCURRENCY", "16")),
+        "max_pool_connections": int(os.environ.get("S3_MAX_POOL_CONNECTIONS", "64")),
+        "max_attempts": int(os.environ.get("S3_MAX_ATTEMPTS", "5")),
+    }
+
+
+def get_transfer_config(**overrides) -> TransferConfig:
+    """
+    TransferConfig for upload_file/download_file.
+
+    Keyword arguments override the environment settings, e.g.
+    get_transfer_config(max_concurrency=4).
+    """
+    settings = {**transfer_settings(), **overrides}
+    return TransferConfig(
+        multipart_threshold=settings["multipart_threshold_mb"] * MB,
+        multipart_chunksize=settings["multipart_chunksize_mb"] * MB,
+        max_concurrency=settings["max_concurrency"],
+        use_threads=settings["max_concurrency"] > 1,
+    )
+
+
+def client_config(concurrent_files: int = 1, max_pool_connections: int = 0) -> BotoConfig:
+    """
+    botocore Config with a connection pool for `concurrent_files` transfers.
+
+    Args:
+        concurrent_files: Files transferred at once through the client
+        max_pool_connections: Lower bound for the pool (e.g. listing threads)
+    """
+    settings = transfer_settings()
+    pool = max(
+        settings["max_pool_connections"],
+        concurrent_files * settings["max_concurrency"],
+        max_pool_connections,
+    )
+    return BotoConfig(
+        max_pool_connections=pool,
+        retries={"max_attempts": settings["max_attempts"], "mode": "standard"},
+    )
+
+
+def get_s3_client(session=None, concurrent_files: int = 1, max_pool_connections: int = 0):
+    """
+    S3 client with the shared pool and retry settings.
+
+    Uses the given boto3 session (default: the default session) and points
+    at S3_ENDPOINT_URL when set.
+    """
+    return (session or boto3).client(
+        "s3",
+        endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+        config=client_config(concurrent_files, max_pool_connections),
+    )
+
+
+def existing_objects(s3_client, bucket: str, prefix: str, keys: list[str], page_size: int = 1000) -> tuple[dict, int]:
+    """
+    Find which of `keys` (all under `prefix`) exist, with list_objects_v2.
+
+    Each request starts just before the next key not yet resolved and covers
+    up to `page_size` keys, so a dense run of keys is resolved by one page and
+    the gaps between sparse keys are skipped rather than paged through, at
+    worst about one request per key. Zero-byte objects and
+    objects without an ETag (e.g. aborted uploads) are not treated as existing.
+
+    Returns:
+        (dict of key -> {"size": ..., "etag": ...} for existing objects,
+        number of listing requests)
+    """
+    wanted = set(keys)
+    pending = sorted(wanted)
+    found = {}
+    requests = 0
+    position = 0
+    # StartAfter is exclusive; any proper prefix of a key sorts before it
+    start_after = pending[0][:-1] if pending else ""
+
+    while position < len(pending):
+        page = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix, StartAfter=start_after, MaxKeys=page_size)
+        requests += 1
+        contents = page.get("Contents", [])
+        for obj in contents:
+            key = obj["Key"]
+            if obj.get("Size", 0) > 0 and obj.get("ETag") and key in wanted:
+                found[key] = {"size": obj["Size"], "etag": obj["ETag"].strip('"')}
+        if not page.get("IsTruncated") or not contents:
+            break
+
+        # Keys up to the end of the page are resolved; jump to the next one
+        last = contents[-1]["Key"]
+        position = bisect_right(pending, last, position)
+        if position < len(pending):
+            start_after = max(last, pending[position][:-1])
+
+    return found, requests
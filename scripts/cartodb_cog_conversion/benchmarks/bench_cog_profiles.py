@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark COG profiles: output size and tile read latency per profile.
+
+Generates synthetic sample rasters (land cover classes, integer elevation,
+float rainfall, RGB imagery), writes each as a COG with the profile chosen
+by cog_profiles.choose_profile and with the legacy LZW settings, and reports
+file size, creation time and the median time to read web map tiles with
+rio-tiler at the minimum and maximum zoom of each COG.
+
+Needs rasterio and rio-tiler (both in cloud_functions/titiler_cogs/requirements.txt).
+
+Usage:
+    python benchmarks/bench_cog_profiles.py --size 4096 --tiles 20
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.transform import from_bounds
+from rasterio.windows import Window
+from rio_tiler.io import Reader
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "batch_container"))
+
+from cog_profiles import choose_profile, creation_options  # noqa: E402
+
+
+def smooth_field(size: int, rng: np.random.Generator, cells: int = 16) -> np.ndarray:
+    """Smooth 0-1 surface: a coarse random grid upsampled bilinearly."""
+    coarse = rng.random((cells + 1, cells + 1))
+    positions = np.linspace(0, cells, size, endpoint=False)
+    i = positions.astype(int)
+    f = positions - i
+    rows = coarse[i] * (1 - f)[:, None] + coarse[i + 1] * f[:, None]
+    return rows[:, i] * (1 - f) + rows[:, i + 1] * f
+
+
+def sample_rasters(size: int, seed: int = 0) -> dict[str, tuple[np.ndarray, dict]]:
+    """Synthetic rasters as (array of shape bands x rows x cols, extra profile)."""
+    rng = np.random.default_rng(seed)
+    base = smooth_field(size, rng)
+    return {
+        "landcover": (
+            (np.digitize(base, np.linspace(0, 1, 13)[1:-1]) + 1).astype("uint8")[None],
+            {"nodata": 0},
+        ),
+        "elevation": (
+            (base * 3000 + rng.normal(0, 2, base.shape)).astype("int16")[None],
+            {"nodata": -32768},
+        ),
+        "rainfall": (
+            (smooth_field(size, rng, 64) * 250 + rng.gamma(1, 2, base.shape)).astype("float32")[None],
+            {"nodata": -9999},
+        ),
+        "imagery": (
+            np.stack([
+                (smooth_field(size, rng, 64) * 255).astype("uint8") for _ in range(3)
+            ]),
+            {"photometric": "RGB"},
+        ),
+    }
+
+
+def write_source(path: Path, data: np.ndarray, extra: dict):
+    """Write a striped, uncompressed GeoTIFF like the CartoDB exports."""
+    bands, height, width = data.shape
+    with rasterio.open(
+        path, "w", driver="GTiff", width=width, height=height, count=bands, dtype=data.dtype,
+        crs="EPSG:4326", transform=from_bounds(-20, -20, 20, 20, width, height), **extra,
+    ) as dst:
+        dst.write(data)
+
+
+def source_metadata(path: Path) -> dict:
+    """The metadata batch_handler.read_raster_metadata would give cog_profiles."""
+    with rasterio.open(path) as src:
+        height, width = src.height, src.width
+        window = Window(
+            (width - min(width, 512)) // 2, (height - min(height, 512)) // 2, min(width, 512), min(height, 512),
+        )
+        sample = src.read(1, window=window)
+        distinct = None
+        if np.issubdtype(sample.dtype, np.integer):
+            values = set(np.unique(sample).tolist())
+            values.discard(src.nodata)
+            distinct = len(values)
+        return {
+            "width": width,
+            "height": height,
+            "bands": src.count,
+            "dtype": src.dtypes[0],
+            "color_table": False,
+            "color_interp": [c.name for c in src.colorinterp],
+            "distinct_values": distinct,
+        }
+
+
+def write_cog(source: Path, dest: Path, args: list[str]) -> float:
+    """Create a COG from gdal_translate style -co args; returns seconds."""
+    options = dict(option.split("=", 1) for option in args[1::2])
+    start = time.perf_counter()
+    rasterio.shutil.copy(source, dest, driver="COG", **options)
+    return time.perf_counter() - start
+
+
+def tile_latency(path: Path, tiles: int, seed: int = 0) -> dict[int, float]:
+    """Median milliseconds per 256px tile read at the COG's min and max zoom."""
+    rng = random.Random(seed)
+    latencies = {}
+    with Reader(str(path)) as cog:
+        for zoom in sorted({cog.minzoom, cog.maxzoom}):
+            bounds = cog.get_geographic_bounds(cog.tms.rasterio_geographic_crs)
+            candidates = list(cog.tms.tiles(*bounds, zooms=[zoom]))
+            chosen = rng.sample(candidates, min(tiles, len(candidates)))
+            timings = []
+            for tile in chosen:
+                start = time.perf_counter()
+                cog.tile(tile.x, tile.y, tile.z)
+                timings.append((time.perf_counter() - start) * 1000)
+            latencies[zoom] = statistics.median(timings)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=4096, help="Width and height of each sample raster")
+    parser.add_argument("--tiles", type=int, default=20, help="Tiles read per zoom level")
+    args = parser.parse_args()
+
+    print(f"{'raster':<10} {'profile':<17} {'size MB':>8} {'vs legacy':>9} {'create s':>9}  tile read ms (zoom)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(tmpdir)
+        for name, (data, extra) in sample_rasters(args.size).items():
+            source = workdir / f"{name}.tif"
+            write_source(source, data, extra)
+            metadata = source_metadata(source)
+
+            legacy_size = None
+            for profile in ("legacy", choose_profile(metadata)):
+                dest = workdir / f"{name}_{profile}.tif"
+                seconds = write_cog(source, dest, creation_options(profile, metadata))
+                size = dest.stat().st_size
+                legacy_size = legacy_size or size
+                latencies = tile_latency(dest, args.tiles)
+                print(
+                    f"{name:<10} {profile:<17} {size / 1024**2:>8.2f} {size / legacy_size:>8.0%} {seconds:>9.2f}  "
+                    + "  ".join(f"{ms:.1f} (z{zoom})" for zoom, ms in latencies.items())
+                )
+
+
+if __name__ == "__main__":
+    main()
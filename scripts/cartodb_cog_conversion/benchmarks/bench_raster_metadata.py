@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark raster metadata reads: in-process GDAL vs `gdalinfo -json`.
+
+Reads every GeoTIFF in a directory with both paths used by
+batch_handler.read_raster_metadata, checks that they agree on CRS, size,
+dtype, nodata, block size and overviews, and reports per-file timings.
+
+Usage:
+    python benchmarks/bench_raster_metadata.py /path/to/sample/tiffs --rounds 5
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "batch_container"))
+
+import batch_handler  # noqa: E402
+
+COMPARED_FIELDS = ["crs_epsg", "width", "height", "bands", "dtype", "nodata", "block_size", "overviews"]
+
+
+def time_reader(reader, paths: list[Path], rounds: int) -> list[float]:
+    """Return the median milliseconds per file for each round."""
+    per_round = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for path in paths:
+            reader(str(path))
+        per_round.append((time.perf_counter() - start) / len(paths) * 1000)
+    return per_round
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", type=Path, help="Directory of sample GeoTIFFs")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed passes over the directory")
+    args = parser.parse_args()
+
+    if batch_handler.gdal is None:
+        print("ERROR: GDAL Python bindings (osgeo) are required for the in-process path")
+        sys.exit(1)
+
+    paths = sorted(p for p in args.directory.iterdir() if p.suffix.lower() in (".tif", ".tiff"))
+    if not paths:
+        print(f"No GeoTIFFs found in {args.directory}")
+        sys.exit(1)
+
+    mismatches = 0
+    for path in paths:
+        in_process = batch_handler._read_metadata_gdal(str(path))
+        spawned = batch_handler._read_metadata_gdalinfo(str(path))
+        for field in COMPARED_FIELDS:
+            if in_process[field] != spawned[field]:
+                mismatches += 1
+                print(f"  {path.name}: {field} differs: {in_process[field]!r} != {spawned[field]!r}")
+
+    timings = {
+        "in-process (osgeo.gdal)": time_reader(batch_handler._read_metadata_gdal, paths, args.rounds),
+        "gdalinfo -json": time_reader(batch_handler._read_metadata_gdalinfo, paths, args.rounds),
+    }
+
+    print(f"\n{len(paths)} files, {args.rounds} rounds, {mismatches} field mismatches")
+    print(f"{'reader':<26} {'median ms/file':>15} {'min ms/file':>12}")
+    for name, per_round in timings.items():
+        print(f"{name:<26} {statistics.median(per_round):>15.2f} {min(per_round):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark S3 transfer settings: upload and download throughput per raster size.
+
+Uploads and downloads random (incompressible) files of typical raster sizes
+with boto3's default TransferConfig, with the shared settings from
+s3_transfer (S3_* environment variables) and with a grid of part sizes and
+per-file concurrency, and reports the median MB/s of each.
+
+Runs against S3_ENDPOINT_URL when set (e.g. MinIO), otherwise starts a local
+moto server (pip install "moto[server]"). A local stand-in shows how
+settings compare, not what S3 itself will do; absolute numbers on AWS depend
+on the instance's network bandwidth.
+
+Usage:
+    python benchmarks/bench_s3_transfer.py --sizes 16,128,512 --chunks 8,16,64 --concurrency 4,16
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "batch_container"))
+
+import s3_transfer  # noqa: E402
+
+BUCKET = "bench-transfer"
+MB = s3_transfer.MB
+
+
+def start_moto_server() -> subprocess.Popen:
+    """Start moto in its own process so it does not share our GIL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    else:
+        server.terminate()
+        raise RuntimeError("moto server did not start")
+    os.environ["S3_ENDPOINT_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    return server
+
+
+def write_random_file(path: Path, size_mb: int):
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(MB))
+
+
+def settings_grid(chunks: list[int], concurrency: list[int]) -> list[tuple[str, object, TransferConfig]]:
+    """(label, client, TransferConfig) for every setting compared."""
+    endpoint = os.environ["S3_ENDPOINT_URL"]
+    shared = s3_transfer.transfer_settings()
+    grid = [
+        ("boto3 default", boto3.client("s3", endpoint_url=endpoint), TransferConfig()),
+        (
+            f"shared ({shared['multipart_chunksize_mb']} MB x {shared['max_concurrency']})",
+            s3_transfer.get_s3_client(),
+            s3_transfer.get_transfer_config(),
+        ),
+    ]
+    for chunk in chunks:
+        for threads in concurrency:
+            grid.append((
+                f"{chunk} MB x {threads}",
+                s3_transfer.get_s3_client(max_pool_connections=threads),
+                s3_transfer.get_transfer_config(
+                    multipart_threshold_mb=chunk, multipart_chunksize_mb=chunk, max_concurrency=threads
+                ),
+            ))
+    return grid
+
+
+def throughput(client, config: TransferConfig, source: Path, workdir: Path, size_mb: int, rounds: int):
+    """Median upload and download MB/s over `rounds` transfers."""
+    key = f"bench/{source.name}"
+    target = workdir / "download.tif"
+    uploads, downloads = [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        client.upload_file(str(source), BUCKET, key, Config=config)
+        uploads.append(size_mb / (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        client.download_file(BUCKET, key, str(target), Config=config)
+        downloads.append(size_mb / (time.perf_counter() - start))
+        target.unlink()
+    client.delete_object(Bucket=BUCKET, Key=key)
+    return statistics.median(uploads), statistics.median(downloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="16,128,512", help="Comma-separated file sizes in MB")
+    parser.add_argument("--chunks", default="8,16,64", help="Comma-separated part sizes in MB for the grid")
+    parser.add_argument("--concurrency", default="4,16", help="Comma-separated threads per file for the grid")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed transfers per setting")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    chunks = [int(c) for c in args.chunks.split(",")]
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    server = None if os.environ.get("S3_ENDPOINT_URL") else start_moto_server()
+    try:
+        grid = settings_grid(chunks, concurrency)
+        grid[0][1].create_bucket(Bucket=BUCKET)
+        print(f"endpoint: {os.environ['S3_ENDPOINT_URL']}")
+        print(f"{'size MB':>7}  {'setting':<24} {'upload MB/s':>11} {'download MB/s':>13}")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            workdir = Path(tmpdir)
+            for size_mb in sizes:
+                source = workdir / f"raster_{size_mb}mb.tif"
+                write_random_file(source, size_mb)
+                for label, client, config in grid:
+                    up, down = throughput(client, config, source, workdir, size_mb, args.rounds)
+                    print(f"{size_mb:>7}  {label:<24} {up:>11.1f} {down:>13.1f}")
+                source.unlink()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
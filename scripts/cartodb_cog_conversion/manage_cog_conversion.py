@@ -11,22 +11,35 @@ Usage:
     python manage_cog_conversion.py list       - List all raw TIFFs
     python manage_cog_conversion.py status     - Show conversion status
     python manage_cog_conversion.py convert    - Submit batch jobs for pending TIFFs
+    python manage_cog_conversion.py plan       - Predict job makespan for pending TIFFs
+    python manage_cog_conversion.py reconcile  - Report COG naming mismatches and collisions
+    python manage_cog_conversion.py scan       - Check COG headers and re-convert broken COGs
+    python manage_cog_conversion.py mosaic     - Build a MosaicJSON index of existing COGs
+    python manage_cog_conversion.py cost-model - Fit job settings from past conversion results
     python manage_cog_conversion.py jobs       - Show status of batch jobs
     python manage_cog_conversion.py setup      - Set up AWS Batch infrastructure
     python manage_cog_conversion.py deploy     - Build and push Docker image
 """
 
 import argparse
+import csv
+import gzip
+import heapq
+import io
 import json
 import math
 import os
 import re
+import sqlite3
+import struct
 import subprocess
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
+from urllib.parse import unquote_plus
 
 try:
     import boto3
@@ -35,6 +48,11 @@ except ImportError:
     print("ERROR: boto3 is required. Install with: pip install boto3")
     sys.exit(1)
 
+from batch_container import s3_transfer
+from batch_container.cog_keys import (
+    WEB_MERCATOR_PREFIX, find_collisions, get_expected_cog_key, get_legacy_cog_key, get_web_mercator_cog_key,
+)
+
 
 # =============================================================================
 # Configuration
@@ -44,6 +62,24 @@ class Config:
     """Configuration settings with environment variable overrides."""
     
     def __init__(self):
+        # Local directories
+        self.script_dir = Path(__file__).parent.resolve()
+        self.output_dir = Path(os.environ.get("OUTPUT_DIR", self.script_dir / "cog_status"))
+        self.docker_dir = self.script_dir / "batch_container"
+        
+        # Ensure output directory exists
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Recommendations from the cost-model command; explicit env vars win
+        self.cost_model_file = self.output_dir / "cost_model.json"
+        model = {}
+        if os.environ.get("USE_COST_MODEL", "true").lower() == "true" and self.cost_model_file.exists():
+            with open(self.cost_model_file) as f:
+                model = json.load(f).get("settings", {})
+        
+        def setting(name: str, default: str) -> str:
+            return os.environ.get(name) or str(model.get(name, default))
+        
         # S3 configuration
         self.s3_bucket = os.environ.get("S3_BUCKET", "")
         self.source_prefix = os.environ.get("SOURCE_PREFIX", "cartodb_exports/rasters/")
@@ -59,31 +95,63 @@ class Config:
         self.job_definition_name = os.environ.get("JOB_DEFINITION_NAME", "cog-converter-job")
         
         # Processing options
-        self.files_per_job = int(os.environ.get("FILES_PER_JOB", "50"))  # Files per batch job
+        self.files_per_job = int(setting("FILES_PER_JOB", "50"))  # Files per batch job
         self.max_vcpus = int(os.environ.get("MAX_VCPUS", "16"))  # Max concurrent vCPUs
-        self.job_vcpus = int(os.environ.get("JOB_VCPUS", "2"))  # vCPUs per job
-        self.job_memory = int(os.environ.get("JOB_MEMORY", "4096"))  # MB per job
-        self.compression = os.environ.get("COMPRESSION", "LZW")
+        self.job_vcpus = int(setting("JOB_VCPUS", "2"))  # vCPUs per job
+        self.job_memory = int(setting("JOB_MEMORY", "4096"))  # MB per job
+        self.max_job_memory = int(os.environ.get("MAX_JOB_MEMORY", "30720"))  # Cap on recommended JOB_MEMORY
+        self.pipeline_workers = int(os.environ.get("PIPELINE_WORKERS", "1"))  # Threads per download/convert/upload stage
+        self.max_temp_gb = float(os.environ.get("MAX_TEMP_GB", "10"))  # Temp disk budget per job
+        self.streaming = os.environ.get("STREAMING", "false").lower() == "true"  # S3 -> S3 via /vsis3/
+        self.stream_buffer_mb = int(os.environ.get("STREAM_BUFFER_MB", "50"))
+        self.web_mercator = os.environ.get("WEB_MERCATOR", "false").lower() == "true"  # Also write EPSG:3857 copies
+        self.cog_profile = os.environ.get("COG_PROFILE", "auto")  # See batch_container/cog_profiles.py
+        self.compression = os.environ.get("COMPRESSION", "")  # Overrides the profile's compression
         self.overwrite = os.environ.get("OVERWRITE", "false").lower() == "true"
         self.filename_filter = os.environ.get("FILENAME_FILTER", "")
         # RASTER_TYPE: "public", "cdb_importer", or "both" (default)
         self.raster_type = os.environ.get("RASTER_TYPE", "both").lower()
         self.dry_run = os.environ.get("DRY_RUN", "false").lower() == "true"
         self.use_spot = os.environ.get("USE_SPOT", "true").lower() == "true"
+        self.list_workers = int(os.environ.get("LIST_WORKERS", "16"))  # Parallel S3 listing threads
         
-        # Local directories
-        self.script_dir = Path(__file__).parent.resolve()
-        self.output_dir = Path(os.environ.get("OUTPUT_DIR", self.script_dir / "cog_status"))
-        self.docker_dir = self.script_dir / "batch_container"
+        # Header scan: ranged reads of the first SCAN_HEADER_KB of each COG;
+        # files with any of SCAN_ISSUES (default: all) are re-converted
+        self.scan_workers = int(os.environ.get("SCAN_WORKERS", "32"))
+        self.scan_header_kb = int(os.environ.get("SCAN_HEADER_KB", "16"))
+        self.scan_issues = [i for i in os.environ.get("SCAN_ISSUES", "").split(",") if i]
         
-        # Ensure output directory exists
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Mosaic index: quadkey zoom defaults to the mosaic's minzoom
+        self.mosaic_name = os.environ.get("MOSAIC_NAME", "cogs")
+        quadkey_zoom = os.environ.get("MOSAIC_QUADKEY_ZOOM", "")
+        self.mosaic_quadkey_zoom = int(quadkey_zoom) if quadkey_zoom else None
+        
+        # Listing store: "full" lists both prefixes on every run, "auto" reuses
+        # a source listing younger than LISTING_MAX_AGE_HOURS (COGs are
+        # always listed)
+        self.listing_sync = os.environ.get("LISTING_SYNC", "full").lower()
+        self.listing_max_age_hours = float(os.environ.get("LISTING_MAX_AGE_HOURS", "24"))
+        self.inventory_manifest = os.environ.get("S3_INVENTORY_MANIFEST", "")
+        
+        # Job scheduling: "binpack" balances estimated cost per job, "fixed"
+        # takes FILES_PER_JOB files at a time in listing order
+        self.scheduler = os.environ.get("SCHEDULER", "binpack").lower()
+        self.target_bytes_per_job = int(os.environ.get("TARGET_BYTES_PER_JOB", "0"))
+        self.target_minutes_per_job = float(os.environ.get("TARGET_MINUTES_PER_JOB", "0"))
+        # Conversion cost estimate: seconds per file plus seconds per GB
+        self.file_overhead_seconds = float(setting("FILE_OVERHEAD_SECONDS", "5"))
+        self.seconds_per_gb = float(setting("SECONDS_PER_GB", "120"))
         
         # Status files
+        self.listing_db = self.output_dir / "listing.db"
         self.tiff_list = self.output_dir / "raw_tiffs.txt"
         self.cog_list = self.output_dir / "existing_cogs.txt"
         self.pending_list = self.output_dir / "pending_conversions.txt"
         self.jobs_file = self.output_dir / "submitted_jobs.json"
+        self.reconcile_file = self.output_dir / "reconcile_report.json"
+        self.scan_file = self.output_dir / "scan_report.json"
+        self.mosaic_file = self.output_dir / f"mosaic_{self.mosaic_name}.json"
+        self.mosaic_key = f"{self.cog_prefix}mosaics/{self.mosaic_name}.json"
         self.log_file = self.output_dir / "cog_conversion.log"
     
     def validate(self):
@@ -144,7 +212,11 @@ def get_boto_session(config: Config):
 def get_s3_client(config: Config):
     """Get S3 client."""
     session = get_boto_session(config)
-    return session.client("s3")
+    # Shared pool/retry settings, with enough connections for the parallel
+    # listing and scan threads
+    return s3_transfer.get_s3_client(
+        session, max_pool_connections=max(config.list_workers, config.scan_workers)
+    )
 
 
 def get_batch_client(config: Config):
@@ -171,65 +243,359 @@ def get_sts_client(config: Config):
     return session.client("sts")
 
 
+# =============================================================================
+# Listing Store
+# =============================================================================
+
+LISTING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    prefix TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    cog_key TEXT,
+    PRIMARY KEY (prefix, key)
+);
+CREATE INDEX IF NOT EXISTS objects_cog_key ON objects (prefix, cog_key);
+CREATE TABLE IF NOT EXISTS sync_state (
+    prefix TEXT PRIMARY KEY,
+    last_full_sync REAL,
+    last_sync REAL,
+    cog_prefix TEXT
+);
+"""
+
+
+# Bumped whenever the derived cog_key column changes meaning
+# (2: cog_keys naming, table prefix stripped, no _cog suffix)
+LISTING_KEY_VERSION = 2
+
+
+def expected_cog_key(config: Config, source_key: str) -> str:
+    """COG key the converter writes for a source TIFF."""
+    return get_expected_cog_key(source_key, config.cog_prefix)
+
+
+def tiff_selected(config: Config, key: str) -> bool:
+    """Apply the TIFF suffix, RASTER_TYPE and FILENAME_FILTER filters to a source key."""
+    filename = os.path.basename(key)
+    
+    # Check if it's a TIFF
+    if not key.lower().endswith((".tif", ".tiff")):
+        return False
+    
+    # Apply raster type filter
+    if config.raster_type == "public":
+        if not filename.startswith("public_"):
+            return False
+    elif config.raster_type == "cdb_importer":
+        if not filename.startswith("cdb_importer_"):
+            return False
+    # "both" accepts all files
+    
+    # Apply filename filter
+    if config.filename_filter:
+        if not re.search(config.filename_filter, filename):
+            return False
+    
+    return True
+
+
+def open_listing_db(config: Config) -> sqlite3.Connection:
+    """
+    Open the local listing store (cog_status/listing.db).
+    
+    Each call returns a new connection, so the source and COG listings can
+    sync from separate threads.
+    """
+    conn = sqlite3.connect(config.listing_db, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(LISTING_SCHEMA)
+    conn.create_function("tiff_selected", 1, lambda key: tiff_selected(config, key), deterministic=True)
+    conn.create_function("expected_cog_key", 1, lambda key: expected_cog_key(config, key), deterministic=True)
+    conn.create_function(
+        "web_mercator_cog_key", 1, lambda key: get_web_mercator_cog_key(key, config.cog_prefix), deterministic=True
+    )
+    
+    # Re-derive stored COG keys written under an older naming scheme
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < LISTING_KEY_VERSION:
+            conn.execute("UPDATE objects SET cog_key = expected_cog_key(key) WHERE cog_key IS NOT NULL")
+            conn.execute(f"PRAGMA user_version = {LISTING_KEY_VERSION}")
+    return conn
+
+
+def _object_row(prefix: str, obj: dict, cog_key: Optional[str]) -> tuple:
+    last_modified = obj.get("LastModified")
+    if isinstance(last_modified, datetime):
+        last_modified = last_modified.isoformat()
+    etag = (obj.get("ETag") or "").strip('"')
+    return (prefix, obj["Key"], obj["Size"], etag, last_modified, cog_key)
+
+
+def read_inventory_manifest(config: Config, s3, prefix: str) -> list[dict]:
+    """
+    Read objects under a prefix from an S3 Inventory report (CSV format).
+    
+    S3_INVENTORY_MANIFEST points at the report's manifest.json. Only the
+    Key, Size, ETag and LastModifiedDate columns are used.
+    
+    Returns:
+        Object dicts shaped like list_objects_v2 entries
+    """
+    bucket, _, manifest_key = config.inventory_manifest.removeprefix("s3://").partition("/")
+    manifest = json.loads(s3.get_object(Bucket=bucket, Key=manifest_key)["Body"].read())
+    
+    if manifest.get("fileFormat", "").upper() != "CSV":
+        raise ValueError(f"Unsupported inventory format: {manifest.get('fileFormat')} (only CSV)")
+    
+    columns = [c.strip() for c in manifest["fileSchema"].split(",")]
+    report_bucket = manifest["destinationBucket"].split(":::")[-1]
+    
+    objects = []
+    for report in manifest["files"]:
+        body = s3.get_object(Bucket=report_bucket, Key=report["key"])["Body"].read()
+        text = gzip.decompress(body).decode("utf-8")
+        for record in csv.reader(io.StringIO(text)):
+            row = dict(zip(columns, record))
+            key = unquote_plus(row["Key"])
+            if not key.startswith(prefix):
+                continue
+            objects.append({
+                "Key": key,
+                "Size": int(row.get("Size") or 0),
+                "ETag": row.get("ETag", ""),
+                "LastModified": row.get("LastModifiedDate"),
+            })
+    
+    info(f"Read {len(objects)} objects under {prefix} from inventory {config.inventory_manifest}", config)
+    return objects
+
+
+def sync_listing(config: Config, prefix: str, source: bool) -> int:
+    """
+    Bring the stored listing of an S3 prefix up to date.
+    
+    The prefix is listed in full (see list_objects_parallel) and the
+    differences are applied to the stored rows: new and changed objects are
+    written and objects no longer listed are removed. S3 only lists keys in
+    sort order, and new exports and COGs land anywhere in it, so nothing
+    short of a full listing finds every change.
+    
+    With S3_INVENTORY_MANIFEST the source prefix is read from the Inventory
+    report instead; reports lag by up to a day, so newer sources are picked
+    up by a later report. LISTING_SYNC=auto reuses a source listing younger
+    than LISTING_MAX_AGE_HOURS without touching S3. The COG prefix is always
+    listed, since pending conversions and status depend on which COGs exist.
+    
+    Source rows carry the derived COG key so pending conversions are a join.
+    
+    Returns:
+        Number of objects fetched from S3 (0 when the stored listing was reused)
+    """
+    s3 = get_s3_client(config)
+    conn = open_listing_db(config)
+    
+    try:
+        state = conn.execute(
+            "SELECT last_full_sync, cog_prefix FROM sync_state WHERE prefix = ?", (prefix,)
+        ).fetchone()
+        now = time.time()
+        
+        if source and state is not None and state[1] != config.cog_prefix:
+            # COG_PREFIX changed since the rows were written
+            with conn:
+                conn.execute(
+                    "UPDATE objects SET cog_key = expected_cog_key(key) WHERE prefix = ?", (prefix,)
+                )
+                conn.execute("UPDATE sync_state SET cog_prefix = ? WHERE prefix = ?", (config.cog_prefix, prefix))
+        
+        if (
+            source
+            and config.listing_sync == "auto"
+            and state is not None
+            and state[0] is not None
+            and now - state[0] <= config.listing_max_age_hours * 3600
+        ):
+            age_hours = (now - state[0]) / 3600
+            info(f"Reusing stored listing of {prefix} ({age_hours:.1f}h old, LISTING_SYNC=auto)", config)
+            return 0
+        
+        objects = None
+        if source and config.inventory_manifest:
+            try:
+                objects = read_inventory_manifest(config, s3, prefix)
+            except (ClientError, ValueError, KeyError) as e:
+                warn(f"Could not read inventory, listing instead: {e}", config)
+        
+        if objects is None:
+            try:
+                objects = list_objects_parallel(config, s3, prefix)
+            except ClientError as e:
+                # Prefix might not exist yet
+                if e.response["Error"]["Code"] != "NoSuchKey":
+                    raise
+                objects = []
+        
+        cog_key = (lambda key: expected_cog_key(config, key)) if source else (lambda key: None)
+        stored = {
+            key: (size, etag, last_modified)
+            for key, size, etag, last_modified in conn.execute(
+                "SELECT key, size, etag, last_modified FROM objects WHERE prefix = ?", (prefix,)
+            )
+        }
+        rows = [_object_row(prefix, obj, cog_key(obj["Key"])) for obj in objects]
+        changed = [row for row in rows if stored.get(row[1]) != row[2:5]]
+        removed = stored.keys() - {row[1] for row in rows}
+        
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)", changed)
+            conn.executemany(
+                "DELETE FROM objects WHERE prefix = ? AND key = ?", ((prefix, key) for key in removed)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (prefix, now, now, config.cog_prefix)
+            )
+        
+        added = sum(1 for row in changed if row[1] not in stored)
+        info(
+            f"Synced {prefix}: {len(objects)} objects "
+            f"({added} new, {len(changed) - added} changed, {len(removed)} removed)",
+            config,
+        )
+        return len(objects)
+    finally:
+        conn.close()
+
+
 # =============================================================================
 # S3 Listing Functions
 # =============================================================================
 
+# Upper bound used to pick split points in the open-ended last key range.
+# Only printable ASCII is split on; keys above it still land in the last range.
+_KEY_CEILING = "\x7f"
+
+
+def split_key_range(low: str, high: str) -> Optional[str]:
+    """
+    Pick a key strictly between low and high (lexicographic order).
+    
+    Used to cut a listing range in two. Splits on the first character where
+    the bounds differ, or on the character after it when the two are
+    adjacent. Returns None if no printable split point exists.
+    """
+    if low >= high:
+        return None
+    
+    i = 0
+    while i < len(low) and low[i] == high[i]:
+        i += 1
+    
+    a = ord(low[i]) if i < len(low) else 0x1f
+    b = ord(high[i])
+    if b - a >= 2:
+        return low[:i] + chr((a + b) // 2)
+    
+    # Adjacent characters: anything starting with low[:i + 1] sorts below
+    # high, so find a position in low that can still be incremented
+    for j in range(i + 1, len(low) + 1):
+        a = ord(low[j]) if j < len(low) else 0x1f
+        if 0x7f - a >= 2:
+            return low[:j] + chr((a + 0x7f) // 2)
+    return None
+
+
+def list_objects_parallel(config: Config, s3, prefix: str) -> list[dict]:
+    """
+    List all objects under a prefix using concurrent ranged listings.
+    
+    The keyspace is covered by (start_after, upper] ranges, each paged with
+    list_objects_v2 StartAfter. Whenever a page comes back truncated and a
+    worker is idle, the remainder of the range is split at a midpoint key,
+    so heavily populated regions (e.g. everything under "public_") are
+    divided as they are discovered. The ranges are contiguous, so the
+    listing is exhaustive and free of duplicates regardless of key alphabet.
+    
+    Returns:
+        Object dicts (as returned by S3) sorted by key
+    """
+    workers = max(1, config.list_workers)
+    
+    def list_page(start_after: Optional[str], upper: Optional[str]):
+        params = {"Bucket": config.s3_bucket, "Prefix": prefix}
+        if start_after:
+            params["StartAfter"] = start_after
+        response = s3.list_objects_v2(**params)
+        contents = response.get("Contents", [])
+        objects = [obj for obj in contents if upper is None or obj["Key"] <= upper]
+        
+        if not response.get("IsTruncated") or not contents or len(objects) < len(contents):
+            return objects, None
+        return objects, contents[-1]["Key"]
+    
+    objects = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {executor.submit(list_page, None, None): None}
+        
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                upper = running.pop(future)
+                page, last_key = future.result()
+                objects.extend(page)
+                
+                if last_key is None:
+                    continue
+                
+                split = None
+                if len(running) < workers - 1:
+                    split = split_key_range(last_key, upper if upper is not None else prefix + _KEY_CEILING)
+                
+                if split is None:
+                    running[executor.submit(list_page, last_key, upper)] = upper
+                else:
+                    running[executor.submit(list_page, last_key, split)] = split
+                    running[executor.submit(list_page, split, upper)] = upper
+    
+    objects.sort(key=lambda obj: obj["Key"])
+    return objects
+
+
 def list_raw_tiffs(config: Config) -> list[tuple[str, int]]:
     """
     List all raw TIFFs in source prefix.
     
+    Syncs the stored listing first (see sync_listing), then applies the
+    TIFF, raster type and filename filters.
+    
     Returns:
         List of (key, size) tuples
     """
     info(f"Listing raw TIFFs in s3://{config.s3_bucket}/{config.source_prefix}...", config)
     
-    s3 = get_s3_client(config)
-    tiffs = []
+    sync_listing(config, config.source_prefix, source=True)
     
-    paginator = s3.get_paginator("list_objects_v2")
-    page_iterator = paginator.paginate(
-        Bucket=config.s3_bucket,
-        Prefix=config.source_prefix
-    )
-    
-    # Compile filename filter regex if specified
-    filter_regex = None
     if config.filename_filter:
         info(f"Applying filename filter: {config.filename_filter}", config)
-        filter_regex = re.compile(config.filename_filter)
     
     # Raster type filter
     if config.raster_type != "both":
         info(f"Filtering by raster type: {config.raster_type}", config)
     
-    for page in page_iterator:
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            size = obj["Size"]
-            filename = os.path.basename(key)
-            
-            # Check if it's a TIFF
-            if not key.lower().endswith((".tif", ".tiff")):
-                continue
-            
-            # Apply raster type filter
-            if config.raster_type == "public":
-                if not filename.startswith("public_"):
-                    continue
-            elif config.raster_type == "cdb_importer":
-                if not filename.startswith("cdb_importer_"):
-                    continue
-            # "both" accepts all files
-            
-            # Apply filename filter
-            if filter_regex:
-                if not filter_regex.search(filename):
-                    continue
-            
-            tiffs.append((key, size))
+    conn = open_listing_db(config)
+    try:
+        tiffs = conn.execute(
+            "SELECT key, size FROM objects WHERE prefix = ? AND tiff_selected(key) ORDER BY key",
+            (config.source_prefix,)
+        ).fetchall()
+    finally:
+        conn.close()
     
-    info(f"Found {len(tiffs)} raw TIFFs{' (filtered)' if filter_regex else ''}", config)
+    info(f"Found {len(tiffs)} raw TIFFs{' (filtered)' if config.filename_filter else ''}", config)
     
     # Save to file
     with open(config.tiff_list, "w") as f:
@@ -239,70 +605,94 @@ def list_raw_tiffs(config: Config) -> list[tuple[str, int]]:
     return tiffs
 
 
+def stored_cogs(config: Config, web_mercator: bool = False) -> list[str]:
+    """
+    COG keys in the stored listing of the destination prefix.
+    
+    Only the native COGs, or with web_mercator only the webmercator/ copies.
+    """
+    mercator_prefix = config.cog_prefix + WEB_MERCATOR_PREFIX
+    conn = open_listing_db(config)
+    try:
+        return [
+            key for (key,) in conn.execute(
+                "SELECT key FROM objects WHERE prefix = ? ORDER BY key", (config.cog_prefix,)
+            )
+            if key.lower().endswith((".tif", ".tiff")) and key.startswith(mercator_prefix) == web_mercator
+        ]
+    finally:
+        conn.close()
+
+
 def list_existing_cogs(config: Config) -> set[str]:
     """
     List all existing COGs in destination prefix.
     
+    The webmercator/ copies are not included (see stored_cogs).
+    
     Returns:
         Set of COG keys
     """
     info(f"Listing existing COGs in s3://{config.s3_bucket}/{config.cog_prefix}...", config)
     
-    s3 = get_s3_client(config)
-    cogs = set()
+    sync_listing(config, config.cog_prefix, source=False)
     
-    paginator = s3.get_paginator("list_objects_v2")
-    
-    try:
-        page_iterator = paginator.paginate(
-            Bucket=config.s3_bucket,
-            Prefix=config.cog_prefix
-        )
-        
-        for page in page_iterator:
-            for obj in page.get("Contents", []):
-                key = obj["Key"]
-                if key.lower().endswith((".tif", ".tiff")):
-                    cogs.add(key)
-    except ClientError as e:
-        # Prefix might not exist yet
-        if e.response["Error"]["Code"] != "NoSuchKey":
-            raise
+    cogs = stored_cogs(config)
     
     info(f"Found {len(cogs)} existing COGs", config)
     
     # Save to file
     with open(config.cog_list, "w") as f:
-        for key in sorted(cogs):
+        for key in cogs:
             f.write(f"{key}\n")
     
-    return cogs
+    return set(cogs)
+
 
+def list_sources_and_cogs(config: Config) -> tuple[list[tuple[str, int]], set[str]]:
+    """Run list_raw_tiffs and list_existing_cogs concurrently."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        tiffs_future = executor.submit(list_raw_tiffs, config)
+        cogs_future = executor.submit(list_existing_cogs, config)
+        return tiffs_future.result(), cogs_future.result()
 
-def find_pending_conversions(
-    config: Config, 
-    tiffs: list[tuple[str, int]], 
-    cogs: set[str]
-) -> list[tuple[str, int]]:
+
+def find_pending_conversions(config: Config) -> list[tuple[str, int]]:
     """
     Determine which TIFFs need conversion.
     
+    Joins the stored source listing to the stored COG listing on the
+    derived cog_key column, and with WEB_MERCATOR on the key of the
+    webmercator/ copy as well, so sources missing either COG are pending.
+    Call list_raw_tiffs and list_existing_cogs first so both are synced.
+    
     Returns:
         List of (source_key, size) tuples for pending conversions
     """
     info("Finding TIFFs pending conversion...", config)
     
-    pending = []
-    
-    for source_key, size in tiffs:
-        # Build expected COG key
-        filename = os.path.basename(source_key)
-        stem = os.path.splitext(filename)[0]
-        cog_key = f"{config.cog_prefix}{stem}_cog.tif"
-        
-        # Check if COG exists
-        if cog_key not in cogs or config.overwrite:
-            pending.append((source_key, size))
+    conn = open_listing_db(config)
+    try:
+        pending = conn.execute(
+            """
+            SELECT s.key, s.size
+            FROM objects s
+            LEFT JOIN objects c ON c.prefix = :cog_prefix AND c.key = s.cog_key
+            LEFT JOIN objects m ON :web_mercator AND m.prefix = :cog_prefix AND m.key = web_mercator_cog_key(s.key)
+            WHERE s.prefix = :source_prefix
+              AND tiff_selected(s.key)
+              AND (c.key IS NULL OR (:web_mercator AND m.key IS NULL) OR :overwrite)
+            ORDER BY s.key
+            """,
+            {
+                "source_prefix": config.source_prefix,
+                "cog_prefix": config.cog_prefix,
+                "web_mercator": config.web_mercator,
+                "overwrite": config.overwrite,
+            }
+        ).fetchall()
+    finally:
+        conn.close()
     
     info(f"Found {len(pending)} TIFFs pending conversion", config)
     
@@ -468,7 +858,8 @@ def ensure_batch_job_role(config: Config) -> str:
                     "s3:GetObject",
                     "s3:PutObject",
                     "s3:ListBucket",
-                    "s3:HeadObject"
+                    "s3:HeadObject",
+                    "s3:AbortMultipartUpload"
                 ],
                 "Resource": [
                     f"arn:aws:s3:::{config.s3_bucket}",
@@ -626,8 +1017,16 @@ def ensure_job_definition(config: Config, image_uri: str) -> str:
     env_vars = [
         {"name": "S3_BUCKET", "value": config.s3_bucket},
         {"name": "COG_PREFIX", "value": config.cog_prefix},
+        {"name": "COG_PROFILE", "value": config.cog_profile},
         {"name": "COMPRESSION", "value": config.compression},
         {"name": "OVERWRITE", "value": str(config.overwrite).lower()},
+        {"name": "WORKERS", "value": str(config.pipeline_workers)},
+        {"name": "MAX_TEMP_GB", "value": str(config.max_temp_gb)},
+        {"name": "STREAMING", "value": str(config.streaming).lower()},
+        {"name": "STREAM_BUFFER_MB", "value": str(config.stream_buffer_mb)},
+        {"name": "WEB_MERCATOR", "value": str(config.web_mercator).lower()},
+        {"name": "JOB_VCPUS", "value": str(config.job_vcpus)},
+        {"name": "JOB_MEMORY", "value": str(config.job_memory)},
     ]
     
     response = batch.register_job_definition(
@@ -691,6 +1090,733 @@ def build_and_push_image(config: Config, repo_uri: str) -> str:
     return image_tag
 
 
+# =============================================================================
+# Job Scheduling
+# =============================================================================
+
+def estimate_file_seconds(config: Config, size: int) -> float:
+    """Estimated conversion time for one file: fixed overhead plus time per GB."""
+    return config.file_overhead_seconds + (size / 1024**3) * config.seconds_per_gb
+
+
+def chunk_fixed(config: Config, pending: list[tuple[str, int]]) -> list[list[tuple[str, int]]]:
+    """Split pending files into FILES_PER_JOB chunks in listing order."""
+    return [pending[i:i + config.files_per_job] for i in range(0, len(pending), config.files_per_job)]
+
+
+def pack_by_cost(config: Config, pending: list[tuple[str, int]]) -> list[list[tuple[str, int]]]:
+    """
+    Bin-pack pending files into jobs of roughly equal estimated cost.
+    
+    The target cost per job comes from TARGET_MINUTES_PER_JOB or
+    TARGET_BYTES_PER_JOB; if neither is set, the files are balanced over the
+    number of jobs fixed chunking would use, rounded up to whole waves of
+    concurrent jobs. Files are placed
+    largest first onto the currently lightest job (LPT), so one job can no
+    longer collect all the multi-GB rasters.
+    
+    Returns:
+        Jobs as lists of (key, size), heaviest job first
+    """
+    if not pending:
+        return []
+    
+    costs = [(estimate_file_seconds(config, size), key, size) for key, size in pending]
+    total_cost = sum(c for c, _, _ in costs)
+    
+    if config.target_minutes_per_job > 0:
+        num_jobs = math.ceil(total_cost / (config.target_minutes_per_job * 60))
+    elif config.target_bytes_per_job > 0:
+        num_jobs = math.ceil(total_cost / estimate_file_seconds(config, config.target_bytes_per_job))
+    else:
+        # Round up to whole waves so the last wave is not a few stragglers
+        concurrent = max(1, config.max_vcpus // config.job_vcpus)
+        num_jobs = math.ceil(len(pending) / config.files_per_job)
+        num_jobs = math.ceil(num_jobs / concurrent) * concurrent
+    
+    num_jobs = max(1, min(len(pending), num_jobs))
+    
+    # Min-heap of (load, job index)
+    heap = [(0.0, i) for i in range(num_jobs)]
+    jobs: list[list[tuple[str, int]]] = [[] for _ in range(num_jobs)]
+    loads = [0.0] * num_jobs
+    
+    for cost, key, size in sorted(costs, key=lambda c: (-c[0], c[1])):
+        load, i = heapq.heappop(heap)
+        jobs[i].append((key, size))
+        loads[i] = load + cost
+        heapq.heappush(heap, (loads[i], i))
+    
+    order = sorted(range(num_jobs), key=lambda i: -loads[i])
+    return [jobs[i] for i in order if jobs[i]]
+
+
+def plan_jobs(config: Config, pending: list[tuple[str, int]]) -> list[list[tuple[str, int]]]:
+    """Group pending files into jobs using the configured SCHEDULER."""
+    if config.scheduler == "fixed":
+        return chunk_fixed(config, pending)
+    return pack_by_cost(config, pending)
+
+
+def predict_makespan(config: Config, jobs: list[list[tuple[str, int]]]) -> tuple[float, float]:
+    """
+    Predict queue completion time for jobs submitted in order.
+    
+    Each job starts on the first free slot; the number of concurrent jobs is
+    MAX_VCPUS // JOB_VCPUS.
+    
+    Returns:
+        (makespan seconds, longest single job seconds)
+    """
+    slots = [0.0] * max(1, config.max_vcpus // config.job_vcpus)
+    longest = 0.0
+    for job in jobs:
+        duration = sum(estimate_file_seconds(config, size) for _, size in job)
+        longest = max(longest, duration)
+        start = heapq.heappop(slots)
+        heapq.heappush(slots, start + duration)
+    return (max(slots) if jobs else 0.0), longest
+
+
+def print_schedule_report(config: Config, pending: list[tuple[str, int]]):
+    """Compare predicted makespan of fixed chunking and cost bin-packing."""
+    concurrent = max(1, config.max_vcpus // config.job_vcpus)
+    
+    print("\n" + "=" * 72)
+    print("Job Schedule Prediction")
+    print("=" * 72)
+    print(f"Files: {len(pending)}   Data: {sum(s for _, s in pending) / 1024**3:.2f} GB   "
+          f"Concurrent jobs: {concurrent}")
+    print(f"Cost model: {config.file_overhead_seconds:.0f}s/file + {config.seconds_per_gb:.0f}s/GB")
+    print("-" * 72)
+    print(f"{'Scheduler':<22} {'Jobs':>6} {'Longest job (min)':>18} {'Makespan (min)':>16}")
+    print("-" * 72)
+    
+    for name, jobs in (
+        (f"fixed ({config.files_per_job} files/job)", chunk_fixed(config, pending)),
+        ("binpack (by cost)", pack_by_cost(config, pending)),
+    ):
+        makespan, longest = predict_makespan(config, jobs)
+        print(f"{name:<22} {len(jobs):>6} {longest / 60:>18.1f} {makespan / 60:>16.1f}")
+    
+    print("=" * 72)
+    print(f"Active scheduler: {config.scheduler}")
+
+
+# =============================================================================
+# Cost Model
+# =============================================================================
+
+def load_job_results(config: Config) -> list[dict]:
+    """
+    Read per-file records written by Batch jobs to {COG_PREFIX}results/*.jsonl.
+    
+    Returns:
+        Records of files that were actually converted (not skipped or failed)
+    """
+    s3 = get_s3_client(config)
+    results_prefix = f"{config.cog_prefix}results/"
+    records = []
+    
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=config.s3_bucket, Prefix=results_prefix):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith(".jsonl"):
+                continue
+            body = s3.get_object(Bucket=config.s3_bucket, Key=obj["Key"])["Body"].read().decode()
+            for line in body.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("status") == "converted":
+                        records.append(record)
+    
+    info(f"Loaded {len(records)} converted-file records from s3://{config.s3_bucket}/{results_prefix}", config)
+    return records
+
+
+def fit_line(xs: list[float], ys: list[float]) -> tuple[float, float]:
+    """
+    Least-squares fit of y = intercept + slope * x.
+    
+    Falls back to a flat line at the mean when x does not vary (a single
+    point or identical sizes), and to zero without points. Negative
+    coefficients are clamped to zero, since neither a file nor a GB can take
+    negative time or memory.
+    
+    Returns:
+        (intercept, slope)
+    """
+    n = len(xs)
+    if n == 0:
+        return 0.0, 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return max(0.0, mean_y), 0.0
+    
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    slope = max(0.0, slope)
+    return max(0.0, mean_y - slope * mean_x), slope
+
+
+def fit_cost_model(config: Config, records: list[dict], pending: list[tuple[str, int]]) -> dict:
+    """
+    Fit conversion time and memory from past runs and derive job settings.
+    
+    - Time per file (download + translate + upload) is fitted against source
+      GB for each JOB_VCPUS value seen. The vCPU count with the fewest
+      vCPU-seconds per GB is recommended, since jobs are billed per vCPU.
+    - Peak gdal_translate RSS is fitted against source GB. JOB_MEMORY covers
+      the largest pending file for every pipeline worker, with 25% headroom.
+    - FILES_PER_JOB is set so an average job runs TARGET_MINUTES_PER_JOB
+      (30 minutes if unset).
+    
+    Recommendations are clamped to what can be scheduled: JOB_VCPUS to
+    MAX_VCPUS, JOB_MEMORY to 2048-MAX_JOB_MEMORY MB and FILES_PER_JOB to
+    the number of pending files.
+    
+    Returns:
+        Model dict; its "settings" are read back by Config on later runs
+    
+    Raises:
+        ValueError: if there are no records to fit
+    """
+    if not records:
+        raise ValueError("No converted-file records to fit a cost model from")
+    
+    gb = lambda record: record.get("bytes_in", 0) / 1024**3
+    
+    by_vcpus: dict[int, list[dict]] = {}
+    for record in records:
+        by_vcpus.setdefault(int(record.get("job_vcpus") or 0), []).append(record)
+    
+    time_fits = {}
+    for vcpus, group in sorted(by_vcpus.items()):
+        overhead, per_gb = fit_line(
+            [gb(r) for r in group],
+            [r["download_seconds"] + r["translate_seconds"] + r["upload_seconds"] for r in group],
+        )
+        time_fits[vcpus] = {
+            "files": len(group),
+            "file_overhead_seconds": overhead,
+            "seconds_per_gb": per_gb,
+            "vcpu_seconds_per_gb": max(vcpus, 1) * per_gb,
+        }
+    
+    best_vcpus = min(
+        time_fits,
+        key=lambda v: (time_fits[v]["vcpu_seconds_per_gb"], -v)
+    )
+    best = time_fits[best_vcpus]
+    
+    rss_base, rss_per_gb = fit_line(
+        [gb(r) for r in records],
+        [r.get("peak_rss_bytes", 0) / 1024**2 for r in records],
+    )
+    largest_gb = max(
+        [size / 1024**3 for _, size in pending] or [gb(r) for r in records]
+    )
+    per_worker_mb = rss_base + rss_per_gb * largest_gb
+    job_memory = math.ceil(per_worker_mb * config.pipeline_workers * 1.25 / 512) * 512
+    job_memory = min(max(2048, job_memory), config.max_job_memory)
+    
+    target_seconds = (config.target_minutes_per_job or 30) * 60
+    if pending:
+        mean_gb = sum(size for _, size in pending) / len(pending) / 1024**3
+    else:
+        mean_gb = sum(gb(r) for r in records) / len(records)
+    mean_seconds = best["file_overhead_seconds"] + best["seconds_per_gb"] * mean_gb
+    files_per_job = max(1, int(target_seconds // max(mean_seconds, 1e-6)))
+    if pending:
+        files_per_job = min(files_per_job, len(pending))
+    job_vcpus = min(best_vcpus or config.job_vcpus, max(1, config.max_vcpus))
+    
+    return {
+        "fitted_at": datetime.now().isoformat(),
+        "records": len(records),
+        "time_by_vcpus": {str(v): fit for v, fit in time_fits.items()},
+        "memory": {"base_mb": rss_base, "mb_per_gb": rss_per_gb, "largest_pending_gb": largest_gb},
+        "settings": {
+            "JOB_VCPUS": job_vcpus,
+            "JOB_MEMORY": job_memory,
+            "FILES_PER_JOB": files_per_job,
+            "FILE_OVERHEAD_SECONDS": round(best["file_overhead_seconds"], 2),
+            "SECONDS_PER_GB": round(best["seconds_per_gb"], 2),
+        },
+    }
+
+
+# =============================================================================
+# COG Header Scan
+# =============================================================================
+
+# TIFF field types -> struct format of one value (ASCII/undefined read as bytes)
+TIFF_TYPES = {1: "B", 2: "B", 3: "H", 4: "I", 5: "II", 6: "b", 7: "B", 8: "h",
+              9: "i", 10: "ii", 11: "f", 12: "d", 16: "Q", 17: "q", 18: "Q"}
+
+TAG_SUBFILE_TYPE = 254
+TAG_WIDTH = 256
+TAG_HEIGHT = 257
+TAG_STRIP_OFFSETS = 273
+TAG_TILE_WIDTH = 322
+TAG_TILE_LENGTH = 323
+TAG_TILE_OFFSETS = 324
+# GeoTIFF tags, read in full from the first image only
+TAG_MODEL_PIXEL_SCALE = 33550
+TAG_MODEL_TIEPOINT = 33922
+TAG_GEO_KEY_DIRECTORY = 34735
+GEO_TAGS = (TAG_MODEL_PIXEL_SCALE, TAG_MODEL_TIEPOINT, TAG_GEO_KEY_DIRECTORY)
+# GeoKeys holding the EPSG code of a projected / geographic CRS
+GEOKEY_PROJECTED_CRS = 3072
+GEOKEY_GEOGRAPHIC_CRS = 2048
+
+# Start of the ghost header GDAL writes right after the TIFF header of a COG
+GHOST_HEADER_PREFIX = b"GDAL_STRUCTURAL_METADATA_SIZE="
+GHOST_HEADER_SIZE_LINE = len(GHOST_HEADER_PREFIX) + len(b"000000 bytes\n")
+
+# Corrupt files could chain IFDs forever
+MAX_IFDS = 64
+
+
+def s3_range_reader(s3, bucket: str, key: str, header_bytes: int):
+    """
+    Return fetch(offset, length) -> bytes backed by ranged GETs of one object.
+    
+    The first call reads `header_bytes` from the start of the object, which
+    holds every IFD of a COG. Reads outside what was fetched so far issue
+    another ranged GET of at least 4 KB. fetch.requests counts the GETs.
+    """
+    segments: list[tuple[int, bytes]] = []
+    
+    def fetch(offset: int, length: int) -> bytes:
+        for start, data in segments:
+            if start <= offset and offset + length <= start + len(data):
+                return data[offset - start:offset - start + length]
+        size = max(length, header_bytes if not segments else 4096)
+        response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + size - 1}")
+        data = response["Body"].read()
+        fetch.requests += 1
+        segments.append((offset, data))
+        if len(data) < length:
+            raise ValueError(f"Truncated TIFF: wanted {length} bytes at {offset}, got {len(data)}")
+        return data[:length]
+    
+    fetch.requests = 0
+    return fetch
+
+
+def parse_cog_header(fetch) -> dict:
+    """
+    Parse the TIFF structure of a (Cloud Optimized) GeoTIFF with struct.
+    
+    Args:
+        fetch: Callable (offset, length) -> bytes, e.g. from s3_range_reader
+    
+    Returns:
+        dict with bigtiff, width, height, tiled, block_size, overviews (list
+        of [width, height] of reduced-resolution images), masks, ghost (dict
+        of the GDAL ghost header, None if absent), ifd_offsets,
+        first_data_offset (smallest offset of the first tile/strip of any image),
+        epsg (None if not an EPSG-coded CRS), bounds ([left, bottom, right,
+        top] in CRS units) and pixel_size ([x, y]); the last two are None
+        without ModelPixelScale/ModelTiepoint tags
+    
+    Raises:
+        ValueError if the data is not a TIFF
+    """
+    head = fetch(0, 16)
+    order = {b"II": "<", b"MM": ">"}.get(head[:2])
+    if order is None:
+        raise ValueError("Not a TIFF: bad byte order mark")
+    magic = struct.unpack(order + "H", head[2:4])[0]
+    if magic == 42:
+        bigtiff, header_size = False, 8
+        next_ifd = struct.unpack(order + "I", head[4:8])[0]
+        count_fmt, entry_size, offset_fmt = "H", 12, "I"
+    elif magic == 43:
+        bigtiff, header_size = True, 16
+        next_ifd = struct.unpack(order + "Q", head[8:16])[0]
+        count_fmt, entry_size, offset_fmt = "Q", 20, "Q"
+    else:
+        raise ValueError(f"Not a TIFF: magic number {magic}")
+    inline_size = struct.calcsize(offset_fmt)
+    
+    def first_value(field_type: int, count: int, raw: bytes):
+        fmt = TIFF_TYPES.get(field_type)
+        if fmt is None or count == 0:
+            return None
+        size = struct.calcsize(order + fmt)
+        if size * count > inline_size:
+            raw = fetch(struct.unpack(order + offset_fmt, raw)[0], size)
+        return struct.unpack(order + fmt, raw[:size])[0]
+    
+    def all_values(field_type: int, count: int, raw: bytes) -> list:
+        fmt = TIFF_TYPES.get(field_type)
+        if fmt is None or count == 0:
+            return []
+        size = struct.calcsize(order + fmt) * count
+        if size > inline_size:
+            raw = fetch(struct.unpack(order + offset_fmt, raw)[0], size)
+        return list(struct.unpack(order + fmt * count, raw[:size]))
+    
+    ghost = None
+    if next_ifd > header_size:
+        size_line = fetch(header_size, GHOST_HEADER_SIZE_LINE)
+        if size_line.startswith(GHOST_HEADER_PREFIX):
+            ghost_size = int(size_line[len(GHOST_HEADER_PREFIX):].split()[0])
+            text = fetch(header_size + GHOST_HEADER_SIZE_LINE, ghost_size).decode("ascii", "replace")
+            ghost = dict(
+                line.split("=", 1) for line in text.replace("\x00", "").splitlines() if "=" in line
+            )
+    
+    images = []
+    ifd_offsets = []
+    while next_ifd and len(ifd_offsets) < MAX_IFDS:
+        ifd_offsets.append(next_ifd)
+        count_size = struct.calcsize(order + count_fmt)
+        count = struct.unpack(order + count_fmt, fetch(next_ifd, count_size))[0]
+        block = fetch(next_ifd + count_size, count * entry_size + inline_size)
+        tags = {}
+        for i in range(count):
+            entry = block[i * entry_size:(i + 1) * entry_size]
+            if bigtiff:
+                tag, field_type, n = struct.unpack(order + "HHQ", entry[:12])
+            else:
+                tag, field_type, n = struct.unpack(order + "HHI", entry[:8])
+            if tag in (TAG_SUBFILE_TYPE, TAG_WIDTH, TAG_HEIGHT, TAG_STRIP_OFFSETS,
+                       TAG_TILE_WIDTH, TAG_TILE_LENGTH, TAG_TILE_OFFSETS):
+                tags[tag] = first_value(field_type, n, entry[entry_size - inline_size:])
+            elif tag in GEO_TAGS and not images:
+                tags[tag] = all_values(field_type, n, entry[entry_size - inline_size:])
+        images.append(tags)
+        next_ifd = struct.unpack(order + offset_fmt, block[count * entry_size:])[0]
+    
+    if not images:
+        raise ValueError("TIFF has no images")
+    
+    main = images[0]
+    overviews, masks = [], 0
+    for tags in images[1:]:
+        subfile_type = tags.get(TAG_SUBFILE_TYPE) or 0
+        if subfile_type & 4:
+            masks += 1
+        elif subfile_type & 1:
+            overviews.append([tags.get(TAG_WIDTH, 0), tags.get(TAG_HEIGHT, 0)])
+    data_offsets = [
+        tags.get(TAG_TILE_OFFSETS) or tags.get(TAG_STRIP_OFFSETS) for tags in images
+    ]
+    data_offsets = [offset for offset in data_offsets if offset]
+    
+    width, height = main.get(TAG_WIDTH, 0), main.get(TAG_HEIGHT, 0)
+    scale = main.get(TAG_MODEL_PIXEL_SCALE)
+    tiepoint = main.get(TAG_MODEL_TIEPOINT)
+    bounds = pixel_size = None
+    if scale and tiepoint and len(scale) >= 2 and len(tiepoint) >= 6:
+        # Raster point (i, j) maps to model point (x, y); north-up rasters only
+        i, j, _, x, y, _ = tiepoint[:6]
+        left, top = x - i * scale[0], y + j * scale[1]
+        bounds = [left, top - height * scale[1], left + width * scale[0], top]
+        pixel_size = [scale[0], scale[1]]
+    
+    return {
+        "bigtiff": bigtiff,
+        "width": main.get(TAG_WIDTH, 0),
+        "height": main.get(TAG_HEIGHT, 0),
+        "tiled": TAG_TILE_WIDTH in main,
+        "block_size": [main.get(TAG_TILE_WIDTH, 0), main.get(TAG_TILE_LENGTH, 0)],
+        "overviews": overviews,
+        "masks": masks,
+        "ghost": ghost,
+        "ifd_offsets": ifd_offsets,
+        "first_data_offset": min(data_offsets) if data_offsets else 0,
+        "epsg": geokey_epsg(main.get(TAG_GEO_KEY_DIRECTORY) or []),
+        "bounds": bounds,
+        "pixel_size": pixel_size,
+    }
+
+
+def geokey_epsg(directory: list[int]) -> Optional[int]:
+    """EPSG code of the CRS in a GeoKeyDirectory, None if user-defined or missing."""
+    keys = {}
+    for i in range(4, len(directory) - 3, 4):
+        key_id, location, _, value = directory[i:i + 4]
+        # Location 0 means the value is stored inline
+        if location == 0:
+            keys[key_id] = value
+    for key_id in (GEOKEY_PROJECTED_CRS, GEOKEY_GEOGRAPHIC_CRS):
+        # 32767 marks a user-defined CRS
+        if 0 < keys.get(key_id, 0) < 32767:
+            return keys[key_id]
+    return None
+
+
+def cog_header_issues(header: dict) -> list[str]:
+    """
+    Problems that make a file serve tiles poorly.
+    
+    - not_tiled: striped layout, every tile read pulls whole rows
+    - no_overviews / insufficient_overviews: low zooms read full resolution
+      data; the smallest overview should fit in one block
+    - no_ghost_header: not written by GDAL's COG driver
+    - ghost_header_layout: ghost header does not promise IFDS_BEFORE_DATA,
+      or the file was edited after creation (KNOWN_INCOMPATIBLE_EDITION=YES)
+    - ifds_after_data: an IFD sits after image data, needing extra reads
+    """
+    issues = []
+    block = max(header["block_size"]) if header["tiled"] else 512
+    if not header["tiled"]:
+        issues.append("not_tiled")
+    
+    largest = max(header["width"], header["height"])
+    if largest > block:
+        if not header["overviews"]:
+            issues.append("no_overviews")
+        elif min(max(w, h) for w, h in header["overviews"]) > block:
+            issues.append("insufficient_overviews")
+    
+    ghost = header["ghost"]
+    if ghost is None:
+        issues.append("no_ghost_header")
+    elif ghost.get("LAYOUT") != "IFDS_BEFORE_DATA" or ghost.get("KNOWN_INCOMPATIBLE_EDITION") == "YES":
+        issues.append("ghost_header_layout")
+    
+    if header["first_data_offset"] and max(header["ifd_offsets"]) > header["first_data_offset"]:
+        issues.append("ifds_after_data")
+    
+    return issues
+
+
+def scan_cog_headers(config: Config) -> list[dict]:
+    """
+    Read the headers of the COGs of all selected sources in parallel.
+    
+    Joins the stored listings (call list_sources_and_cogs first) to find the
+    COG of each source, then reads SCAN_HEADER_KB from the start of each
+    with a ranged GET on SCAN_WORKERS threads.
+    
+    Returns:
+        One record per COG: source_key, source_size, cog_key, cog_size,
+        issues and the parsed header fields (or error if unreadable)
+    """
+    conn = open_listing_db(config)
+    try:
+        rows = conn.execute(
+            """
+            SELECT s.key, s.size, c.key, c.size
+            FROM objects s
+            JOIN objects c ON c.prefix = :cog_prefix AND c.key = s.cog_key
+            WHERE s.prefix = :source_prefix AND tiff_selected(s.key)
+            ORDER BY s.key
+            """,
+            {"source_prefix": config.source_prefix, "cog_prefix": config.cog_prefix},
+        ).fetchall()
+    finally:
+        conn.close()
+    
+    info(f"Scanning headers of {len(rows)} COGs ({config.scan_workers} workers)...", config)
+    s3 = get_s3_client(config)
+    header_bytes = config.scan_header_kb * 1024
+    
+    def scan(row) -> dict:
+        source_key, source_size, cog_key, cog_size = row
+        record = {"source_key": source_key, "source_size": source_size, "cog_key": cog_key, "cog_size": cog_size}
+        fetch = s3_range_reader(s3, config.s3_bucket, cog_key, header_bytes)
+        try:
+            header = parse_cog_header(fetch)
+        except Exception as e:
+            record.update(issues=["unreadable"], error=str(e))
+        else:
+            record.update(header, issues=cog_header_issues(header))
+        record["requests"] = fetch.requests
+        return record
+    
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=config.scan_workers) as executor:
+        records = list(executor.map(scan, rows))
+    elapsed = time.monotonic() - start
+    
+    requests = sum(r["requests"] for r in records)
+    info(f"Scanned {len(records)} headers with {requests} ranged reads in {elapsed:.1f}s", config)
+    return records
+
+
+# =============================================================================
+# Mosaic Index
+# =============================================================================
+
+# Web Mercator constants: half the world width in metres and the size of a
+# 256px tile pixel at zoom 0
+WEB_MERCATOR_HALF_WORLD = 20037508.342789244
+ZOOM0_METERS_PER_PIXEL = 156543.03392804097
+WEB_MERCATOR_MAX_LAT = 85.0511287798066
+WEB_MERCATOR_EPSG = {3857, 3785, 900913, 102100}
+METERS_PER_DEGREE = 111320.0
+MAX_MOSAIC_ZOOM = 22
+
+
+def footprint_lonlat(header: dict) -> Optional[list[float]]:
+    """
+    [west, south, east, north] in degrees of a COG from its parsed header.
+    
+    Geographic and Web Mercator COGs are handled directly; other CRSs are
+    reprojected with rasterio when it is installed. Returns None when the
+    footprint cannot be determined.
+    """
+    epsg, bounds = header.get("epsg"), header.get("bounds")
+    if not bounds or not epsg:
+        return None
+    if epsg == 4326:
+        west, south, east, north = bounds
+    elif epsg in WEB_MERCATOR_EPSG:
+        def lon(x):
+            return x / WEB_MERCATOR_HALF_WORLD * 180
+        
+        def lat(y):
+            return math.degrees(2 * math.atan(math.exp(y / WEB_MERCATOR_HALF_WORLD * math.pi)) - math.pi / 2)
+        
+        west, south, east, north = lon(bounds[0]), lat(bounds[1]), lon(bounds[2]), lat(bounds[3])
+    else:
+        try:
+            from rasterio.warp import transform_bounds
+        except ImportError:
+            return None
+        west, south, east, north = transform_bounds(f"EPSG:{epsg}", "EPSG:4326", *bounds, densify_pts=21)
+    return [max(west, -180.0), max(south, -90.0), min(east, 180.0), min(north, 90.0)]
+
+
+def zoom_range(header: dict) -> Optional[tuple[int, int]]:
+    """
+    (minzoom, maxzoom) of Web Mercator tiles a COG serves well.
+    
+    maxzoom is the first zoom at least as fine as the full resolution and
+    minzoom the last zoom at least as coarse as the smallest overview.
+    """
+    if not header.get("pixel_size") or not header.get("width"):
+        return None
+    resolution = min(header["pixel_size"])
+    if header.get("epsg") == 4326:
+        resolution *= METERS_PER_DEGREE
+    if resolution <= 0:
+        return None
+    
+    coarsest = min([w for w, _ in header.get("overviews") or []] + [header["width"]])
+    overview_resolution = resolution * header["width"] / max(coarsest, 1)
+    maxzoom = math.ceil(math.log2(ZOOM0_METERS_PER_PIXEL / resolution) - 1e-9)
+    minzoom = math.floor(math.log2(ZOOM0_METERS_PER_PIXEL / overview_resolution) + 1e-9)
+    maxzoom = min(max(maxzoom, 0), MAX_MOSAIC_ZOOM)
+    return min(max(minzoom, 0), maxzoom), maxzoom
+
+
+def tile_range(bbox: list[float], zoom: int) -> tuple[int, int, int, int]:
+    """(xmin, ymin, xmax, ymax) of the Web Mercator tiles a lon/lat bbox touches."""
+    west, south, east, north = bbox
+    n = 2 ** zoom
+    
+    def x_of(lon):
+        return (lon + 180) / 360 * n
+    
+    def y_of(lat):
+        lat = math.radians(min(max(lat, -WEB_MERCATOR_MAX_LAT), WEB_MERCATOR_MAX_LAT))
+        return (1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n
+    
+    def index(value):
+        return min(max(int(value), 0), n - 1)
+    
+    # Edges on a tile boundary (up to rounding) do not reach into the next tile
+    xmin, ymin = index(x_of(west) + 1e-9), index(y_of(north) + 1e-9)
+    xmax = max(index(math.ceil(x_of(east) - 1e-9) - 1), xmin)
+    ymax = max(index(math.ceil(y_of(south) - 1e-9) - 1), ymin)
+    return xmin, ymin, xmax, ymax
+
+
+def quadkey(x: int, y: int, zoom: int) -> str:
+    """Bing-style quadkey of a Web Mercator tile."""
+    digits = []
+    for z in range(zoom, 0, -1):
+        mask = 1 << (z - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def build_mosaic_index(config: Config, records: list[dict]) -> dict:
+    """
+    MosaicJSON document for COG records with footprint and zoom range.
+    
+    Each quadkey at the quadkey zoom (MOSAIC_QUADKEY_ZOOM, default the
+    mosaic's minzoom) lists the COGs whose footprint touches it, in key
+    order. The extra "footprints" field maps each COG to its lon/lat bbox so
+    the tiler can skip COGs that only touch a tile's quadkey.
+    """
+    minzoom = min(r["minzoom"] for r in records)
+    maxzoom = max(r["maxzoom"] for r in records)
+    quadkey_zoom = config.mosaic_quadkey_zoom if config.mosaic_quadkey_zoom is not None else minzoom
+    quadkey_zoom = min(quadkey_zoom, maxzoom)
+    
+    tiles: dict[str, list[str]] = {}
+    footprints = {}
+    for record in sorted(records, key=lambda r: r["url"]):
+        footprints[record["url"]] = [round(v, 7) for v in record["footprint"]]
+        xmin, ymin, xmax, ymax = tile_range(record["footprint"], quadkey_zoom)
+        for x in range(xmin, xmax + 1):
+            for y in range(ymin, ymax + 1):
+                tiles.setdefault(quadkey(x, y, quadkey_zoom), []).append(record["url"])
+    
+    bounds = [
+        min(r["footprint"][0] for r in records),
+        min(r["footprint"][1] for r in records),
+        max(r["footprint"][2] for r in records),
+        max(r["footprint"][3] for r in records),
+    ]
+    return {
+        "mosaicjson": "0.0.3",
+        "name": config.mosaic_name,
+        "version": "1.0.0",
+        "minzoom": minzoom,
+        "maxzoom": maxzoom,
+        "quadkey_zoom": quadkey_zoom,
+        "bounds": bounds,
+        "center": [(bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2, minzoom],
+        "tiles": dict(sorted(tiles.items())),
+        "footprints": footprints,
+    }
+
+
+def read_cog_footprints(config: Config, cog_keys: list[str]) -> tuple[list[dict], list[dict]]:
+    """
+    Footprint and zoom range of each COG from ranged header reads.
+    
+    Returns:
+        (records with key, url, epsg, footprint, minzoom and maxzoom,
+        skipped records with key and reason)
+    """
+    info(f"Reading headers of {len(cog_keys)} COGs ({config.scan_workers} workers)...", config)
+    s3 = get_s3_client(config)
+    header_bytes = config.scan_header_kb * 1024
+    
+    def read(key: str) -> dict:
+        record = {"key": key, "url": f"s3://{config.s3_bucket}/{key}"}
+        try:
+            header = parse_cog_header(s3_range_reader(s3, config.s3_bucket, key, header_bytes))
+        except Exception as e:
+            return {**record, "reason": f"unreadable: {e}"}
+        footprint = footprint_lonlat(header)
+        zooms = zoom_range(header)
+        if footprint is None or zooms is None:
+            return {**record, "reason": f"no usable georeferencing (EPSG {header['epsg']})"}
+        if footprint[0] >= footprint[2] or footprint[1] >= footprint[3]:
+            return {**record, "reason": "empty footprint"}
+        return {**record, "epsg": header["epsg"], "footprint": footprint,
+                "minzoom": zooms[0], "maxzoom": zooms[1]}
+    
+    with ThreadPoolExecutor(max_workers=config.scan_workers) as executor:
+        results = list(executor.map(read, cog_keys))
+    
+    records = [r for r in results if "reason" not in r]
+    skipped = [r for r in results if "reason" in r]
+    return records, skipped
+
+
 # =============================================================================
 # Job Submission
 # =============================================================================
@@ -699,8 +1825,8 @@ def submit_batch_jobs(config: Config, pending: list[tuple[str, int]]) -> list[di
     """
     Submit batch jobs for pending conversions.
     
-    Splits pending files into chunks and submits a job for each chunk.
-    Each job processes FILES_PER_JOB files.
+    Groups pending files into jobs (see plan_jobs) and submits a job for
+    each group.
     
     Returns:
         List of submitted job info dicts
@@ -723,18 +1849,24 @@ def submit_batch_jobs(config: Config, pending: list[tuple[str, int]]) -> list[di
     
     job_def = response["jobDefinitions"][-1]["jobDefinitionArn"]
     
-    # Split into chunks
-    keys = [k for k, _ in pending]
-    chunks = [keys[i:i + config.files_per_job] for i in range(0, len(keys), config.files_per_job)]
+    # Group files into jobs
+    jobs = plan_jobs(config, pending)
+    # [key, size] pairs: the job sizes its temp disk reservations from them
+    chunks = [[[k, size] for k, size in job] for job in jobs]
     
-    info(f"Submitting {len(chunks)} jobs for {len(keys)} files ({config.files_per_job} files/job)", config)
+    if config.scheduler == "fixed":
+        info(f"Submitting {len(chunks)} jobs for {len(pending)} files ({config.files_per_job} files/job)", config)
+    else:
+        info(f"Submitting {len(chunks)} jobs for {len(pending)} files (bin-packed by estimated cost)", config)
     
     if config.dry_run:
         info("[DRY RUN] Would submit the following jobs:", config)
-        for i, chunk in enumerate(chunks[:5]):
-            print(f"  Job {i+1}: {len(chunk)} files")
-        if len(chunks) > 5:
-            print(f"  ... and {len(chunks) - 5} more jobs")
+        for i, job in enumerate(jobs[:5]):
+            job_minutes = sum(estimate_file_seconds(config, size) for _, size in job) / 60
+            print(f"  Job {i+1}: {len(job)} files, {sum(s for _, s in job) / 1024**3:.2f} GB, ~{job_minutes:.1f} min")
+        if len(jobs) > 5:
+            print(f"  ... and {len(jobs) - 5} more jobs")
+        print_schedule_report(config, pending)
         return []
     
     submitted_jobs = []
@@ -759,7 +1891,16 @@ def submit_batch_jobs(config: Config, pending: list[tuple[str, int]]) -> list[di
             containerOverrides={
                 "environment": [
                     {"name": "MANIFEST_KEY", "value": manifest_key},
-                ]
+                    {"name": "OVERWRITE", "value": str(config.overwrite).lower()},
+                    {"name": "JOB_VCPUS", "value": str(config.job_vcpus)},
+                    {"name": "JOB_MEMORY", "value": str(config.job_memory)},
+                ],
+                # Current JOB_VCPUS/JOB_MEMORY (e.g. from the cost model)
+                # apply without re-registering the job definition
+                "resourceRequirements": [
+                    {"type": "VCPU", "value": str(config.job_vcpus)},
+                    {"type": "MEMORY", "value": str(config.job_memory)},
+                ],
             }
         )
         
@@ -839,9 +1980,8 @@ def cmd_list(config: Config):
 
 def cmd_status(config: Config):
     """Show conversion status."""
-    tiffs = list_raw_tiffs(config)
-    cogs = list_existing_cogs(config)
-    pending = find_pending_conversions(config, tiffs, cogs)
+    tiffs, cogs = list_sources_and_cogs(config)
+    pending = find_pending_conversions(config)
     
     total = len(tiffs)
     converted = total - len(pending)
@@ -854,6 +1994,8 @@ def cmd_status(config: Config):
     print("-" * 60)
     print(f"Total raw TIFFs:      {total:>8}")
     print(f"Existing COGs:        {len(cogs):>8}")
+    if config.web_mercator:
+        print(f"Web Mercator copies:  {len(stored_cogs(config, web_mercator=True)):>8}")
     print(f"Already converted:    {converted:>8}")
     print(f"Pending conversion:   {len(pending):>8}")
     
@@ -875,9 +2017,8 @@ def cmd_status(config: Config):
 
 def cmd_convert(config: Config):
     """Submit batch jobs for pending conversions."""
-    tiffs = list_raw_tiffs(config)
-    cogs = list_existing_cogs(config)
-    pending = find_pending_conversions(config, tiffs, cogs)
+    list_sources_and_cogs(config)
+    pending = find_pending_conversions(config)
     
     if not pending:
         info("No files pending conversion!", config)
@@ -886,6 +2027,228 @@ def cmd_convert(config: Config):
     submit_batch_jobs(config, pending)
 
 
+def cmd_plan(config: Config):
+    """Show predicted makespan of the job schedule for pending conversions."""
+    list_sources_and_cogs(config)
+    pending = find_pending_conversions(config)
+    
+    if not pending:
+        info("No files pending conversion!", config)
+        return
+    
+    print_schedule_report(config, pending)
+
+
+def cmd_cost_model(config: Config):
+    """Fit a cost model from past job results and save recommended settings."""
+    records = load_job_results(config)
+    if not records:
+        warn("No converted-file records found; run some conversion jobs first", config)
+        return
+    
+    list_sources_and_cogs(config)
+    pending = find_pending_conversions(config)
+    model = fit_cost_model(config, records, pending)
+    
+    print("\n" + "=" * 60)
+    print("Conversion Cost Model")
+    print("=" * 60)
+    print(f"Records: {model['records']}")
+    print(f"{'JOB_VCPUS':>10} {'files':>8} {'s/file':>8} {'s/GB':>8} {'vCPU-s/GB':>10}")
+    for vcpus, fit in model["time_by_vcpus"].items():
+        print(f"{vcpus:>10} {fit['files']:>8} {fit['file_overhead_seconds']:>8.1f} "
+              f"{fit['seconds_per_gb']:>8.1f} {fit['vcpu_seconds_per_gb']:>10.1f}")
+    memory = model["memory"]
+    print(f"Peak RSS: {memory['base_mb']:.0f} MB + {memory['mb_per_gb']:.0f} MB/GB "
+          f"(largest pending file {memory['largest_pending_gb']:.2f} GB)")
+    print("-" * 60)
+    print("Recommended settings for the next run:")
+    for name, value in model["settings"].items():
+        print(f"  {name}={value}")
+    print("=" * 60)
+    
+    with open(config.cost_model_file, "w") as f:
+        json.dump(model, f, indent=2)
+    
+    print(f"\nSaved to {config.cost_model_file}; later runs use these settings unless the")
+    print("variables are set explicitly (USE_COST_MODEL=false ignores the file).")
+
+
+def cmd_reconcile(config: Config):
+    """
+    Report the work wasted by the old COG naming mismatch.
+    
+    The planner used to look for {stem}_cog.tif while the Batch converter
+    writes the table-prefix-stripped filename, so every converted file looked
+    pending and was re-submitted (and skipped inside the job). Also reports
+    old-style outputs, sources that collide on one COG key and COGs without
+    a source. The webmercator/ copies are left out of all of these.
+    """
+    tiffs, _ = list_sources_and_cogs(config)
+    
+    mercator_prefix = config.cog_prefix + WEB_MERCATOR_PREFIX
+    conn = open_listing_db(config)
+    try:
+        cog_sizes = {
+            key: size for key, size in conn.execute(
+                "SELECT key, size FROM objects WHERE prefix = ?", (config.cog_prefix,)
+            )
+            if key.lower().endswith((".tif", ".tiff")) and not key.startswith(mercator_prefix)
+        }
+    finally:
+        conn.close()
+    
+    expected = {key: get_expected_cog_key(key, config.cog_prefix) for key, _ in tiffs}
+    legacy = {key: get_legacy_cog_key(key, config.cog_prefix) for key, _ in tiffs}
+    
+    converted = [(key, size) for key, size in tiffs if expected[key] in cog_sizes]
+    # Converted files the old planner would still have queued
+    resubmitted = [(key, size) for key, size in converted if legacy[key] not in cog_sizes]
+    resubmit_seconds = sum(estimate_file_seconds(config, size) for _, size in resubmitted)
+    
+    legacy_outputs = sorted(set(legacy.values()) & set(cog_sizes))
+    duplicate_outputs = [
+        legacy[key] for key, _ in converted if legacy[key] in cog_sizes and legacy[key] != expected[key]
+    ]
+    collisions = find_collisions((key for key, _ in tiffs), config.cog_prefix)
+    known = set(expected.values()) | set(legacy.values())
+    orphans = sorted(key for key in cog_sizes if key not in known)
+    
+    print("\n" + "=" * 60)
+    print("COG Key Reconciliation")
+    print("=" * 60)
+    print(f"Raw TIFFs:                          {len(tiffs):>8}")
+    print(f"Converted (current naming):         {len(converted):>8}")
+    print(f"Re-submitted by old planner:        {len(resubmitted):>8}  "
+          f"({sum(s for _, s in resubmitted) / 1024**3:.2f} GB, ~{resubmit_seconds / 3600:.1f} job-hours)")
+    print(f"Old-style *_cog.tif outputs:        {len(legacy_outputs):>8}  "
+          f"({sum(cog_sizes[k] for k in legacy_outputs) / 1024**3:.2f} GB)")
+    print(f"  of which duplicate a current COG: {len(duplicate_outputs):>8}")
+    print(f"Sources colliding on one COG key:   {sum(len(v) for v in collisions.values()):>8}  "
+          f"({len(collisions)} COG keys)")
+    print(f"COGs without a source:              {len(orphans):>8}")
+    print("=" * 60)
+    
+    for cog_key, sources in list(collisions.items())[:10]:
+        print(f"  collision {cog_key}: {', '.join(sources)}")
+    if len(collisions) > 10:
+        print(f"  ... and {len(collisions) - 10} more collisions")
+    
+    report = {
+        "resubmitted": [key for key, _ in resubmitted],
+        "resubmitted_bytes": sum(s for _, s in resubmitted),
+        "resubmitted_estimated_seconds": resubmit_seconds,
+        "legacy_outputs": legacy_outputs,
+        "duplicate_outputs": duplicate_outputs,
+        "collisions": collisions,
+        "orphans": orphans,
+    }
+    with open(config.reconcile_file, "w") as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\nFull report saved to: {config.reconcile_file}")
+
+
+def cmd_scan(config: Config):
+    """
+    Check the structure of existing COGs and re-convert the broken ones.
+    
+    Reads only the header of each COG (see scan_cog_headers), reports
+    missing or insufficient overviews, striped layouts and ghost header
+    problems, and submits overwrite jobs for the flagged sources.
+    """
+    list_sources_and_cogs(config)
+    records = scan_cog_headers(config)
+    
+    counts: dict[str, int] = {}
+    for record in records:
+        for issue in record["issues"]:
+            counts[issue] = counts.get(issue, 0) + 1
+    
+    requeue_issues = set(config.scan_issues or counts)
+    flagged = [r for r in records if requeue_issues & set(r["issues"])]
+    
+    print("\n" + "=" * 60)
+    print("COG Header Scan")
+    print("=" * 60)
+    print(f"COGs scanned:                {len(records):>8}")
+    print(f"Without issues:              {sum(1 for r in records if not r['issues']):>8}")
+    for issue, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {issue:<27}{count:>8}")
+    print(f"Queued for re-conversion:    {len(flagged):>8}  "
+          f"({sum(r['source_size'] for r in flagged) / 1024**3:.2f} GB of sources)")
+    print("=" * 60)
+    
+    with open(config.scan_file, "w") as f:
+        json.dump(records, f, indent=2)
+    print(f"\nFull report saved to: {config.scan_file}")
+    
+    if not flagged:
+        info("No COGs need re-conversion", config)
+        return
+    
+    # Flagged COGs exist, so the jobs must replace them
+    config.overwrite = True
+    submit_batch_jobs(config, [(r["source_key"], r["source_size"]) for r in flagged])
+
+
+def cmd_mosaic(config: Config):
+    """
+    Build a MosaicJSON index of existing COGs for the tiler's /mosaic routes.
+    
+    Selects the COGs under COG_PREFIX matching FILENAME_FILTER (only the
+    webmercator/ copies when WEB_MERCATOR=true, none of them otherwise),
+    reads their footprints from ranged header reads and writes the index
+    locally and to {COG_PREFIX}mosaics/{MOSAIC_NAME}.json.
+    """
+    sync_listing(config, config.cog_prefix, source=False)
+    keys = [
+        key for key in stored_cogs(config, web_mercator=config.web_mercator)
+        if (not config.filename_filter or re.search(config.filename_filter, os.path.basename(key)))
+    ]
+    if not keys:
+        warn("No COGs selected for the mosaic", config)
+        return
+    
+    records, skipped = read_cog_footprints(config, keys)
+    for record in skipped:
+        warn(f"Skipping {record['key']}: {record['reason']}", config)
+    if not records:
+        error("None of the selected COGs has a usable footprint", config)
+        sys.exit(1)
+    
+    index = build_mosaic_index(config, records)
+    assets_per_quadkey = [len(assets) for assets in index["tiles"].values()]
+    
+    print("\n" + "=" * 60)
+    print(f"Mosaic Index: {config.mosaic_name}")
+    print("=" * 60)
+    print(f"COGs indexed:                {len(records):>8}")
+    print(f"COGs skipped:                {len(skipped):>8}")
+    print(f"Zooms:                       {index['minzoom']:>4}-{index['maxzoom']:<3}")
+    print(f"Quadkeys (zoom {index['quadkey_zoom']:>2}):          {len(index['tiles']):>8}")
+    print(f"Max COGs per quadkey:        {max(assets_per_quadkey):>8}")
+    print(f"Bounds:                      {', '.join(f'{v:.4f}' for v in index['bounds'])}")
+    print("=" * 60)
+    
+    with open(config.mosaic_file, "w") as f:
+        json.dump(index, f)
+    print(f"\nIndex saved to: {config.mosaic_file}")
+    
+    if config.dry_run:
+        info(f"[DRY RUN] Would upload the index to s3://{config.s3_bucket}/{config.mosaic_key}", config)
+        return
+    
+    get_s3_client(config).put_object(
+        Bucket=config.s3_bucket,
+        Key=config.mosaic_key,
+        Body=json.dumps(index).encode(),
+        ContentType="application/json",
+    )
+    info(f"Uploaded index to s3://{config.s3_bucket}/{config.mosaic_key}", config)
+    print(f"Tiles: /mosaic/tiles/WebMercatorQuad/{{z}}/{{x}}/{{y}}?url=s3://{config.s3_bucket}/{config.mosaic_key}")
+
+
 def cmd_jobs(config: Config):
     """Show status of batch jobs."""
     jobs = get_job_status(config)
@@ -978,7 +2341,27 @@ Environment Variables:
   AWS_REGION          AWS region (default: us-east-1)
   AWS_PROFILE         AWS credentials profile name
   FILES_PER_JOB       Files to process per batch job (default: 50)
+  LIST_WORKERS        Parallel S3 listing threads per prefix (default: 16)
+  LISTING_SYNC        Listing store sync: full, or auto to reuse a recent source listing (default: full)
+  S3_INVENTORY_MANIFEST
+                      s3:// URI of an S3 Inventory manifest.json read for the source prefix
+  SCHEDULER           Job grouping: binpack (by estimated cost) or fixed (default: binpack)
+  TARGET_MINUTES_PER_JOB / TARGET_BYTES_PER_JOB
+                      Target estimated cost per job when bin-packing
   MAX_VCPUS           Maximum concurrent vCPUs (default: 16)
+  PIPELINE_WORKERS    Threads per download/convert/upload stage in each job (default: 1)
+  STREAMING           Convert S3 -> S3 through /vsis3/ without local copies (default: false)
+  WEB_MERCATOR        Also write GoogleMapsCompatible (EPSG:3857) copies under
+                      {COG_PREFIX}webmercator/ (default: false)
+  COG_PROFILE         COG profile: auto, categorical, continuous-int, continuous-float,
+                      imagery or legacy (default: auto)
+  COMPRESSION         Override the profile's compression (LZW, DEFLATE, ZSTD, WEBP)
+  SCAN_WORKERS        Parallel header reads for scan (default: 32)
+  SCAN_HEADER_KB      Bytes read from the start of each COG by scan (default: 16)
+  SCAN_ISSUES         Comma-separated scan issues to re-convert (default: all)
+  MOSAIC_NAME         Mosaic index name, written to {COG_PREFIX}mosaics/{MOSAIC_NAME}.json
+                      (default: cogs)
+  MOSAIC_QUADKEY_ZOOM Zoom of the index's quadkeys (default: the mosaic's minzoom)
   USE_SPOT            Use spot instances (default: true)
   FILENAME_FILTER     Regex to filter filenames
   DRY_RUN             Show what would run without executing (true/false)
@@ -1002,6 +2385,11 @@ Examples:
     subparsers.add_parser("list", help="List all raw TIFFs")
     subparsers.add_parser("status", help="Show conversion status")
     subparsers.add_parser("convert", help="Submit batch jobs for pending conversions")
+    subparsers.add_parser("plan", help="Predict job makespan: fixed chunking vs bin-packing")
+    subparsers.add_parser("reconcile", help="Report work wasted by COG naming mismatches and collisions")
+    subparsers.add_parser("scan", help="Check COG headers and re-convert COGs with missing overviews or bad layout")
+    subparsers.add_parser("mosaic", help="Build a MosaicJSON index of existing COGs for the tiler")
+    subparsers.add_parser("cost-model", help="Fit job settings from past conversion results")
     subparsers.add_parser("jobs", help="Show status of batch jobs")
     subparsers.add_parser("setup", help="Set up AWS Batch infrastructure")
     subparsers.add_parser("deploy", help="Build and push Docker image")
@@ -1019,6 +2407,11 @@ Examples:
         "list": cmd_list,
         "status": cmd_status,
         "convert": cmd_convert,
+        "plan": cmd_plan,
+        "reconcile": cmd_reconcile,
+        "scan": cmd_scan,
+        "mosaic": cmd_mosaic,
+        "cost-model": cmd_cost_model,
         "jobs": cmd_jobs,
         "setup": cmd_setup,
         "deploy": cmd_deploy,
@@ -0,0 +1,23 @@
+import os
+import sys
+
+# The container scripts import their siblings as top-level modules (/app)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "batch_container"))
+
+import pytest
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """A moto-backed S3 client with an empty "bucket"; yields (client, bucket name)."""
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+    with moto.mock_aws():
+        from batch_container import s3_transfer
+
+        client = s3_transfer.get_s3_client()
+        client.create_bucket(Bucket="bucket")
+        yield client, "bucket"
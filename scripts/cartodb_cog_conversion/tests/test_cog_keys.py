@@ -0,0 +1,40 @@
+import pytest
+
+from batch_container import cog_keys
+
+
+@pytest.mark.parametrize(
+    "source_key,expected",
+    [
+        ("cartodb_exports/rasters/public_rainfall.tif", "cartodb_exports/cogs/rainfall.tif"),
+        ("cartodb_exports/rasters/cdb_importer_12345_pop.tif", "cartodb_exports/cogs/12345_pop.tif"),
+        ("cartodb_exports/rasters/landcover.tiff", "cartodb_exports/cogs/landcover.tiff"),
+        ("cartodb_exports/rasters/public_cdb_importer_x.tif", "cartodb_exports/cogs/cdb_importer_x.tif"),
+        ("nested/dir/public_a.tif", "cartodb_exports/cogs/a.tif"),
+    ],
+)
+def test_expected_cog_key(source_key, expected):
+    assert cog_keys.get_expected_cog_key(source_key, "cartodb_exports/cogs/") == expected
+
+
+def test_legacy_cog_key():
+    assert cog_keys.get_legacy_cog_key("r/public_a.tiff", "c/") == "c/public_a_cog.tif"
+
+
+def test_find_collisions():
+    sources = [
+        "r/public_rainfall.tif",
+        "r/cdb_importer_rainfall.tif",
+        "r/rainfall.tif",
+        "r/public_other.tif",
+    ]
+    assert cog_keys.find_collisions(sources, "c/") == {
+        "c/rainfall.tif": ["r/cdb_importer_rainfall.tif", "r/public_rainfall.tif", "r/rainfall.tif"],
+    }
+
+
+def test_web_mercator_cog_key():
+    assert (
+        cog_keys.get_web_mercator_cog_key("cartodb_exports/rasters/public_rainfall.tif", "cartodb_exports/cogs/")
+        == "cartodb_exports/cogs/webmercator/rainfall.tif"
+    )
@@ -0,0 +1,86 @@
+"""Property tests: every component derives the same COG key for a source TIFF."""
+
+import os
+
+import pytest
+
+pytest.importorskip("hypothesis")
+
+from hypothesis import given, strategies as st
+
+from batch_container import cog_keys
+
+name_chars = st.characters(blacklist_categories=("Cs",), blacklist_characters="/\x00")
+filenames = st.builds(
+    lambda prefix, stem, ext: f"{prefix}{stem}{ext}",
+    st.sampled_from(["", "public_", "cdb_importer_", "public_cdb_importer_"]),
+    st.text(name_chars, min_size=1, max_size=40),
+    st.sampled_from([".tif", ".tiff", ".TIF"]),
+)
+directories = st.lists(st.text(name_chars, min_size=1, max_size=10), max_size=3).map(
+    lambda parts: "".join(f"{p}/" for p in parts)
+)
+cog_prefixes = st.sampled_from(["", "cogs/", "cartodb_exports/cogs/", "cartodb-cogs/"])
+
+
+@given(directories, filenames, cog_prefixes)
+def test_cog_key_is_stripped_filename_under_prefix(directory, filename, cog_prefix):
+    cog_key = cog_keys.get_expected_cog_key(directory + filename, cog_prefix)
+
+    assert cog_key.startswith(cog_prefix)
+    assert "/" not in cog_key[len(cog_prefix):]
+    assert cog_key[len(cog_prefix):] == cog_keys.strip_table_prefix(filename)
+
+
+@given(directories, directories, filenames, cog_prefixes)
+def test_cog_key_ignores_source_directory(dir_a, dir_b, filename, cog_prefix):
+    assert cog_keys.get_expected_cog_key(dir_a + filename, cog_prefix) == \
+        cog_keys.get_expected_cog_key(dir_b + filename, cog_prefix)
+
+
+@given(filenames)
+def test_strip_removes_at_most_one_prefix(filename):
+    stripped = cog_keys.strip_table_prefix(filename)
+
+    assert filename.endswith(stripped)
+    assert filename[:len(filename) - len(stripped)] in ("",) + cog_keys.TABLE_PREFIXES
+
+
+@given(st.lists(st.tuples(directories, filenames), max_size=30), cog_prefixes)
+def test_collisions_are_exactly_shared_keys(sources, cog_prefix):
+    source_keys = [d + f for d, f in sources]
+    collisions = cog_keys.find_collisions(source_keys, cog_prefix)
+
+    for source_key in source_keys:
+        cog_key = cog_keys.get_expected_cog_key(source_key, cog_prefix)
+        sharing = [k for k in source_keys if cog_keys.get_expected_cog_key(k, cog_prefix) == cog_key]
+        if len(sharing) > 1:
+            assert collisions[cog_key] == sorted(sharing)
+        else:
+            assert cog_key not in collisions
+
+
+@pytest.fixture(scope="module")
+def components():
+    pytest.importorskip("boto3")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    import batch_handler
+    import handler
+    import manage_cog_conversion
+
+    return manage_cog_conversion, batch_handler, handler
+
+
+@given(directories, filenames)
+def test_planner_and_converters_agree(components, directory, filename):
+    manage_cog_conversion, batch_handler, handler = components
+
+    source_key = "cartodb_exports/rasters/" + directory + filename
+    config = manage_cog_conversion.Config()
+
+    planned = manage_cog_conversion.expected_cog_key(config, source_key)
+    assert planned == batch_handler.get_expected_cog_key(source_key, config.cog_prefix)
+    assert (None, planned) == handler.get_dest_location(
+        {"source_key": source_key, "dest_prefix": config.cog_prefix}
+    )
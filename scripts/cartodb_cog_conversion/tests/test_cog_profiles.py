@@ -0,0 +1,78 @@
+import pytest
+
+from batch_container import cog_profiles
+
+
+@pytest.mark.parametrize(
+    "metadata,expected",
+    [
+        ({"dtype": "uint8", "bands": 1, "color_table": True}, "categorical"),
+        ({"dtype": "int16", "bands": 1, "distinct_values": 12}, "categorical"),
+        ({"dtype": "int16", "bands": 1, "distinct_values": 3000}, "continuous-int"),
+        ({"dtype": "int32", "bands": 1, "distinct_values": None}, "continuous-int"),
+        ({"dtype": "uint8", "bands": 1, "distinct_values": None}, "categorical"),
+        ({"dtype": "float32", "bands": 1, "distinct_values": None}, "continuous-float"),
+        ({"dtype": "uint8", "bands": 3, "color_interp": ["Red", "Green", "Blue"]}, "imagery"),
+        ({"dtype": "uint8", "bands": 3, "color_interp": ["Gray", "Undefined", "Undefined"],
+          "distinct_values": 200}, "continuous-int"),
+    ],
+)
+def test_choose_profile(metadata, expected):
+    assert cog_profiles.choose_profile(metadata) == expected
+
+
+def options(args):
+    assert args[::2] == ["-co"] * (len(args) // 2)
+    return dict(option.split("=", 1) for option in args[1::2])
+
+
+def test_creation_options_follow_size():
+    small = options(cog_profiles.creation_options("continuous-float", {"width": 2000, "height": 1000}))
+    assert small["COMPRESS"] == "ZSTD"
+    assert small["PREDICTOR"] == "FLOATING_POINT"
+    assert small["BLOCKSIZE"] == "256"
+    assert small["OVERVIEW_COUNT"] == "3"  # 2000 -> 1000 -> 500 -> 250
+
+    large = options(cog_profiles.creation_options("categorical", {"width": 40000, "height": 512}))
+    assert large["BLOCKSIZE"] == "512"
+    assert large["OVERVIEW_RESAMPLING"] == "MODE"
+    assert large["OVERVIEW_COUNT"] == "7"
+
+
+def test_creation_options_compression_override():
+    args = options(cog_profiles.creation_options("imagery", {"width": 10, "height": 10}, "DEFLATE"))
+    assert args["COMPRESS"] == "DEFLATE"
+    assert args["PREDICTOR"] == "NO"
+    assert "QUALITY" not in args
+    assert args["OVERVIEW_COUNT"] == "0"
+
+
+def test_legacy_options_unchanged():
+    args = options(cog_profiles.creation_options("legacy", {"width": 40000, "height": 40000}))
+    assert args["COMPRESS"] == "LZW"
+    assert args["PREDICTOR"] == "YES"
+    assert args["BLOCKSIZE"] == "512"
+    assert "OVERVIEW_COUNT" not in args
+
+
+def test_metadata_from_gdalinfo():
+    info = {
+        "size": [100, 50],
+        "bands": [
+            {"type": "Byte", "colorInterpretation": "Palette", "colorTable": {"count": 2}},
+        ],
+    }
+    metadata = cog_profiles.metadata_from_gdalinfo(info)
+    assert metadata["dtype"] == "uint8"
+    assert (metadata["width"], metadata["height"], metadata["bands"]) == (100, 50, 1)
+    assert cog_profiles.choose_profile(metadata) == "categorical"
+
+
+def test_tiling_scheme_options():
+    args = options(cog_profiles.creation_options(
+        "categorical", {"width": 40000, "height": 40000}, tiling_scheme="GoogleMapsCompatible"
+    ))
+    assert args["TILING_SCHEME"] == "GoogleMapsCompatible"
+    assert args["RESAMPLING"] == "NEAREST"
+    assert "BLOCKSIZE" not in args
+    assert "OVERVIEW_COUNT" not in args
@@ -0,0 +1,72 @@
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+np = pytest.importorskip("numpy")
+
+from rasterio.transform import from_bounds  # noqa: E402
+
+import manage_cog_conversion as manage  # noqa: E402
+
+
+def write_raster(path, size=2048, **options):
+    data = np.random.default_rng(0).integers(0, 200, (1, size, size), dtype="uint8")
+    with rasterio.open(
+        path, "w", width=size, height=size, count=1, dtype="uint8",
+        crs="EPSG:4326", transform=from_bounds(0, 0, 1, 1, size, size), **options,
+    ) as dst:
+        dst.write(data)
+    return path
+
+
+def local_fetch(path):
+    data = path.read_bytes()
+
+    def fetch(offset, length):
+        return data[offset:offset + length]
+
+    return fetch
+
+
+def scan(path):
+    header = manage.parse_cog_header(local_fetch(path))
+    return header, manage.cog_header_issues(header)
+
+
+def test_cog_has_no_issues(tmp_path):
+    header, issues = scan(write_raster(tmp_path / "a.tif", driver="COG", BLOCKSIZE=256))
+    assert issues == []
+    assert header["tiled"] and header["block_size"] == [256, 256]
+    assert header["overviews"][-1] == [256, 256]
+    assert header["ghost"]["LAYOUT"] == "IFDS_BEFORE_DATA"
+
+
+def test_bigtiff_cog(tmp_path):
+    header, issues = scan(write_raster(tmp_path / "a.tif", driver="COG", BIGTIFF="YES"))
+    assert header["bigtiff"]
+    assert issues == []
+
+
+def test_striped_geotiff(tmp_path):
+    _, issues = scan(write_raster(tmp_path / "a.tif", driver="GTiff"))
+    assert set(issues) == {"not_tiled", "no_overviews", "no_ghost_header"}
+
+
+def test_insufficient_overviews(tmp_path):
+    path = write_raster(tmp_path / "a.tif", driver="COG", BLOCKSIZE=256, OVERVIEW_COUNT=1)
+    header, issues = scan(path)
+    assert header["overviews"] == [[1024, 1024]]
+    assert issues == ["insufficient_overviews"]
+
+
+def test_edited_cog(tmp_path):
+    path = write_raster(tmp_path / "a.tif", driver="COG", BLOCKSIZE=256)
+    with rasterio.open(path, "r+", IGNORE_COG_LAYOUT_BREAK="YES") as dst:
+        dst.update_tags(edited="yes")
+    header, issues = scan(path)
+    assert header["ghost"]["KNOWN_INCOMPATIBLE_EDITION"] == "YES"
+    assert "ghost_header_layout" in issues
+
+
+def test_not_a_tiff():
+    with pytest.raises(ValueError):
+        manage.parse_cog_header(lambda offset, length: b"\x89PNG\r\n\x1a\n" + bytes(8))
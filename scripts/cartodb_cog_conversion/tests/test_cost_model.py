@@ -0,0 +1,88 @@
+import pytest
+
+import manage_cog_conversion as manage
+
+GB = 1024**3
+MB = 1024**2
+
+
+@pytest.fixture
+def config(monkeypatch, tmp_path):
+    monkeypatch.setenv("OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setenv("USE_COST_MODEL", "false")
+    for name in ("MAX_VCPUS", "JOB_VCPUS", "MAX_JOB_MEMORY", "PIPELINE_WORKERS", "TARGET_MINUTES_PER_JOB"):
+        monkeypatch.delenv(name, raising=False)
+    return manage.Config()
+
+
+def record(gb, seconds, rss_mb=500, vcpus=2):
+    return {
+        "bytes_in": int(gb * GB),
+        "download_seconds": seconds / 4,
+        "translate_seconds": seconds / 2,
+        "upload_seconds": seconds / 4,
+        "peak_rss_bytes": int(rss_mb * MB),
+        "job_vcpus": vcpus,
+    }
+
+
+def test_fit_line():
+    assert manage.fit_line([0, 1, 2], [5, 7, 9]) == (5, 2)
+    # No points, one point, or no spread in x: flat line at the mean
+    assert manage.fit_line([], []) == (0.0, 0.0)
+    assert manage.fit_line([3], [12]) == (12, 0.0)
+    assert manage.fit_line([2, 2, 2], [10, 20, 30]) == (20, 0.0)
+    # Negative coefficients are clamped
+    assert manage.fit_line([0, 1, 2], [9, 7, 5]) == (7, 0.0)
+    assert manage.fit_line([1, 2, 3], [0, 10, 20]) == (0.0, 10)
+
+
+def test_fit_recovers_costs_and_picks_cheapest_vcpus(config):
+    # 2 vCPUs: 10 s + 60 s/GB (120 vCPU-s/GB); 4 vCPUs: 10 s + 40 s/GB (160 vCPU-s/GB)
+    records = [record(gb, 10 + 60 * gb, rss_mb=200 + 1000 * gb) for gb in (0.5, 1, 2)]
+    records += [record(gb, 10 + 40 * gb, vcpus=4) for gb in (0.5, 1, 2)]
+    model = manage.fit_cost_model(config, records, [("a.tif", 1 * GB), ("b.tif", 3 * GB)])
+
+    assert model["time_by_vcpus"]["2"]["seconds_per_gb"] == pytest.approx(60)
+    assert model["time_by_vcpus"]["4"]["vcpu_seconds_per_gb"] == pytest.approx(160)
+    settings = model["settings"]
+    assert settings["JOB_VCPUS"] == 2
+    assert (settings["FILE_OVERHEAD_SECONDS"], settings["SECONDS_PER_GB"]) == (10, 60)
+    # Mean pending file: 2 GB, 130 s; 30 minutes per job, but only 2 files pending
+    assert settings["FILES_PER_JOB"] == 2
+    assert model["memory"]["largest_pending_gb"] == 3
+
+
+def test_no_records(config):
+    with pytest.raises(ValueError):
+        manage.fit_cost_model(config, [], [("a.tif", GB)])
+
+
+def test_single_record_and_identical_sizes(config):
+    model = manage.fit_cost_model(config, [record(1, 90)], [])
+    assert model["settings"]["SECONDS_PER_GB"] == 0
+    assert model["settings"]["FILE_OVERHEAD_SECONDS"] == 90
+    assert model["settings"]["FILES_PER_JOB"] == 20
+    assert model["settings"]["JOB_MEMORY"] == 2048
+
+    model = manage.fit_cost_model(config, [record(1, 60), record(1, 120)], [(f"{i}.tif", GB) for i in range(100)])
+    assert model["settings"]["FILE_OVERHEAD_SECONDS"] == 90
+    assert model["settings"]["FILES_PER_JOB"] == 20
+
+
+def test_recommendations_are_clamped(config):
+    config.max_vcpus = 4
+    config.max_job_memory = 8192
+    config.pipeline_workers = 2
+    # Only 8-vCPU runs, 2 GB of RSS per GB, and near-free conversions
+    records = [record(gb, 0.001, rss_mb=2048 * gb, vcpus=8) for gb in (1, 2, 4)]
+    model = manage.fit_cost_model(config, records, [("huge.tif", 20 * GB), ("small.tif", MB)])
+
+    settings = model["settings"]
+    assert settings["JOB_VCPUS"] == 4
+    assert settings["JOB_MEMORY"] == 8192
+    assert settings["FILES_PER_JOB"] == 2
+
+    # Tiny rasters still get the minimum memory
+    small = manage.fit_cost_model(config, [record(0.01, 5, rss_mb=50), record(0.02, 6, rss_mb=60)], [])
+    assert small["settings"]["JOB_MEMORY"] == 2048
@@ -0,0 +1,199 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("boto3")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import handler
+
+MB = 1024**2
+
+
+@pytest.fixture
+def converted(monkeypatch):
+    """Replace the conversion itself; record which thread converted each key."""
+    seen = {}
+
+    def fake_process(event, index=None):
+        seen[event["source_key"]] = (threading.current_thread().name, event.get("compression"))
+        if event["source_key"].endswith("crash.tif"):
+            raise RuntimeError("connection reset")
+        if event["source_key"].endswith("bad.tif"):
+            return {"status": "error", "source_key": event["source_key"], "error": "boom"}
+        return {"status": "success", "source_key": event["source_key"]}
+
+    monkeypatch.setattr(handler, "process_single_tiff", fake_process)
+    monkeypatch.setattr(handler, "FAN_OUT_SMALL_MB", 10)
+    monkeypatch.setattr(handler, "FAN_OUT_WORKER_MB", 300)
+    return seen
+
+
+def batch_event(items, **extra):
+    return {"source_bucket": "bucket", "dest_prefix": "cogs/", "batch": items, **extra}
+
+
+@pytest.fixture
+def result_bucket(monkeypatch, s3_bucket):
+    """Workers write their results to, and the coordinator polls, a moto bucket."""
+    client, _ = s3_bucket
+    monkeypatch.setattr(handler, "s3_client", client)
+    monkeypatch.setattr(handler, "FAN_OUT_POLL_SECONDS", 0.01)
+    return s3_bucket
+
+
+def local_invoker(payloads):
+    """Stand-in for the asynchronous Lambda invoke API: runs the handler in-process."""
+    def invoke(payload):
+        payloads.append(payload)
+        handler.lambda_handler(payload, None)
+    return invoke
+
+
+class FakeContext:
+    aws_request_id = "request-1"
+
+    def __init__(self, remaining_seconds):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return int(self.remaining_seconds * 1000)
+
+
+def test_fan_out_splits_by_size_and_aggregates(converted, result_bucket):
+    items = [
+        {"source_key": "r/small1.tif", "size": 1 * MB},
+        {"source_key": "r/big1.tif", "size": 250 * MB},
+        {"source_key": "r/big2.tif", "size": 200 * MB},
+        {"source_key": "r/small2.tif", "size": 2 * MB},
+        {"source_key": "r/mid.tif", "size": 40 * MB, "compression": "ZSTD"},
+        {"source_key": "r/bad.tif", "size": 3 * MB},
+    ]
+    payloads = []
+
+    response = handler.lambda_handler(batch_event(items, compression="LZW"), None, invoker=local_invoker(payloads))
+
+    body = response["body"]
+    assert [r["source_key"] for r in body["results"]] == [item["source_key"] for item in items]
+    assert body["message"] == "Batch complete: 5 converted, 0 skipped, 1 failed"
+
+    # First fit, largest first: big1 (250) + mid (40) | big2 (200), each within 300 MB
+    groups = sorted(sorted(item["source_key"] for item in p["batch"]) for p in payloads)
+    assert groups == [["r/big1.tif", "r/mid.tif"], ["r/big2.tif"]]
+    assert all(p["fan_out"] == "off" and p["compression"] == "LZW" for p in payloads)
+    assert converted["r/mid.tif"][1] == "ZSTD"
+
+    # Each worker reported through its own result object, removed once read
+    assert len({p["result_key"] for p in payloads}) == 2
+    assert all(p["result_key"].startswith("cogs/fan_out/") for p in payloads)
+    client, bucket = result_bucket
+    assert client.list_objects_v2(Bucket=bucket, Prefix="cogs/fan_out/")["KeyCount"] == 0
+
+    # Small items were converted in this invocation's thread pool
+    assert converted["r/small1.tif"][0] != threading.main_thread().name
+
+
+def test_failed_invocation_reports_its_items(converted):
+    def failing(payload):
+        raise RuntimeError("Task timed out")
+
+    items = [{"source_key": "r/small.tif", "size": MB}, {"source_key": "r/big.tif", "size": 500 * MB}]
+    results = handler.lambda_handler(batch_event(items), None, invoker=failing)["body"]["results"]
+
+    assert results[0]["status"] == "success"
+    assert results[1]["status"] == "error"
+    assert "Task timed out" in results[1]["error"]
+
+
+def test_unexpected_errors_become_results(converted, result_bucket):
+    payloads = []
+    items = [
+        {"source_key": "r/crash.tif", "size": MB},
+        {"source_key": "r/big.tif", "size": 500 * MB},
+        {"source_key": "r/big_crash.tif", "size": 400 * MB},
+    ]
+
+    results = handler.lambda_handler(batch_event(items), None, invoker=local_invoker(payloads))["body"]["results"]
+
+    # The local crash does not drop the worker results; the crashed worker still reported
+    assert [r["status"] for r in results] == ["error", "success", "error"]
+    assert "connection reset" in results[0]["error"]
+    assert "connection reset" in results[2]["error"]
+
+
+def test_worker_reports_when_its_batch_fails(monkeypatch, result_bucket):
+    client, bucket = result_bucket
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("no index")
+
+    monkeypatch.setattr(handler, "run_batch", broken)
+    event = batch_event(
+        [{"source_key": "r/a.tif"}], fan_out="off", result_bucket=bucket, result_key="cogs/fan_out/x/0.json"
+    )
+    handler.lambda_handler(event, None)
+
+    results = handler.read_worker_result(bucket, "cogs/fan_out/x/0.json")
+    assert results == [{"status": "error", "source_key": "r/a.tif", "error": "Worker batch failed: no index"}]
+
+
+def test_workers_past_the_deadline_fail(monkeypatch, converted, result_bucket):
+    payloads = []
+    monkeypatch.setattr(handler, "FAN_OUT_MARGIN_SECONDS", 1)
+
+    items = [{"source_key": "r/small.tif", "size": MB}, {"source_key": "r/big.tif", "size": 500 * MB}]
+    # The worker is queued but never writes its results
+    response = handler.lambda_handler(batch_event(items), FakeContext(1.2), invoker=payloads.append)
+    results = response["body"]["results"]
+
+    assert results[0]["status"] == "success"
+    assert results[1]["status"] == "error"
+    assert "deadline" in results[1]["error"]
+    assert payloads[0]["result_key"] == "cogs/fan_out/request-1/0.json"
+    assert payloads[0]["result_key"] in results[1]["error"]
+
+
+def test_fan_out_off_is_sequential(converted):
+    def unexpected(payload):
+        raise AssertionError("should not invoke")
+
+    items = [{"source_key": "r/big.tif", "size": 500 * MB}, {"source_key": "r/small.tif", "size": MB}]
+    response = handler.lambda_handler(batch_event(items, fan_out="off"), None, invoker=unexpected)
+
+    assert response["body"]["message"] == "Batch complete: 2 converted, 0 skipped, 0 failed"
+    assert {name for name, _ in converted.values()} == {threading.current_thread().name}
+
+
+def test_pack_worker_groups_first_fit_decreasing(monkeypatch):
+    monkeypatch.setattr(handler, "FAN_OUT_WORKER_MB", 100)
+    sizes = [60 * MB, 50 * MB, 40 * MB, 150 * MB, 30 * MB]
+
+    groups = handler.pack_worker_groups(range(len(sizes)), sizes)
+
+    assert sorted(groups) == [[0, 2], [1, 4], [3]]
+
+
+def test_index_falls_back_when_listing_fails(monkeypatch):
+    class BrokenClient:
+        def list_objects_v2(self, **kwargs):
+            raise ConnectionError("endpoint unreachable")
+
+    monkeypatch.setattr(handler, "s3_client", BrokenClient())
+    monkeypatch.setattr(handler, "INDEX_MIN_KEYS", 2)
+    items = [{"source_bucket": "bucket", "source_key": f"r/{i}.tif", "dest_prefix": "cogs/"} for i in range(3)]
+    assert handler.build_batch_index(items) is None
+
+
+def test_streaming_reports_non_s3_errors(monkeypatch):
+    from botocore.exceptions import EndpointConnectionError
+
+    class Unreachable:
+        def head_object(self, **kwargs):
+            raise EndpointConnectionError(endpoint_url="https://s3.example")
+
+    monkeypatch.setattr(handler, "s3_client", Unreachable())
+    result = handler.process_streaming("bucket", "r/a.tif", "bucket", "cogs/a.tif")
+
+    assert result["status"] == "error"
+    assert "s3.example" in result["error"]
@@ -0,0 +1,225 @@
+import pytest
+
+import manage_cog_conversion as manage
+
+PREFIX = "rasters/"
+
+
+class SmallPages:
+    """S3 client whose listings return `max_keys` objects per page, to force many shards."""
+
+    def __init__(self, client, max_keys):
+        self.client = client
+        self.max_keys = max_keys
+        self.calls = 0
+
+    def list_objects_v2(self, **params):
+        self.calls += 1
+        return self.client.list_objects_v2(MaxKeys=self.max_keys, **params)
+
+    def get_paginator(self, name):
+        return self.client.get_paginator(name)
+
+
+@pytest.fixture
+def config(monkeypatch, tmp_path, s3_bucket):
+    monkeypatch.setenv("OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setenv("USE_COST_MODEL", "false")
+    monkeypatch.setenv("S3_BUCKET", s3_bucket[1])
+    monkeypatch.setenv("SOURCE_PREFIX", PREFIX)
+    monkeypatch.setenv("COG_PREFIX", "cogs/")
+    for name in ("RASTER_TYPE", "FILENAME_FILTER", "LISTING_SYNC", "S3_INVENTORY_MANIFEST", "WEB_MERCATOR"):
+        monkeypatch.delenv(name, raising=False)
+    config = manage.Config()
+    monkeypatch.setattr(manage, "get_s3_client", lambda config: s3_bucket[0])
+    return config
+
+
+def put(client, bucket, keys):
+    for key in keys:
+        client.put_object(Bucket=bucket, Key=key, Body=b"tif")
+
+
+def serial_listing(client, bucket, prefix):
+    return [
+        obj["Key"]
+        for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix)
+        for obj in page.get("Contents", [])
+    ]
+
+
+def tricky_keys():
+    names = [f"public_{i:03}.tif" for i in range(30)] + [f"cdb_importer_{i:03}.tif" for i in range(20)]
+    names += [
+        "public_ñandú.tif", "public_日本語.tif", "public_😀.TIFF", "cdb_importer_Ünïcödé.tif",
+        "a", "a0", "a\x7f", "~", "~~.tif", "\x7f.tif", "ÿ.tif", "readme.txt", " space.tif",
+    ]
+    keys = [PREFIX + name for name in names]
+    # Keys sitting exactly on split points the lister may choose
+    ordered = sorted(keys)
+    for low, high in zip(ordered, ordered[1:] + [PREFIX + manage._KEY_CEILING]):
+        split = manage.split_key_range(low, high)
+        if split:
+            keys.append(split)
+    return keys
+
+
+def test_split_key_range():
+    assert manage.split_key_range("r/a", "r/c") == "r/b"
+    assert "r/a" < manage.split_key_range("r/a", "r/b") < "r/b"
+    assert manage.split_key_range("r/b", "r/a") is None
+    assert manage.split_key_range("r/a", "r/a") is None
+    # Adjacent characters split further down the lower key
+    assert "r/~~" < manage.split_key_range("r/~~", "r/\x7f") < "r/\x7f"
+
+
+@pytest.mark.parametrize("workers", [1, 4, 16])
+def test_parallel_listing_matches_serial(config, s3_bucket, workers):
+    client, bucket = s3_bucket
+    keys = tricky_keys()
+    put(client, bucket, keys + ["rasters_old/public_1.tif", "other/public_1.tif", "rasters"])
+
+    config.list_workers = workers
+    sharded = SmallPages(client, max_keys=7)
+    parallel = [obj["Key"] for obj in manage.list_objects_parallel(config, sharded, PREFIX)]
+    serial = serial_listing(client, bucket, PREFIX)
+
+    assert parallel == serial
+    assert sorted(set(keys)) == serial
+    assert len(parallel) == len(set(parallel))
+    if workers > 1:
+        # The listing was split into more ranges than one serial walk
+        assert sharded.calls > len(serial) // 7 + 1
+
+
+@pytest.mark.parametrize("raster_type,filename_filter", [("both", ""), ("public", ""), ("cdb_importer", "0[0-4]"), ("both", "ñ|日本|😀")])
+def test_filters_match_serial(config, s3_bucket, raster_type, filename_filter):
+    client, bucket = s3_bucket
+    put(client, bucket, tricky_keys())
+    config.list_workers = 8
+    config.raster_type = raster_type
+    config.filename_filter = filename_filter
+
+    parallel = manage.list_objects_parallel(config, SmallPages(client, max_keys=5), PREFIX)
+    selected = [obj["Key"] for obj in parallel if manage.tiff_selected(config, obj["Key"])]
+    assert selected == [key for key in serial_listing(client, bucket, PREFIX) if manage.tiff_selected(config, key)]
+    assert selected
+
+
+def stored_keys(config, prefix):
+    conn = manage.open_listing_db(config)
+    try:
+        return [key for (key,) in conn.execute("SELECT key FROM objects WHERE prefix = ? ORDER BY key", (prefix,))]
+    finally:
+        conn.close()
+
+
+def pending(config):
+    manage.list_sources_and_cogs(config)
+    return [key for key, _ in manage.find_pending_conversions(config)]
+
+
+def test_full_sync_applies_changes_anywhere_in_keyspace(config, s3_bucket):
+    client, bucket = s3_bucket
+    put(client, bucket, [f"{PREFIX}public_{name}.tif" for name in ("b", "d", "f")] + ["cogs/b.tif"])
+    assert pending(config) == [f"{PREFIX}public_d.tif", f"{PREFIX}public_f.tif"]
+
+    # A source exported and a COG converted before the last stored keys, one source deleted
+    put(client, bucket, [f"{PREFIX}public_a.tif", "cogs/d.tif"])
+    client.delete_object(Bucket=bucket, Key=f"{PREFIX}public_f.tif")
+    client.put_object(Bucket=bucket, Key=f"{PREFIX}public_b.tif", Body=b"re-exported")
+
+    assert pending(config) == [f"{PREFIX}public_a.tif"]
+    assert stored_keys(config, "cogs/") == ["cogs/b.tif", "cogs/d.tif"]
+    conn = manage.open_listing_db(config)
+    try:
+        assert conn.execute("SELECT size FROM objects WHERE key = ?", (f"{PREFIX}public_b.tif",)).fetchone() == (11,)
+    finally:
+        conn.close()
+
+
+def test_auto_sync_reuses_sources_but_lists_cogs(config, s3_bucket):
+    client, bucket = s3_bucket
+    config.listing_sync = "auto"
+    put(client, bucket, [f"{PREFIX}public_b.tif", f"{PREFIX}public_d.tif"])
+    assert pending(config) == [f"{PREFIX}public_b.tif", f"{PREFIX}public_d.tif"]
+
+    put(client, bucket, [f"{PREFIX}public_a.tif", "cogs/b.tif"])
+    assert manage.sync_listing(config, PREFIX, source=True) == 0
+    # The new COG is seen at once; the new source once the stored listing expires
+    assert pending(config) == [f"{PREFIX}public_d.tif"]
+
+    config.listing_max_age_hours = 0
+    assert pending(config) == [f"{PREFIX}public_a.tif", f"{PREFIX}public_d.tif"]
+
+
+def test_changed_cog_prefix_rederives_stored_cog_keys(config, s3_bucket):
+    client, bucket = s3_bucket
+    config.listing_sync = "auto"
+    put(client, bucket, [f"{PREFIX}public_b.tif", "cogs/b.tif", "cogs_v2/b.tif"])
+    assert pending(config) == []
+
+    client.delete_object(Bucket=bucket, Key="cogs_v2/b.tif")
+    config.cog_prefix = "cogs_v2/"
+    assert pending(config) == [f"{PREFIX}public_b.tif"]
+
+
+def test_inventory_for_sources_only(config, s3_bucket):
+    import gzip
+    import json
+
+    client, bucket = s3_bucket
+    put(client, bucket, [f"{PREFIX}public_b.tif", f"{PREFIX}public_c.tif", "cogs/b.tif"])
+    report = "\n".join(
+        f'"{bucket}","{key}","3","2026-01-01T00:00:00.000Z","etag"'
+        for key in (f"{PREFIX}public_a%C3%B1.tif", f"{PREFIX}public_b.tif", "elsewhere/public_x.tif")
+    )
+    client.put_object(Bucket=bucket, Key="inventory/data.csv.gz", Body=gzip.compress(report.encode()))
+    client.put_object(Bucket=bucket, Key="inventory/manifest.json", Body=json.dumps({
+        "fileFormat": "CSV",
+        "fileSchema": "Bucket, Key, Size, LastModifiedDate, ETag",
+        "destinationBucket": f"arn:aws:s3:::{bucket}",
+        "files": [{"key": "inventory/data.csv.gz"}],
+    }))
+    config.inventory_manifest = f"s3://{bucket}/inventory/manifest.json"
+
+    # public_c.tif is newer than the report and waits for the next one; COGs are listed
+    assert pending(config) == [f"{PREFIX}public_añ.tif"]
+    assert stored_keys(config, "cogs/") == ["cogs/b.tif"]
+
+
+def test_web_mercator_copies_checked_when_enabled(config, s3_bucket):
+    client, bucket = s3_bucket
+    put(client, bucket, [f"{PREFIX}public_b.tif", f"{PREFIX}public_d.tif", "cogs/b.tif", "cogs/d.tif"])
+    put(client, bucket, ["cogs/webmercator/b.tif"])
+    assert pending(config) == []
+
+    config.web_mercator = True
+    assert pending(config) == [f"{PREFIX}public_d.tif"]
+
+
+def test_reconcile_ignores_web_mercator_copies(config, s3_bucket, capsys):
+    import json
+
+    client, bucket = s3_bucket
+    put(client, bucket, [f"{PREFIX}public_b.tif", "cogs/b.tif", "cogs/webmercator/b.tif", "cogs/stray.tif"])
+
+    manage.cmd_reconcile(config)
+
+    with open(config.reconcile_file) as f:
+        assert json.load(f)["orphans"] == ["cogs/stray.tif"]
+
+
+def test_existing_cogs_leave_out_web_mercator_copies(config, s3_bucket, capsys):
+    client, bucket = s3_bucket
+    put(client, bucket, [f"{PREFIX}public_b.tif", "cogs/b.tif", "cogs/webmercator/b.tif"])
+    config.web_mercator = True
+
+    assert manage.list_existing_cogs(config) == {"cogs/b.tif"}
+    assert config.cog_list.read_text() == "cogs/b.tif\n"
+    assert manage.stored_cogs(config, web_mercator=True) == ["cogs/webmercator/b.tif"]
+
+    manage.cmd_status(config)
+    out = capsys.readouterr().out
+    assert "Existing COGs:               1" in out
+    assert "Web Mercator copies:         1" in out
@@ -0,0 +1,66 @@
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+np = pytest.importorskip("numpy")
+
+from rasterio.transform import from_bounds  # noqa: E402
+
+import manage_cog_conversion as manage  # noqa: E402
+from tests.test_cog_scan import local_fetch  # noqa: E402
+
+
+def write_cog(path, crs, bounds, size=1024):
+    with rasterio.open(
+        path, "w", driver="COG", width=size, height=size, count=1, dtype="uint8",
+        crs=crs, transform=from_bounds(*bounds, size, size), BLOCKSIZE=256,
+    ) as dst:
+        dst.write(np.ones((1, size, size), dtype="uint8"))
+    return path
+
+
+def test_geographic_header(tmp_path):
+    header = manage.parse_cog_header(local_fetch(write_cog(tmp_path / "a.tif", "EPSG:4326", (10, -5, 12, -3))))
+    assert header["epsg"] == 4326
+    assert header["bounds"] == [10, -5, 12, -3]
+    assert header["pixel_size"] == [2 / 1024, 2 / 1024]
+    assert manage.footprint_lonlat(header) == [10, -5, 12, -3]
+    # ~217 m pixels are served up to zoom 10, the 256px overview (~870 m) from zoom 7
+    assert manage.zoom_range(header) == (7, 10)
+
+
+def test_web_mercator_header(tmp_path):
+    half = manage.WEB_MERCATOR_HALF_WORLD
+    path = write_cog(tmp_path / "a.tif", "EPSG:3857", (0, 0, half / 2, half / 2))
+    header = manage.parse_cog_header(local_fetch(path))
+    assert header["epsg"] == 3857
+    west, south, east, north = manage.footprint_lonlat(header)
+    assert (west, south, east) == (0, 0, 90)
+    assert north == pytest.approx(66.51326)
+    # Exactly a 2x2 block of zoom 2 tiles at 1024px: zoom 4 full resolution
+    assert manage.zoom_range(header) == (2, 4)
+
+
+def test_tile_range_and_quadkeys():
+    assert manage.tile_range([0, 0, 90, 66.51326044311186], 2) == (2, 1, 2, 1)
+    assert manage.tile_range([-1, -1, 1, 1], 1) == (0, 0, 1, 1)
+    assert manage.quadkey(2, 1, 2) == "12"
+    assert manage.quadkey(0, 0, 0) == ""
+
+
+def test_build_mosaic_index():
+    config = manage.Config.__new__(manage.Config)
+    config.mosaic_name = "layer"
+    config.mosaic_quadkey_zoom = None
+    records = [
+        {"url": "s3://b/cogs/east.tif", "footprint": [10, 0, 20, 10], "minzoom": 4, "maxzoom": 9},
+        {"url": "s3://b/cogs/west.tif", "footprint": [-20, 0, -10, 10], "minzoom": 3, "maxzoom": 8},
+    ]
+    index = manage.build_mosaic_index(config, records)
+    assert (index["minzoom"], index["maxzoom"], index["quadkey_zoom"]) == (3, 9, 3)
+    assert index["bounds"] == [-20, 0, 20, 10]
+    assert index["tiles"] == {"033": ["s3://b/cogs/west.tif"], "122": ["s3://b/cogs/east.tif"]}
+    assert index["footprints"]["s3://b/cogs/east.tif"] == [10, 0, 20, 10]
+
+    mosaic = pytest.importorskip("cogeo_mosaic.mosaic")
+    document = {k: v for k, v in index.items() if k != "footprints"}
+    assert mosaic.MosaicJSON(**document).quadkey_zoom == 3
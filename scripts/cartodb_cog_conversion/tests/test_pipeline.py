@@ -0,0 +1,207 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import batch_handler  # noqa: E402
+
+PREFIX = "cogs/"
+
+
+class StubS3:
+    """In-memory S3 client with the calls the pipeline makes; `fail` maps a call to keys it raises for."""
+
+    exceptions = type("Exceptions", (), {"ClientError": ClientError})
+
+    def __init__(self, objects: dict[str, bytes], fail: dict[str, set[str]] | None = None):
+        self.objects = dict(objects)
+        self.fail = fail or {}
+        self.uploads = []
+
+    def head_object(self, Bucket, Key):
+        if Key in self.fail.get("head", ()):
+            raise RuntimeError(f"head {Key} broke")
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def download_file(self, bucket, key, path, Config=None):
+        if key in self.fail.get("download", ()):
+            raise RuntimeError(f"download {key} broke")
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+    def upload_file(self, path, bucket, key, Config=None):
+        if key in self.fail.get("upload", ()):
+            raise RuntimeError(f"upload {key} broke")
+        with open(path, "rb") as f:
+            self.objects[key] = f.read()
+        self.uploads.append(key)
+
+
+def cog_key(source_key):
+    return batch_handler.get_expected_cog_key(source_key, PREFIX)
+
+
+@pytest.fixture
+def converted(monkeypatch):
+    """Replace gdal_translate: copy the source to the COG path; keys containing "broken" fail."""
+    seen = []
+
+    def fake_convert(task, compression="", profile="auto"):
+        time.sleep(0.02)
+        seen.append(task["source_key"])
+        if "broken" in task["source_key"]:
+            task["result"] = {"success": False, "source_key": task["source_key"], "error": "gdal_translate failed"}
+            return
+        with open(task["source_path"], "rb") as src, open(task["cog_path"], "wb") as dst:
+            dst.write(src.read())
+        task["source_epsg"] = task["output_epsg"] = "EPSG:4326"
+
+    monkeypatch.setattr(batch_handler, "convert_stage", fake_convert)
+    return seen
+
+
+def strip_timings(results):
+    return [
+        {k: v for k, v in r.items() if k != "telemetry"} if "exception" not in r else str(r["exception"])
+        for r in results
+    ]
+
+
+def test_results_in_input_order_with_failures_in_each_stage(converted):
+    keys = ["r/a.tif", "r/done.tif", "r/no_download.tif", "r/broken.tif", "r/no_upload.tif", "r/no_head.tif"]
+    objects = {key: b"x" * 100 for key in keys}
+    objects[cog_key("r/done.tif")] = b"cog"
+    fail = {"download": {"r/no_download.tif"}, "upload": {cog_key("r/no_upload.tif")}, "head": {cog_key("r/no_head.tif")}}
+
+    serial = batch_handler.run_pipeline(StubS3(objects, fail), "bucket", keys, PREFIX, workers=1)
+    s3 = StubS3(objects, fail)
+    parallel = batch_handler.run_pipeline(s3, "bucket", keys, PREFIX, workers=3)
+    assert strip_timings(parallel) == strip_timings(serial)
+
+    assert [r.get("source_key") for r in parallel[:5]] == keys[:5]
+    assert parallel[0]["success"] and not parallel[0]["skipped"]
+    assert parallel[0]["telemetry"]["bytes_in"] == parallel[0]["telemetry"]["bytes_out"] == 100
+    assert parallel[1]["skipped"]
+    assert parallel[2]["error"].startswith("Download failed")
+    assert parallel[3]["error"] == "gdal_translate failed"
+    assert parallel[4]["error"].startswith("Upload failed")
+    assert "head" in str(parallel[5]["exception"])
+    assert s3.uploads == [cog_key("r/a.tif")]
+
+    summary = batch_handler.summarize_results(keys, parallel)
+    assert (summary["total"], summary["success"], summary["skipped"], summary["failed"]) == (6, 1, 1, 4)
+    assert [f["key"] for f in summary["failures"]] == keys[2:]
+
+
+def test_pipeline_stays_within_temp_budget(monkeypatch, converted):
+    peaks = []
+
+    class RecordingBudget(batch_handler.TempDiskBudget):
+        @batch_handler.contextmanager
+        def reserve(self, nbytes):
+            with super().reserve(nbytes):
+                peaks.append(self.used)
+                yield
+
+    monkeypatch.setattr(batch_handler, "TempDiskBudget", RecordingBudget)
+    keys = [f"r/{i}.tif" for i in range(8)] + ["r/huge.tif"]
+    objects = {key: b"x" * 100 for key in keys}
+    objects["r/huge.tif"] = b"x" * 1000
+
+    # Source plus COG: 200 bytes per file, so at most two files in flight
+    results = batch_handler.run_pipeline(StubS3(objects), "bucket", keys, PREFIX, workers=4, max_temp_bytes=400)
+
+    assert all(r["success"] for r in results)
+    assert max(p for p in peaks if p < 2000) <= 400
+    # The file larger than the whole budget still went through, on its own
+    assert 2000 in peaks
+
+
+def test_budget_blocks_until_released():
+    budget = batch_handler.TempDiskBudget(100)
+    entered = threading.Event()
+
+    def second():
+        with budget.reserve(60):
+            entered.set()
+
+    with budget.reserve(60):
+        thread = threading.Thread(target=second)
+        thread.start()
+        assert not entered.wait(0.1)
+        assert budget.used == 60
+    assert entered.wait(1)
+    thread.join()
+    assert budget.used == 0
+
+
+def test_oversized_reservation_waits_for_an_empty_budget():
+    budget = batch_handler.TempDiskBudget(100)
+    entered = threading.Event()
+
+    def oversized():
+        with budget.reserve(500):
+            entered.set()
+
+    with budget.reserve(10):
+        thread = threading.Thread(target=oversized)
+        thread.start()
+        assert not entered.wait(0.1)
+    assert entered.wait(1)
+    thread.join()
+
+    with budget.reserve(500):
+        assert budget.used == 500
+
+
+class CountingS3(StubS3):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.heads = []
+
+    def head_object(self, Bucket, Key):
+        self.heads.append(Key)
+        return super().head_object(Bucket, Key)
+
+
+def test_manifest_sizes_replace_source_heads(converted):
+    keys = ["r/a.tif", "r/b.tif"]
+    objects = {key: b"x" * 100 for key in keys}
+    index = {}  # Existence checks answered by the index
+
+    s3 = CountingS3(objects)
+    results = batch_handler.run_pipeline(s3, "bucket", keys, PREFIX, index=index, sizes={"r/a.tif": 100})
+
+    assert all(r["success"] for r in results)
+    # Only the key missing from the manifest was looked up
+    assert s3.heads == ["r/b.tif"]
+
+
+def test_parse_manifest():
+    assert batch_handler.parse_manifest([["r/a.tif", 10], "r/b.tif"]) == (["r/a.tif", "r/b.tif"], {"r/a.tif": 10})
+
+
+def test_streamed_sizes_from_one_listing(s3_bucket):
+    client, bucket = s3_bucket
+    client.put_object(Bucket=bucket, Key="r/a.tif", Body=b"x" * 30)
+    client.put_object(Bucket=bucket, Key="cogs/a.tif", Body=b"x" * 20)
+    client.put_object(Bucket=bucket, Key="cogs/webmercator/a.tif", Body=b"x" * 25)
+    client.put_object(Bucket=bucket, Key="cogs/b.tif", Body=b"x" * 5)
+    telemetry = lambda bytes_in: {**batch_handler.new_telemetry(), "bytes_in": bytes_in}
+    results = [
+        {"success": True, "skipped": False, "source_key": "r/a.tif", "dest_key": "cogs/a.tif",
+         "mercator_key": "cogs/webmercator/a.tif", "telemetry": telemetry(0)},
+        {"success": True, "skipped": False, "source_key": "r/b.tif", "dest_key": "cogs/b.tif", "telemetry": telemetry(7)},
+        {"success": True, "skipped": True, "source_key": "r/c.tif", "dest_key": "cogs/c.tif"},
+    ]
+
+    batch_handler.record_streamed_sizes(client, bucket, results)
+
+    assert (results[0]["telemetry"]["bytes_in"], results[0]["telemetry"]["bytes_out"]) == (30, 45)
+    assert (results[1]["telemetry"]["bytes_in"], results[1]["telemetry"]["bytes_out"]) == (7, 5)
@@ -0,0 +1,61 @@
+from batch_container import s3_transfer
+
+
+def test_defaults(monkeypatch):
+    for name in ("S3_MULTIPART_THRESHOLD_MB", "S3_MULTIPART_CHUNKSIZE_MB", "S3_MAX_CONCURRENCY",
+                 "S3_MAX_POOL_CONNECTIONS", "S3_MAX_ATTEMPTS"):
+        monkeypatch.delenv(name, raising=False)
+    config = s3_transfer.get_transfer_config()
+    assert config.multipart_threshold == 32 * s3_transfer.MB
+    assert config.multipart_chunksize == 16 * s3_transfer.MB
+    assert config.max_request_concurrency == 16
+    client = s3_transfer.client_config()
+    assert client.max_pool_connections == 64
+    assert client.retries == {"max_attempts": 5, "mode": "standard"}
+
+
+def test_environment_and_overrides(monkeypatch):
+    monkeypatch.setenv("S3_MULTIPART_CHUNKSIZE_MB", "64")
+    monkeypatch.setenv("S3_MAX_CONCURRENCY", "8")
+    config = s3_transfer.get_transfer_config(max_concurrency=1)
+    assert config.multipart_chunksize == 64 * s3_transfer.MB
+    assert config.max_request_concurrency == 1
+    assert not config.use_threads
+
+
+def test_pool_covers_concurrent_files(monkeypatch):
+    monkeypatch.setenv("S3_MAX_CONCURRENCY", "16")
+    monkeypatch.setenv("S3_MAX_POOL_CONNECTIONS", "64")
+    assert s3_transfer.client_config(concurrent_files=8).max_pool_connections == 128
+    assert s3_transfer.client_config(max_pool_connections=100).max_pool_connections == 100
+
+
+def test_client_uses_endpoint(monkeypatch):
+    monkeypatch.setenv("S3_ENDPOINT_URL", "http://localhost:5000")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    client = s3_transfer.get_s3_client(concurrent_files=4)
+    assert client.meta.endpoint_url == "http://localhost:5000"
+
+
+def test_existing_objects_skips_gaps(s3_bucket):
+    client, bucket = s3_bucket
+    for i in range(300):
+        client.put_object(Bucket=bucket, Key=f"cogs/layer_{i:03}.tif", Body=b"cog")
+    client.put_object(Bucket=bucket, Key="cogs/empty.tif", Body=b"")
+    client.put_object(Bucket=bucket, Key="cogs/webmercator/layer_000.tif", Body=b"cog")
+
+    # Keys spread across the whole prefix, some missing
+    spread = [f"cogs/layer_{i:03}.tif" for i in range(0, 300, 60)]
+    keys = spread + ["cogs/layer_999.tif", "cogs/empty.tif", "cogs/webmercator/layer_000.tif", "cogs/a.tif"]
+    found, requests = s3_transfer.existing_objects(client, bucket, "cogs/", keys, page_size=10)
+    assert set(found) == set(spread) | {"cogs/webmercator/layer_000.tif"}
+    assert found[spread[0]]["size"] == 3 and found[spread[0]]["etag"]
+    # One request per gap instead of paging through ~300 keys 10 at a time
+    assert requests <= len(keys)
+
+    # A run of neighbouring keys is resolved by a single page
+    run = [f"cogs/layer_{i:03}.tif" for i in range(100, 108)]
+    found, requests = s3_transfer.existing_objects(client, bucket, "cogs/", run, page_size=10)
+    assert (set(found), requests) == (set(run), 1)
+
+    assert s3_transfer.existing_objects(client, bucket, "cogs/", []) == ({}, 0)
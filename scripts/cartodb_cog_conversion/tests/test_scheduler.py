@@ -0,0 +1,103 @@
+import pytest
+
+import manage_cog_conversion as manage
+
+GB = 1024**3
+MB = 1024**2
+
+
+@pytest.fixture
+def config(monkeypatch, tmp_path):
+    monkeypatch.setenv("OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setenv("USE_COST_MODEL", "false")
+    for name in ("FILES_PER_JOB", "MAX_VCPUS", "JOB_VCPUS", "TARGET_BYTES_PER_JOB", "TARGET_MINUTES_PER_JOB",
+                 "FILE_OVERHEAD_SECONDS", "SECONDS_PER_GB", "SCHEDULER"):
+        monkeypatch.delenv(name, raising=False)
+    return manage.Config()
+
+
+def unit_cost(config):
+    """One second per GB and no per-file overhead, so costs read as sizes."""
+    config.file_overhead_seconds = 0
+    config.seconds_per_gb = 1
+    return config
+
+
+def keys(jobs):
+    return sorted(key for job in jobs for key, _ in job)
+
+
+def test_binpack_spreads_large_files_that_fixed_chunking_groups(config):
+    # Listing order puts the large rasters together, as in one source directory
+    pending = [(f"big/{i}.tif", 5 * GB) for i in range(10)] + [(f"small/{i:02}.tif", 10 * MB) for i in range(90)]
+    config.files_per_job, config.max_vcpus, config.job_vcpus = 10, 8, 2
+
+    fixed = manage.chunk_fixed(config, pending)
+    packed = manage.pack_by_cost(config, pending)
+    assert keys(packed) == keys(fixed) == sorted(key for key, _ in pending)
+
+    # Fixed: 10 jobs, one holding every big file; binpack: whole waves of 4 concurrent jobs
+    assert len(fixed) == 10
+    assert len(packed) == 12
+    assert all(sum(key.startswith("big/") for key, _ in job) <= 1 for job in packed)
+
+    fixed_makespan, fixed_longest = manage.predict_makespan(config, fixed)
+    packed_makespan, packed_longest = manage.predict_makespan(config, packed)
+    assert packed_longest < fixed_longest / 5
+    assert packed_makespan < fixed_makespan
+    assert manage.plan_jobs(config, pending) == packed
+    config.scheduler = "fixed"
+    assert manage.plan_jobs(config, pending) == fixed
+
+
+def test_lpt_assignment(config):
+    unit_cost(config)
+    config.target_minutes_per_job = 12 / 60
+    pending = [(name, gb * GB) for name, gb in (("a", 3), ("b", 7), ("c", 2), ("d", 5), ("e", 3), ("f", 4))]
+
+    jobs = manage.pack_by_cost(config, pending)
+    # Largest first onto the lightest job: b | d, f | a (b) | e (d, f) | c (b, a)
+    assert [[key for key, _ in job] for job in jobs] == [["b", "a", "c"], ["d", "f", "e"]]
+
+
+def test_target_bytes_per_job(config):
+    unit_cost(config)
+    config.target_bytes_per_job = 6 * GB
+    pending = [(f"{i}.tif", 3 * GB) for i in range(8)]
+    jobs = manage.pack_by_cost(config, pending)
+    assert len(jobs) == 4
+    assert all(sum(size for _, size in job) == 6 * GB for job in jobs)
+
+
+def test_target_minutes_per_job_counts_file_overhead(config):
+    config.file_overhead_seconds = 60
+    config.seconds_per_gb = 0
+    config.target_minutes_per_job = 10
+    jobs = manage.pack_by_cost(config, [(f"{i}.tif", MB) for i in range(25)])
+    assert [len(job) for job in jobs] == [9, 8, 8]
+
+
+def test_oversized_file_gets_its_own_job(config):
+    unit_cost(config)
+    config.target_minutes_per_job = 1
+    pending = [("huge.tif", 600 * GB)] + [(f"{i}.tif", 20 * GB) for i in range(6)]
+    jobs = manage.pack_by_cost(config, pending)
+    assert jobs[0] == [("huge.tif", 600 * GB)]
+    # More jobs than files are never planned
+    assert len(jobs) == len(pending)
+
+
+def test_empty_plan(config):
+    assert manage.pack_by_cost(config, []) == []
+    assert manage.predict_makespan(config, []) == (0.0, 0.0)
+
+
+def test_predict_makespan(config):
+    unit_cost(config)
+    config.max_vcpus, config.job_vcpus = 4, 2
+    jobs = [[("a", 10 * GB)], [("b", 20 * GB)], [("c", 15 * GB), ("d", 15 * GB)], [("e", 40 * GB)]]
+    # Two slots: a 0-10, b 0-20, c+d 10-40, e 20-60
+    assert manage.predict_makespan(config, jobs) == (60.0, 40.0)
+
+    config.file_overhead_seconds = 5
+    assert manage.estimate_file_seconds(config, 2 * GB) == 7.0
@@ -0,0 +1,139 @@
+"""Streaming S3-to-COG conversion against a local S3 stand-in (moto server)."""
+
+import os
+import shutil
+import threading
+
+import pytest
+
+pytest.importorskip("boto3")
+rasterio = pytest.importorskip("rasterio")
+np = pytest.importorskip("numpy")
+moto_server = pytest.importorskip("moto.server")
+
+from rasterio.transform import from_bounds  # noqa: E402
+
+import batch_handler  # noqa: E402
+import handler  # noqa: E402
+import s3_transfer  # noqa: E402
+
+BUCKET = "bucket"
+SOURCE_KEY = "rasters/public_layer.tif"
+BUFFER_MB = 5
+
+needs_gdal = pytest.mark.skipif(
+    not (shutil.which("gdal_translate") and shutil.which("gdalinfo")), reason="needs the GDAL command line tools"
+)
+
+
+@pytest.fixture
+def s3_endpoint(monkeypatch, tmp_path):
+    """Start a moto server, point the tools and GDAL at it and upload a striped source TIFF."""
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                        ("AWS_DEFAULT_REGION", "us-east-1"), ("S3_ENDPOINT_URL", f"http://{host}:{port}")):
+        monkeypatch.setenv(name, value)
+    # configure_gdal_streaming sets these in os.environ; restore them afterwards
+    for name in ("CPL_VSIS3_CHUNK_SIZE", "GDAL_DISABLE_READDIR_ON_OPEN", "CPL_VSIL_CURL_ALLOWED_EXTENSIONS",
+                 "CPL_TMPDIR", "AWS_S3_ENDPOINT", "AWS_HTTPS", "AWS_VIRTUAL_HOSTING"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+
+    client = s3_transfer.get_s3_client()
+    client.create_bucket(Bucket=BUCKET)
+
+    # 16 MB of noise: larger than the upload buffer and than any scratch file allowed
+    size = 2048
+    source = tmp_path / "source.tif"
+    with rasterio.open(
+        source, "w", driver="GTiff", width=size, height=size, count=1, dtype="float32",
+        crs="EPSG:4326", transform=from_bounds(0, 0, 10, 10, size, size),
+    ) as dst:
+        dst.write(np.random.default_rng(0).random((1, size, size), dtype="float32"))
+    client.upload_file(str(source), BUCKET, SOURCE_KEY)
+
+    yield client, source.stat().st_size
+    server.stop()
+
+
+class DiskWatcher:
+    """Sample the bytes held under a directory while a conversion runs."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            total = 0
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+            self.peak = max(self.peak, total)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def assert_cog(client, key, tmp_path):
+    path = tmp_path / "output.tif"
+    client.download_file(BUCKET, key, str(path))
+    with rasterio.open(path) as cog:
+        assert cog.crs.to_epsg() == 4326
+        assert cog.profile["tiled"]
+        assert cog.overviews(1)
+        assert cog.tags(ns="IMAGE_STRUCTURE").get("LAYOUT") == "COG"
+
+
+def test_gdal_reads_through_endpoint(s3_endpoint):
+    """configure_gdal_streaming points /vsis3/ at the stand-in (GDAL of rasterio here)."""
+    batch_handler.configure_gdal_streaming(BUFFER_MB)
+    with rasterio.open(batch_handler.vsis3_path(BUCKET, SOURCE_KEY)) as src:
+        assert (src.width, src.crs.to_epsg()) == (2048, 4326)
+
+
+@needs_gdal
+def test_batch_streaming_conversion(s3_endpoint, tmp_path):
+    client, source_size = s3_endpoint
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    batch_handler.configure_gdal_streaming(BUFFER_MB, str(scratch))
+
+    with DiskWatcher(tmp_path) as disk:
+        result = batch_handler.convert_to_cog(client, BUCKET, SOURCE_KEY, "cogs/", streaming=True)
+
+    assert result["success"], result
+    assert result["dest_key"] == "cogs/layer.tif"
+    assert result["telemetry"]["bytes_in"] == source_size
+    assert result["telemetry"]["bytes_out"] > 0
+    assert_cog(client, result["dest_key"], tmp_path)
+    # Neither the source nor the COG touched local disk; only overview scratch did
+    assert disk.peak < source_size
+
+
+@needs_gdal
+def test_lambda_streaming_conversion(monkeypatch, s3_endpoint, tmp_path):
+    client, source_size = s3_endpoint
+    monkeypatch.setattr(handler, "s3_client", client)
+    monkeypatch.setattr(handler, "STREAM_BUFFER_MB", BUFFER_MB)
+    monkeypatch.setattr(handler.tempfile, "tempdir", str(tmp_path))
+
+    with DiskWatcher(tmp_path) as disk:
+        result = handler.process_streaming(BUCKET, SOURCE_KEY, BUCKET, "cogs/layer.tif")
+
+    assert result["status"] == "success", result
+    assert result["source_size"] == source_size
+    assert_cog(client, "cogs/layer.tif", tmp_path)
+    assert disk.peak < source_size